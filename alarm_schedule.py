@@ -0,0 +1,154 @@
+"""알람 반복 요일 비트마스크 + 다음 울림 시각(next_fire_at) 계산.
+
+반복 요일은 alarm.repeat_mask 하나가 기준이다. 요일 번호는 API 와 같이 1(월) ~ 7(일) 이고
+비트 위치는 (요일 % 7), 즉 bit0 = 일요일, bit1 = 월요일 ... bit6 = 토요일. API 는 1 ~ 7 만 받고(schemas.Weekday)
+예전 데이터에 남은 0 은 일요일로 읽는다.
+alarm.repeat_days 문자열은 예전 클라이언트용 사본으로, 항상 마스크에서 만들어 같은 UPDATE 로 쓴다.
+
+next_fire_at 은 다음 울림 시각(UTC naive)이고 알람 시각은 KST 기준이다.
+비활성 알람, 이미 지난 1회성 알람(마스크 0)은 NULL.
+
+일시정지(paused_until, 휴가 모드)는 next_fire_at 을 다시 쓰지 않는다. next_fire_at 은 항상
+정지가 없을 때의 다음 울림이고, 읽는 쪽(upcoming, 스케줄러)이 paused_until 이전 울림을 건너뛴다.
+그래서 정지를 걸거나 풀 때 UPDATE 한 번이면 되고, 정지 기간이 끝나도 행을 다시 쓸 일이 없다.
+"""
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import bindparam, update
+from sqlalchemy.orm import Session
+
+import models
+from timeutils import utcnow
+
+# 스케줄러가 알람마다 매번 계산하므로 pytz 대신 고정 offset 사용 (KST 는 서머타임 없음)
+KST_OFFSET = timedelta(hours=9)
+
+# upcoming 이 읽는 지난 next_fire_at 의 하한. 반복 알람은 7일 안에 다시 울리므로 스케줄러가 이보다
+# 오래 멈춰 있지 않은 한 살아 있는 알람은 모두 이 범위 안에 있다 (하루 여유).
+STALE_WINDOW = timedelta(days=8)
+
+
+def days_to_mask(days: Optional[Iterable[int]]) -> int:
+    mask = 0
+    for wd in days or []:
+        mask |= 1 << (int(wd) % 7)
+    return mask
+
+
+def mask_to_days(mask: Optional[int]) -> List[int]:
+    return [wd for wd in range(1, 8) if (mask or 0) & (1 << (wd % 7))]
+
+
+def days_to_string(mask: int) -> str:
+    return ",".join(map(str, mask_to_days(mask)))
+
+
+def fires_on(mask: int, day: date) -> bool:
+    return bool(mask & (1 << (day.isoweekday() % 7)))
+
+
+def compute_next_fire(alarm_time: time, mask: int, status: str, after: Optional[datetime] = None) -> Optional[datetime]:
+    """after(UTC naive, 기본 지금) 이후 첫 울림 시각 (UTC naive)."""
+    if status != "Active" or alarm_time is None:
+        return None
+    after = after or utcnow()
+    today = (after + KST_OFFSET).date()
+    for offset in range(8):
+        day = today + timedelta(days=offset)
+        if mask and not fires_on(mask, day):
+            continue
+        fire = datetime.combine(day, alarm_time) - KST_OFFSET
+        if fire > after:
+            return fire
+    return None
+
+
+def resume_at(day: Optional[date]) -> Optional[datetime]:
+    """일시정지 해제 날짜(KST) → 그날 0시 (UTC naive). paused_until 컬럼 값."""
+    if day is None:
+        return None
+    return datetime.combine(day, time()) - KST_OFFSET
+
+
+def resume_day(paused_until: Optional[datetime]) -> Optional[date]:
+    """paused_until 컬럼 값 → 응답용 KST 날짜"""
+    if paused_until is None:
+        return None
+    return (paused_until + KST_OFFSET).date()
+
+
+def effective_next_fire(a, now: Optional[datetime] = None) -> Optional[datetime]:
+    """일시정지를 반영한 다음 울림 시각. 정지 중 울림은 건너뛰고, 1회성 알람이면 없다.
+
+    now 를 주면 스케줄러가 아직 옮기지 않은 지난 next_fire_at 도 now 이후 울림으로 계산한다 (DB 는 그대로).
+    """
+    fire, paused_until = a.next_fire_at, a.paused_until
+    if fire is not None and now is not None and fire <= now:
+        fire = compute_next_fire(a.time, a.repeat_mask, a.status, now) if a.repeat_mask else None
+    if fire is None or paused_until is None or fire >= paused_until:
+        return fire
+    if not a.repeat_mask:
+        return None
+    return compute_next_fire(a.time, a.repeat_mask, a.status, paused_until - timedelta(microseconds=1))
+
+
+def schedule_values(alarm_time: time, mask: int, status: str, after: Optional[datetime] = None) -> dict:
+    """알람 쓰기 시 같이 저장할 컬럼들."""
+    return {
+        "repeat_mask": mask,
+        "repeat_days": days_to_string(mask),
+        "next_fire_at": compute_next_fire(alarm_time, mask, status, after),
+    }
+
+
+def apply(alarm: models.Alarm, mask: Optional[int] = None, after: Optional[datetime] = None):
+    """ORM 알람 객체의 time / status 가 바뀐 뒤 호출 (mask 를 주면 반복 요일도 교체)."""
+    if mask is None:
+        mask = alarm.repeat_mask or 0
+    for key, value in schedule_values(alarm.time, mask, alarm.status, after).items():
+        setattr(alarm, key, value)
+
+
+def set_next_fire(db: Session, next_fire: Dict[str, Optional[datetime]], only_before: Optional[datetime] = None):
+    """alarm_id → next_fire_at 일괄 UPDATE (커밋은 호출하는 쪽에서).
+
+    파생 값만 바꾸는 것이므로 version / updated_at 은 그대로 둔다 (/sync 에 다시 잡히지 않게).
+    only_before 를 주면 그 사이 사용자 수정으로 이미 미래로 옮겨진 행은 건드리지 않는다.
+    """
+    if not next_fire:
+        return
+    table = models.Alarm.__table__
+    stmt = update(table).where(table.c.alarm_id == bindparam("b_id"))
+    if only_before is not None:
+        stmt = stmt.where(table.c.next_fire_at <= only_before)
+    db.execute(
+        stmt.values(
+            next_fire_at=bindparam("b_next", type_=table.c.next_fire_at.type),
+            version=table.c.version,
+            updated_at=table.c.updated_at,
+        ),
+        [{"b_id": alarm_id, "b_next": nxt} for alarm_id, nxt in next_fire.items()],
+    )
+
+
+def upcoming(db: Session, user_id: str, within: timedelta, now: Optional[datetime] = None) -> List[Tuple[datetime, models.Alarm]]:
+    """now ~ now + within 사이에 울릴 (울림 시각, 알람) 목록 (울림 시각 순).
+
+    (user_id, next_fire_at) 인덱스 범위 [now - STALE_WINDOW, now + within] 만 읽는다. 지난 시각이 남아 있는
+    알람은 다음 울림을 메모리에서만 계산한다 (읽기 요청에서 쓰지 않음, 옮겨 저장하는 것은 스케줄러 몫).
+    스케줄러 없이 STALE_WINDOW 보다 오래 지난 next_fire_at 은 범위에서 빠지며, 스케줄러가 다시 떠서
+    밀린 울림을 처리하거나 알람이 수정되어 next_fire_at 이 새로 계산되면 다시 잡힌다.
+    일시정지 중인 알람은 정지가 끝난 뒤 첫 울림이 범위 안에 있을 때만 넣는다
+    (그 시각은 항상 next_fire_at 이후이므로 같은 범위 조회로 충분하다).
+    """
+    now = now or utcnow()
+    alarm = models.Alarm
+    result = []
+    for a in db.query(alarm).filter(alarm.user_id == user_id,
+                                   alarm.next_fire_at >= now - STALE_WINDOW, alarm.next_fire_at <= now + within):
+        fire = effective_next_fire(a, now)
+        if fire is not None and fire <= now + within:
+            result.append((fire, a))
+    result.sort(key=lambda item: item[0])
+    return result
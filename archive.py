@@ -0,0 +1,296 @@
+"""오래된 수행 기록 보관 (alarm_exec_log / alarm_exec_routine → 월별 압축 파일).
+
+ARCHIVE_AFTER_DAYS 보다 오래된 달의 수행 기록을 사용자·월 단위로
+ARCHIVE_DIR/<user_id>/<YYYY-MM>.ndjson.gz (export 와 같은 NDJSON, 줄마다 "table")로 옮기고 원본 행을 지운다.
+달마다 execution_archive 에 요약 행(기록 수, done/total/rate_sum 합, 파일 경로와 sha256)이 남는다.
+hot 테이블 크기는 계정 나이가 아니라 보관 기간만큼으로 유지된다.
+
+/calendar, /weekly-feedback, /routine-stats 는 일자별 집계만 읽으므로 보관한 달도 그대로 보인다.
+보관할 때 집계는 지우지 않고, stats.rebuild 는 보관한 달의 집계를 다시 계산하지 않고 그대로 둔다.
+GET /alarm-executions 와 /export 에는 보관한 기록이 나오지 않는다 (필요하면 restore).
+
+- (사용자, 월) 하나가 한 트랜잭션이다. 파일을 임시 이름으로 쓰고 fsync → rename 한 뒤 요약 행을 쓰고
+  원본을 지우고 커밋한다. 커밋 전에 죽으면 원본이 그대로 남고, 다음 실행이 기존 파일과 id 기준으로 합쳐 다시 쓴다.
+- 이미 보관한 달에 나중에 들어온 기록도 다음 실행 때 같은 파일에 합쳐진다.
+- 삭제된 알람의 기록은 purge 워커가 지우므로 보관하지 않는다. scheduled_at 이 없는 기록은 달을 알 수 없어 남겨 둔다.
+- 보관한 뒤에 알람/루틴을 지워도 보관한 달의 집계에서는 빠지지 않는다 (restore 할 때 뺀다).
+
+    ARCHIVE_DIR=archive
+    ARCHIVE_AFTER_DAYS=365
+
+    python archive.py run                          # 보관 기간이 지난 달을 모두 옮김 (cron 으로 하루 한 번)
+    python archive.py list <user_id>
+    python archive.py restore <user_id> <YYYY-MM>  # 파일의 기록을 다시 넣고 요약 행 / 파일 삭제
+"""
+import gzip
+import hashlib
+import json
+import os
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Dict, List, Optional
+
+from pytz import utc
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.orm import Session
+
+import export
+import models
+import stats
+from database import env_int
+from timeutils import KST, month_range, utcnow
+
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "archive")
+ARCHIVE_AFTER_DAYS = env_int("ARCHIVE_AFTER_DAYS", 365)
+CHUNK = 500
+
+# 파일 안 테이블 순서와 행 id
+KEYS = {"alarm_exec_log": "exec_id", "alarm_exec_routine": "axr_id"}
+
+
+def cutoff_month(today: Optional[date] = None) -> date:
+    """이 달(KST 1일)보다 앞선 달만 보관한다. 보관 기간이 걸친 달은 통째로 남긴다."""
+    today = today or datetime.now(KST).date()
+    return (today - timedelta(days=ARCHIVE_AFTER_DAYS)).replace(day=1)
+
+
+def _utc(d: date) -> datetime:
+    """KST 날짜 0시 → UTC naive (scheduled_at 비교용)"""
+    return KST.localize(datetime(d.year, d.month, d.day)).astimezone(utc).replace(tzinfo=None)
+
+
+def _kst_month(dt: datetime) -> date:
+    return utc.localize(dt).astimezone(KST).date().replace(day=1)
+
+
+def relative_path(user_id: str, month_start: date) -> str:
+    return os.path.join(user_id, f"{month_start:%Y-%m}.ndjson.gz")
+
+
+def _full_path(path: str) -> str:
+    return os.path.join(ARCHIVE_DIR, path)
+
+
+# ---- 파일 ----
+
+def read_file(path: str) -> Dict[str, Dict[str, dict]]:
+    """table → 행 id → 행 (파일이 없으면 빈 dict 들)"""
+    rows = {table: {} for table in KEYS}
+    full = _full_path(path)
+    if os.path.exists(full):
+        with gzip.open(full, "rt", encoding="utf-8") as f:
+            for line in f:
+                item = json.loads(line)
+                table = item.pop("table")
+                rows[table][item[KEYS[table]]] = item
+    return rows
+
+
+def _write_file(path: str, rows: Dict[str, Dict[str, dict]]) -> str:
+    """임시 파일에 쓰고 fsync 한 뒤 rename. 파일 sha256 을 돌려준다."""
+    full = _full_path(path)
+    os.makedirs(os.path.dirname(full), exist_ok=True)
+    lines = (
+        json.dumps({"table": table, **row}, ensure_ascii=False) + "\n"
+        for table in KEYS for row in rows[table].values()
+    )
+    digest = hashlib.sha256()
+    tmp = full + ".tmp"
+    with open(tmp, "wb") as f:
+        for chunk in export.chunked(lines, compress=True):
+            f.write(chunk)
+            digest.update(chunk)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, full)
+    return digest.hexdigest()
+
+
+def _column_value(column, v):
+    """파일의 JSON 값 → 컬럼 타입 값"""
+    if v is None:
+        return None
+    kind = column.type.python_type
+    if kind is datetime:
+        return datetime.fromisoformat(v)
+    if kind is date:
+        return date.fromisoformat(v)
+    if kind is Decimal:
+        return Decimal(str(v))
+    return v
+
+
+def _db_row(table, row: dict) -> dict:
+    return {c.name: _column_value(c, row.get(c.name)) for c in table.columns}
+
+
+# ---- 보관 ----
+
+def _summarize(archive: models.ExecutionArchive, rows: Dict[str, Dict[str, dict]]):
+    logs = rows["alarm_exec_log"].values()
+    archive.log_count = len(rows["alarm_exec_log"])
+    archive.routine_count = len(rows["alarm_exec_routine"])
+    archive.exec_count = len(logs)
+    archive.done = sum(l["completed_routines"] for l in logs)
+    archive.total = sum(l["total_routines"] for l in logs)
+    archive.rate_sum = sum((Decimal(str(l["success_rate"])) for l in logs), Decimal(0))
+
+
+def archive_month(db: Session, user_id: str, month_start: date) -> Optional[models.ExecutionArchive]:
+    """사용자의 한 달 기록을 파일로 옮기고 요약 행을 남긴다 (커밋은 호출하는 쪽에서). 옮길 게 없으면 None."""
+    log, axr, alarm = models.AlarmExecutionLog, models.AlarmExecutionRoutine, models.Alarm
+    month_end = month_range(month_start.year, month_start.month)[1]
+    logs = db.execute(
+        select(*log.__table__.columns)
+        .join(alarm, (alarm.alarm_id == log.alarm_id) & alarm.deleted_at.is_(None))
+        .where(log.user_id == user_id, log.scheduled_at >= _utc(month_start), log.scheduled_at < _utc(month_end))
+    ).mappings().all()
+    if not logs:
+        return None
+    exec_ids = [l["exec_id"] for l in logs]
+    details = []
+    for i in range(0, len(exec_ids), CHUNK):
+        details += db.execute(
+            select(*axr.__table__.columns).where(axr.exec_id.in_(exec_ids[i:i + CHUNK]))
+        ).mappings().all()
+
+    # 이전 실행이 남긴 파일(이미 보관한 달 / 커밋 전에 멈춘 실행)과 합친다. 같은 id 는 DB 값이 이긴다
+    path = relative_path(user_id, month_start)
+    rows = read_file(path)
+    for table, items in (("alarm_exec_log", logs), ("alarm_exec_routine", details)):
+        for item in items:
+            row = {k: export.json_value(v) for k, v in item.items()}
+            rows[table][row[KEYS[table]]] = row
+    sha256 = _write_file(path, rows)
+
+    archive = db.get(models.ExecutionArchive, (user_id, month_start))
+    if archive is None:
+        archive = models.ExecutionArchive(user_id=user_id, month_start=month_start)
+        db.add(archive)
+    archive.month_end = month_end
+    archive.path = path
+    archive.sha256 = sha256
+    archive.archived_at = utcnow()
+    _summarize(archive, rows)
+
+    for i in range(0, len(exec_ids), CHUNK):
+        chunk = exec_ids[i:i + CHUNK]
+        db.execute(delete(axr).where(axr.exec_id.in_(chunk)))
+        db.execute(delete(log).where(log.exec_id.in_(chunk)))
+    return archive
+
+
+def run(db: Session, today: Optional[date] = None, user_id: Optional[str] = None) -> dict:
+    """보관 기간이 지난 달을 (사용자, 월) 마다 커밋하며 옮긴다."""
+    log = models.AlarmExecutionLog
+    cutoff = _utc(cutoff_month(today))
+    firsts = select(log.user_id, func.min(log.scheduled_at)).where(log.user_id.isnot(None), log.scheduled_at < cutoff)
+    if user_id:
+        firsts = firsts.where(log.user_id == user_id)
+    months = logs = 0
+    for uid, first in db.execute(firsts.group_by(log.user_id)).all():
+        while first is not None:
+            month_start = _kst_month(first)
+            archive = archive_month(db, uid, month_start)
+            db.commit()
+            if archive is not None:
+                months += 1
+                logs += archive.log_count
+            # 기록이 없는 달은 건너뛰고 그 다음 기록이 있는 달로
+            month_end = month_range(month_start.year, month_start.month)[1]
+            first = db.execute(
+                select(func.min(log.scheduled_at))
+                .where(log.user_id == uid, log.scheduled_at >= _utc(month_end), log.scheduled_at < cutoff)
+            ).scalar()
+    return {"months": months, "logs": logs}
+
+
+# ---- 조회 / 복원 ----
+
+def summaries(db: Session, user_id: str) -> list:
+    archive = models.ExecutionArchive
+    return [
+        {
+            "month": f"{a.month_start:%Y-%m}",
+            "exec_count": a.exec_count,
+            "done": a.done,
+            "total": a.total,
+            "success_rate": round(float(a.rate_sum) / a.exec_count, 2) if a.exec_count else 0.0,
+            "archived_at": a.archived_at,
+        }
+        for a in db.query(archive).filter(archive.user_id == user_id).order_by(archive.month_start)
+    ]
+
+
+def _existing(db: Session, column, ids: List[str], *criteria) -> set:
+    found = set()
+    for i in range(0, len(ids), CHUNK):
+        found.update(db.execute(select(column).where(column.in_(ids[i:i + CHUNK]), *criteria)).scalars())
+    return found
+
+
+def restore(db: Session, user_id: str, month_start: date) -> Optional[dict]:
+    """보관한 달의 기록을 hot 테이블로 되돌린다. 보관한 게 없으면 None.
+
+    알람/루틴이 그새 삭제됐으면 그 기록(루틴 결과)은 되돌리지 않고, 기록째 빠지는 것은 일자별 집계에서도 뺀다.
+    커밋한 뒤 파일을 지운다.
+    """
+    archive = db.get(models.ExecutionArchive, (user_id, month_start))
+    if archive is None:
+        return None
+    log, axr, alarm, routine = models.AlarmExecutionLog, models.AlarmExecutionRoutine, models.Alarm, models.Routine
+    rows = read_file(archive.path)
+    logs = [_db_row(log.__table__, r) for r in rows["alarm_exec_log"].values()]
+    details = [_db_row(axr.__table__, r) for r in rows["alarm_exec_routine"].values()]
+
+    live_alarms = _existing(db, alarm.alarm_id, list({l["alarm_id"] for l in logs}), alarm.deleted_at.is_(None))
+    live_routines = _existing(db, routine.routine_id, list({d["routine_id"] for d in details}), routine.deleted_at.is_(None))
+    present = _existing(db, log.exec_id, [l["exec_id"] for l in logs])
+
+    by_exec = defaultdict(list)
+    for d in details:
+        if d["routine_id"] in live_routines:
+            by_exec[d["exec_id"]].append(d)
+    restored = [l for l in logs if l["alarm_id"] in live_alarms and l["exec_id"] not in present]
+    dropped = [l for l in logs if l["alarm_id"] not in live_alarms and l["exec_id"] not in present]
+    restored_details = [d for l in restored for d in by_exec[l["exec_id"]]]
+
+    for i in range(0, len(restored), CHUNK):
+        db.execute(insert(log), restored[i:i + CHUNK])
+    for i in range(0, len(restored_details), CHUNK):
+        db.execute(insert(axr), restored_details[i:i + CHUNK])
+    stats.record_execution_rows(db, [(user_id, l, by_exec[l["exec_id"]]) for l in dropped], sign=-1)
+    db.delete(archive)
+    db.commit()
+
+    full = _full_path(archive.path)
+    if os.path.exists(full):
+        os.remove(full)
+    return {"restored": len(restored), "routines": len(restored_details), "dropped": len(dropped)}
+
+
+if __name__ == "__main__":
+    import sys
+
+    from database import SessionLocal, engine
+
+    command = sys.argv[1] if len(sys.argv) > 1 else None
+    if command not in ("run", "list", "restore") or (command == "list" and len(sys.argv) < 3) \
+            or (command == "restore" and len(sys.argv) < 4):
+        print(__doc__)
+        sys.exit(1)
+    models.Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        if command == "run":
+            print(run(db, user_id=sys.argv[2] if len(sys.argv) > 2 else None))
+        elif command == "list":
+            for item in summaries(db, sys.argv[2]):
+                print(item)
+        else:
+            year, month = map(int, sys.argv[3].split("-"))
+            result = restore(db, sys.argv[2], date(year, month, 1))
+            print(result if result is not None else "no archive for that month")
+    finally:
+        db.close()
@@ -0,0 +1,86 @@
+"""비동기 DB 모드 (DB_ASYNC=1) 에서 엔드포인트를 async 로 바꿔 끼운다.
+
+기존 sync 핸들러 로직은 그대로 두고, AsyncSession.run_sync 로 실행한다.
+run_sync 안의 쿼리는 async 드라이버(aiomysql / aiosqlite) 위에서 greenlet 으로 돌기 때문에
+DB 응답을 기다리는 동안 threadpool 스레드를 붙잡지 않고 이벤트 루프로 양보한다.
+대신 핸들러 안의 DB 밖 blocking 호출(쓰기 지연 spool fsync, sync 엔진 flush 등)은 이벤트 루프를
+그대로 막으므로 offload() 로 감싸 threadpool 에서 돌린다.
+"""
+import functools
+import inspect
+
+from fastapi import Depends, FastAPI, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.routing import APIRoute
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.util.concurrency import await_only, in_greenlet
+
+import database
+import routing
+
+# add_api_route 로 그대로 넘길 라우트 속성
+ROUTE_FIELDS = (
+    "response_model", "status_code", "tags", "summary", "description", "response_description",
+    "responses", "deprecated", "name", "response_class", "include_in_schema",
+)
+
+
+async def get_async_db(request: Request):
+    async with routing.session_factory(routing.target_for(request), async_mode=True)() as db:
+        yield db
+        routing.after_request(request, db)
+
+
+def offload(fn, *args, **kwargs):
+    """blocking 호출 fn 을 이벤트 루프 밖에서 돌린다.
+
+    run_sync 안(이벤트 루프 위 greenlet)이면 threadpool 에 넘기고 그동안 루프로 양보한다.
+    sync 모드에서는 이미 threadpool 스레드이므로 그냥 부른다.
+    """
+    if in_greenlet():
+        return await_only(run_in_threadpool(fn, *args, **kwargs))
+    return fn(*args, **kwargs)
+
+
+def asyncify(endpoint, get_db):
+    """db: Session = Depends(get_db) 를 받는 sync 핸들러 → AsyncSession 을 받는 async 핸들러."""
+    sig = inspect.signature(endpoint)
+    params = [
+        p.replace(annotation=AsyncSession, default=Depends(get_async_db)) if p.name == "db" else p
+        for p in sig.parameters.values()
+    ]
+
+    @functools.wraps(endpoint)
+    async def wrapper(*args, db: AsyncSession, **kwargs):
+        return await db.run_sync(lambda session: endpoint(*args, db=session, **kwargs))
+
+    wrapper.__signature__ = sig.replace(parameters=params)
+    return wrapper
+
+
+def uses_db(route, get_db) -> bool:
+    return any(d.call is get_db for d in route.dependant.dependencies)
+
+
+async def dispose_async_engine():
+    # aiosqlite / aiomysql 커넥션을 닫아야 워커 종료가 막히지 않는다
+    await database.async_engine.dispose()
+    if database.async_replica_engine is not None:
+        await database.async_replica_engine.dispose()
+
+
+def install(app: FastAPI, get_db):
+    """app 의 DB 사용 라우트를 같은 경로/순서의 async 라우트로 교체한다."""
+    app.router.on_shutdown.append(dispose_async_engine)
+    routes = list(app.router.routes)
+    app.router.routes.clear()
+    for route in routes:
+        if isinstance(route, APIRoute) and uses_db(route, get_db) and not inspect.iscoroutinefunction(route.endpoint):
+            app.router.add_api_route(
+                route.path,
+                asyncify(route.endpoint, get_db),
+                methods=list(route.methods),
+                **{f: getattr(route, f) for f in ROUTE_FIELDS},
+            )
+        else:
+            app.router.routes.append(route)
@@ -0,0 +1,175 @@
+"""sync / async DB 모드의 동시 처리량 비교.
+
+같은 DB 에 대해 DB_ASYNC=0, DB_ASYNC=1 로 각각 서브프로세스를 띄워
+POST /alarm-executions (--path write) 또는 GET /alarms/upcoming (--path read) 를 높은 동시성으로 보내고
+처리량/지연을 비교한다.
+
+    python benchmarks/bench_async.py --requests 5000 --concurrency 1000
+    DATABASE_URL=mysql+pymysql://root:@localhost:3306/bench python benchmarks/bench_async.py
+
+DATABASE_URL 이 없으면 임시 SQLite 파일을 쓴다. 로컬 SQLite 는 쿼리 왕복 시간이 거의 0 이라
+threadpool 을 붙잡는 비용이 드러나지 않고, async 드라이버로 동시에 쓰면 잠금 충돌이 난다.
+그래서 SQLite 로 볼 때는 --db-latency-ms 로 쿼리마다 네트워크 왕복만큼 기다리게 하고
+(sync 는 스레드가 sleep, async 는 이벤트 루프로 양보), 읽기 경로나 쓰기 지연 모드로 돌린다.
+
+    DB_POOL_SIZE=100 python benchmarks/bench_async.py --path read --db-latency-ms 2
+    DB_POOL_SIZE=100 WRITE_BEHIND_ENABLED=1 python benchmarks/bench_async.py --db-latency-ms 2
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from datetime import time as time_type
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def seed():
+    import database
+    import models
+
+    models.Base.metadata.create_all(bind=database.engine)
+    db = database.SessionLocal()
+    user_id = str(uuid.uuid4())
+    db.add(models.AppUser(user_id=user_id, email=f"{user_id}@bench.local", name="bench"))
+    routine_ids = []
+    for i in range(3):
+        r = models.Routine(user_id=user_id, title=f"routine {i}", type="simple")
+        db.add(r)
+        db.flush()
+        routine_ids.append(r.routine_id)
+    alarm = models.Alarm(user_id=user_id, time=time_type(7, 0), sound_volume=0.8)
+    db.add(alarm)
+    db.commit()
+    alarm_id = alarm.alarm_id
+    db.close()
+    return user_id, alarm_id, routine_ids
+
+
+def add_db_latency(seconds: float):
+    """쿼리마다 seconds 만큼 DB 왕복을 흉내 낸다 (run_sync 안이면 이벤트 루프로 양보)."""
+    from sqlalchemy import event
+    from sqlalchemy.util.concurrency import await_only, in_greenlet
+
+    import database
+
+    def delay(*_):
+        if in_greenlet():
+            await_only(asyncio.sleep(seconds))
+        else:
+            time.sleep(seconds)
+
+    for eng in (database.engine, database.async_engine and database.async_engine.sync_engine):
+        if eng is not None:
+            event.listen(eng, "before_cursor_execute", delay)
+
+
+async def run_hooks(hooks):
+    # lifespan 없이 앱을 돌리므로 시작/종료 훅을 직접 실행 (sync 훅은 스레드에서)
+    for hook in hooks:
+        await hook() if asyncio.iscoroutinefunction(hook) else await asyncio.to_thread(hook)
+
+
+async def drive(app, user_id, alarm_id, routine_ids, total, concurrency, path="write"):
+    import httpx
+
+    payload = {
+        "alarm_id": alarm_id,
+        "scheduled_ts": "2025-06-01T22:00:00Z",
+        "dismissed_ts": "2025-06-01T22:05:00Z",
+        "routines": [{"routine_id": rid, "completed": True, "order": i + 1} for i, rid in enumerate(routine_ids)],
+    }
+    latencies = []
+    errors = 0
+
+    async def request(client):
+        if path == "read":
+            return await client.get("/alarms/upcoming", params={"within": 24 * 60}, headers={"user-id": user_id})
+        return await client.post("/alarm-executions", json=payload)
+
+    queue = asyncio.Queue()
+    for _ in range(total):
+        queue.put_nowait(None)
+
+    async def worker(client):
+        nonlocal errors
+        while not queue.empty():
+            queue.get_nowait()
+            t0 = time.perf_counter()
+            r = await request(client)
+            latencies.append(time.perf_counter() - t0)
+            if r.status_code != 200:
+                errors += 1
+
+    await run_hooks(app.router.on_startup)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        # 커넥션 풀 / threadpool 을 먼저 채워 두고 잰다
+        await asyncio.gather(*(request(client) for _ in range(concurrency)))
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    await run_hooks(app.router.on_shutdown)
+
+    latencies.sort()
+    q = statistics.quantiles(latencies, n=100)
+    return {
+        "requests": total,
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "rps": round(total / elapsed, 1),
+        "p50_ms": round(q[49] * 1000, 1),
+        "p95_ms": round(q[94] * 1000, 1),
+        "p99_ms": round(q[98] * 1000, 1),
+    }
+
+
+def child(args):
+    sys.path.insert(0, ROOT)
+    user_id, alarm_id, routine_ids = seed()
+    import main
+
+    if args.db_latency_ms:
+        add_db_latency(args.db_latency_ms / 1000)
+    result = asyncio.run(drive(main.app, user_id, alarm_id, routine_ids, args.requests, args.concurrency, args.path))
+    print(json.dumps(result))
+
+
+def parent(args):
+    env = dict(os.environ)
+    if "DATABASE_URL" not in env:
+        env["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench_async.db")
+    print(f"DATABASE_URL={env['DATABASE_URL']}  path={args.path}  requests={args.requests}  "
+          f"concurrency={args.concurrency}  db_latency_ms={args.db_latency_ms}")
+    print(f"{'mode':<6} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for mode in ("0", "1"):
+        proc = subprocess.run(
+            [sys.executable, __file__, "--child", "--requests", str(args.requests), "--concurrency", str(args.concurrency),
+             "--path", args.path, "--db-latency-ms", str(args.db_latency_ms)],
+            env={**env, "DB_ASYNC": mode, "WRITE_BEHIND_SPOOL": os.path.join(tempfile.mkdtemp(), "bench.spool")},
+            capture_output=True, text=True,
+        )
+        if proc.returncode != 0:
+            sys.exit(proc.stderr)
+        r = json.loads(proc.stdout.strip().splitlines()[-1])
+        name = "async" if mode == "1" else "sync"
+        print(f"{name:<6} {r['rps']:>9} {r['p50_ms']:>9} {r['p95_ms']:>9} {r['p99_ms']:>9} {r['errors']:>7}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=500)
+    parser.add_argument("--path", choices=("write", "read"), default="write",
+                        help="write: POST /alarm-executions, read: GET /alarms/upcoming")
+    parser.add_argument("--db-latency-ms", type=float, default=0, help="쿼리마다 더할 DB 왕복 시간 (SQLite 용)")
+    parser.add_argument("--child", action="store_true")
+    args = parser.parse_args()
+    child(args) if args.child else parent(args)
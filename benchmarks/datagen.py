@@ -0,0 +1,161 @@
+"""벤치마크용 합성 데이터 생성기 (seed 고정 → 같은 인자면 같은 데이터).
+
+사용자 N 명마다 루틴/알람/알람-루틴 연결을 만들고, 알람마다 반복 요일에 맞춰
+years 년치 수행 기록(루틴별 결과 포함)을 넣은 뒤 일자별 집계를 다시 계산한다.
+
+    python benchmarks/datagen.py --users 20 --years 2
+    DATABASE_URL=mysql+pymysql://root:@localhost:3306/bench python benchmarks/datagen.py --users 1000
+
+DATABASE_URL 이 없으면 임시 SQLite 파일을 만들고 경로를 출력한다.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import date, datetime, time as dt_time, timedelta
+from typing import Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db"))
+
+from sqlalchemy import insert  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+
+import alarm_schedule  # noqa: E402
+import executions  # noqa: E402
+import models  # noqa: E402
+import stats  # noqa: E402
+from timeutils import parse_client_ts  # noqa: E402
+
+CHUNK = 2000
+
+
+@dataclass
+class Dataset:
+    """생성된 키들 (벤치마크 시나리오가 요청 대상을 고를 때 사용)."""
+    users: List[str] = field(default_factory=list)
+    routines: Dict[str, List[str]] = field(default_factory=dict)   # user_id → routine_ids
+    alarms: Dict[str, List[str]] = field(default_factory=dict)     # user_id → alarm_ids
+    links: Dict[str, List[str]] = field(default_factory=dict)      # alarm_id → routine_ids (order 순)
+    end_date: date = None
+    exec_logs: int = 0
+
+
+def generate(
+    engine,
+    users: int = 10,
+    routines_per_user: int = 8,
+    alarms_per_user: int = 3,
+    routines_per_alarm: int = 3,
+    years: float = 1,
+    seed: int = 42,
+    end_date: date = date(2025, 6, 30),
+) -> Dataset:
+    rng = random.Random(seed)
+    new_id = lambda: str(uuid.UUID(int=rng.getrandbits(128), version=4))  # noqa: E731
+    ds = Dataset(end_date=end_date)
+    days = int(365 * years)
+    start_date = end_date - timedelta(days=days - 1)
+
+    rows = {m: [] for m in (models.AppUser, models.Routine, models.Alarm, models.AlarmRoutine,
+                            models.AlarmExecutionLog, models.AlarmExecutionRoutine)}
+
+    def flush(conn, force=False):
+        # FK 순서(사용자 → 루틴/알람 → 기록)대로 한꺼번에 넣는다
+        if not force and all(len(pending) < CHUNK for pending in rows.values()):
+            return
+        for model, pending in rows.items():
+            if pending:
+                conn.execute(insert(model), pending)
+                pending.clear()
+
+    with engine.begin() as conn:
+        for _ in range(users):
+            user_id = new_id()
+            ds.users.append(user_id)
+            rows[models.AppUser].append({"user_id": user_id, "email": f"{user_id}@bench.local", "name": "bench"})
+
+            routine_ids = [new_id() for _ in range(routines_per_user)]
+            ds.routines[user_id] = routine_ids
+            for i, rid in enumerate(routine_ids):
+                rows[models.Routine].append({
+                    "routine_id": rid, "user_id": user_id, "title": f"routine {i}",
+                    "type": rng.choice(("simple", "count", "timer")), "goal_value": rng.randint(1, 30),
+                    "duration_seconds": rng.choice((None, 60, 300)),
+                    "deadline_time": dt_time(rng.randint(6, 11), 0), "success_note": None,
+                })
+
+            ds.alarms[user_id] = []
+            for _ in range(alarms_per_user):
+                alarm_id = new_id()
+                ds.alarms[user_id].append(alarm_id)
+                alarm_time = dt_time(rng.randint(5, 9), rng.choice((0, 15, 30, 45)))
+                mask = alarm_schedule.days_to_mask(rng.sample(range(1, 8), rng.randint(3, 7)))
+                rows[models.Alarm].append({
+                    "alarm_id": alarm_id, "user_id": user_id, "time": alarm_time, "vibration_on": True,
+                    "sound_volume": 0.8, "status": "Active",
+                    **alarm_schedule.schedule_values(alarm_time, mask, "Active"),
+                })
+                linked = rng.sample(routine_ids, min(routines_per_alarm, len(routine_ids)))
+                ds.links[alarm_id] = linked
+                for order, rid in enumerate(linked, 1):
+                    rows[models.AlarmRoutine].append(
+                        {"alr_id": new_id(), "alarm_id": alarm_id, "routine_id": rid, "order": order})
+
+                # 반복 요일마다 수행 기록
+                for d in range(days):
+                    day = start_date + timedelta(days=d)
+                    if not alarm_schedule.fires_on(mask, day):
+                        continue
+                    exec_id = new_id()
+                    fire = datetime.combine(day, alarm_time) - alarm_schedule.KST_OFFSET
+                    ts = fire.isoformat() + "Z"
+                    scheduled_at, scheduled_date = parse_client_ts(ts)
+                    missed = rng.random() < 0.05
+                    done = [not missed and rng.random() < 0.7 for _ in linked]
+                    completed = sum(done)
+                    rate, status = (0.0, "MISSED") if missed else executions.summarize(len(linked), completed)
+                    rows[models.AlarmExecutionLog].append({
+                        "exec_id": exec_id, "alarm_id": alarm_id, "user_id": user_id,
+                        "scheduled_ts": ts, "dismissed_ts": None if missed else ts,
+                        "scheduled_at": scheduled_at, "scheduled_date": scheduled_date,
+                        "total_routines": len(linked), "completed_routines": completed,
+                        "success_rate": rate, "status": status,
+                    })
+                    for order, (rid, ok) in enumerate(zip(linked, done), 1):
+                        rows[models.AlarmExecutionRoutine].append({
+                            "axr_id": new_id(), "exec_id": exec_id, "routine_id": rid, "completed": int(ok),
+                            "actual_value": None, "completed_ts": None, "abort_ts": None, "order": order,
+                        })
+                    ds.exec_logs += 1
+                flush(conn)
+        flush(conn, force=True)
+
+    with Session(engine) as db:
+        stats.rebuild(db)
+        db.commit()
+    return ds
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="벤치마크용 합성 데이터 생성")
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--routines", type=int, default=8, help="사용자당 루틴 수")
+    parser.add_argument("--alarms", type=int, default=3, help="사용자당 알람 수")
+    parser.add_argument("--routines-per-alarm", type=int, default=3)
+    parser.add_argument("--years", type=float, default=1)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    from database import engine
+    models.Base.metadata.create_all(bind=engine)
+    started = time.perf_counter()
+    ds = generate(engine, args.users, args.routines, args.alarms, args.routines_per_alarm, args.years, args.seed)
+    print(f"{os.environ['DATABASE_URL']}: {len(ds.users)} users, {ds.exec_logs} execution logs "
+          f"in {time.perf_counter() - started:.1f}s")
@@ -0,0 +1,130 @@
+"""id 저장 형식별 INSERT 처리량 / 테이블·인덱스 크기 비교.
+
+alarm_exec_log 와 같은 모양의 테이블(PK + (alarm_id, scheduled_date), (user_id, scheduled_at, exec_id) 인덱스)에
+같은 행 수를 넣어 본다.
+
+    char36/uuid4   : 예전 형식 (CHAR(36) + 무작위 uuid4)
+    binary16/uuid4 : 크기만 줄인 경우
+    binary16/uuid7 : 지금 형식 (BINARY(16) + 시간순 UUIDv7, ids.py)
+
+SQLite 는 InnoDB 처럼 PK 순서로 행을 저장하도록 WITHOUT ROWID 테이블을 쓴다.
+MySQL 에서 보려면 --url 로 빈 스키마를 준다 (information_schema 의 data/index 크기).
+
+    python benchmarks/key_format.py --rows 200000
+    python benchmarks/key_format.py --url mysql+pymysql://root:@localhost:3306/bench
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+from datetime import date, datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from sqlalchemy import BINARY, Column, Date, DateTime, Index, MetaData, String, Table, create_engine, insert, text  # noqa: E402
+from sqlalchemy.dialects.mysql import CHAR  # noqa: E402
+
+import ids  # noqa: E402
+
+VARIANTS = {
+    "char36/uuid4": (CHAR(36), lambda: str(uuid.uuid4())),
+    "binary16/uuid4": (BINARY(16), lambda: uuid.uuid4().bytes),
+    "binary16/uuid7": (BINARY(16), lambda: ids.uuid7().bytes),
+}
+
+
+def make_table(metadata: MetaData, name: str, key_type) -> Table:
+    return Table(
+        name, metadata,
+        Column("exec_id", key_type, primary_key=True),
+        Column("alarm_id", key_type, nullable=False),
+        Column("user_id", key_type, nullable=False),
+        Column("scheduled_at", DateTime, nullable=False),
+        Column("scheduled_date", Date, nullable=False),
+        Column("status", String(20), nullable=False),
+        Index(f"ix_{name}_alarm_date", "alarm_id", "scheduled_date"),
+        Index(f"ix_{name}_user_sched", "user_id", "scheduled_at", "exec_id"),
+        sqlite_with_rowid=False,
+    )
+
+
+def fill(engine, table: Table, new_key, rows: int, batch: int, users: int, alarms_per_user: int) -> float:
+    """batch 행씩 트랜잭션 하나로 넣는다. 초당 행 수."""
+    rng = random.Random(0)
+    owners = [new_key() for _ in range(users)]
+    alarms = [(u, new_key()) for u in owners for _ in range(alarms_per_user)]
+    start_at = datetime(2024, 1, 1)
+    started = time.perf_counter()
+    for offset in range(0, rows, batch):
+        values = []
+        for i in range(offset, min(offset + batch, rows)):
+            user_id, alarm_id = rng.choice(alarms)
+            at = start_at + timedelta(minutes=i)
+            values.append({
+                "exec_id": new_key(), "alarm_id": alarm_id, "user_id": user_id,
+                "scheduled_at": at, "scheduled_date": at.date(), "status": "SUCCESS",
+            })
+        with engine.begin() as conn:
+            conn.execute(insert(table), values)
+    return rows / (time.perf_counter() - started)
+
+
+def sizes(engine, table: Table) -> dict:
+    """테이블(PK 포함) / 보조 인덱스 바이트"""
+    with engine.connect() as conn:
+        if engine.dialect.name == "mysql":
+            conn.execute(text(f"ANALYZE TABLE `{table.name}`"))
+            data, index = conn.execute(text(
+                "SELECT data_length, index_length FROM information_schema.tables "
+                "WHERE table_schema = DATABASE() AND table_name = :t"
+            ), {"t": table.name}).one()
+            return {"table": int(data), "indexes": int(index)}
+        pages = dict(conn.execute(text("SELECT name, SUM(pgsize) FROM dbstat GROUP BY name")).all())
+        return {
+            "table": int(pages.get(table.name, 0)),
+            "indexes": int(sum(pages.get(i.name, 0) for i in table.indexes)),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--batch", type=int, default=500, help="트랜잭션당 행 수")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--alarms-per-user", type=int, default=3)
+    parser.add_argument("--url", help="비우면 변형마다 임시 SQLite 파일")
+    args = parser.parse_args()
+
+    print(f"rows={args.rows} batch={args.batch}")
+    print(f"{'variant':<16} {'rows/s':>10} {'table MB':>9} {'index MB':>9} {'total MB':>9}")
+    results = {}
+    for variant, (key_type, new_key) in VARIANTS.items():
+        name = "bench_" + variant.replace("/", "_")
+        engine = create_engine(args.url or "sqlite:///" + os.path.join(tempfile.mkdtemp(), name + ".db"))
+        metadata = MetaData()
+        table = make_table(metadata, name, key_type)
+        metadata.drop_all(engine)
+        metadata.create_all(engine)
+        try:
+            rate = fill(engine, table, new_key, args.rows, args.batch, args.users, args.alarms_per_user)
+            size = sizes(engine, table)
+        finally:
+            if args.url:
+                metadata.drop_all(engine)
+            engine.dispose()
+        results[variant] = (rate, size)
+        mb = lambda n: n / 1024 / 1024  # noqa: E731
+        print(f"{variant:<16} {rate:>10.0f} {mb(size['table']):>9.2f} {mb(size['indexes']):>9.2f} "
+              f"{mb(size['table'] + size['indexes']):>9.2f}")
+
+    (old_rate, old), (new_rate, new) = results["char36/uuid4"], results["binary16/uuid7"]
+    print(f"\nbinary16/uuid7 vs char36/uuid4: insert x{new_rate / old_rate:.2f}, "
+          f"size x{(new['table'] + new['indexes']) / (old['table'] + old['indexes']):.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""가상 시계로 하루치 알람 스케줄러를 돌려 MISSED 기록 속도/정확성을 확인한다.
+
+알람을 대량으로 만들고 그중 일부는 그날 수행 기록을 미리 넣어 둔 뒤,
+스케줄러가 나머지만 정확히 MISSED 로 채우는지(중복 없이) 확인한다.
+
+    python benchmarks/scheduler_sim.py --alarms 100000
+    python benchmarks/scheduler_sim.py --alarms 10000 --done-ratio 0.5
+
+DATABASE_URL 이 없으면 임시 SQLite 파일을 쓴다.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, time as time_type, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.mkdtemp(), "scheduler_sim.db"))
+
+from sqlalchemy import func, insert  # noqa: E402
+
+import alarm_schedule  # noqa: E402
+import database  # noqa: E402
+import models  # noqa: E402
+from scheduler import AlarmScheduler, VirtualClock  # noqa: E402
+from timeutils import parse_client_ts  # noqa: E402
+
+START = datetime(2025, 6, 1, 15, 0)   # KST 2025-06-02 00:00
+CHUNK = 5000
+
+
+def seed(n_alarms: int, alarms_per_user: int, done_ratio: float):
+    models.Base.metadata.create_all(bind=database.engine)
+    rng = random.Random(42)
+    users, routines, alarms, links, logs = [], [], [], [], []
+    user_id = routine_id = None
+    for i in range(n_alarms):
+        if i % alarms_per_user == 0:
+            user_id, routine_id = str(uuid.uuid4()), str(uuid.uuid4())
+            users.append({"user_id": user_id, "email": f"{user_id}@sim.local", "name": "sim"})
+            routines.append({"routine_id": routine_id, "user_id": user_id, "title": "r", "type": "simple"})
+        alarm_id = str(uuid.uuid4())
+        alarm_time = time_type(rng.randrange(24), rng.randrange(60))
+        mask = alarm_schedule.days_to_mask(range(1, 8))
+        alarms.append({
+            "alarm_id": alarm_id, "user_id": user_id, "time": alarm_time, "vibration_on": True,
+            "sound_volume": 0.8, "status": "Active",
+            **alarm_schedule.schedule_values(alarm_time, mask, "Active", START),
+        })
+        links.append({"alr_id": str(uuid.uuid4()), "alarm_id": alarm_id, "routine_id": routine_id, "order": 1})
+        if rng.random() < done_ratio:
+            ts = alarms[-1]["next_fire_at"].isoformat() + "Z"
+            at, day = parse_client_ts(ts)
+            logs.append({
+                "exec_id": str(uuid.uuid4()), "alarm_id": alarm_id, "user_id": user_id,
+                "scheduled_ts": ts, "dismissed_ts": ts, "scheduled_at": at, "scheduled_date": day,
+                "total_routines": 1, "completed_routines": 1, "success_rate": 1.0, "status": "SUCCESS",
+            })
+    with database.engine.begin() as conn:
+        for model, rows in ((models.AppUser, users), (models.Routine, routines), (models.Alarm, alarms),
+                            (models.AlarmRoutine, links), (models.AlarmExecutionLog, logs)):
+            for i in range(0, len(rows), CHUNK):
+                conn.execute(insert(model), rows[i:i + CHUNK])
+    return len(logs)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--alarms", type=int, default=100_000)
+    parser.add_argument("--alarms-per-user", type=int, default=5)
+    parser.add_argument("--done-ratio", type=float, default=0.3)
+    parser.add_argument("--step-minutes", type=float, default=10, help="가상 시계 tick 간격")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    done = seed(args.alarms, args.alarms_per_user, args.done_ratio)
+    print(f"seeded {args.alarms} alarms ({done} already executed) in {time.perf_counter() - started:.1f}s")
+
+    clock = VirtualClock(START)
+    sched = AlarmScheduler(database.SessionLocal, clock=clock)
+    started = time.perf_counter()
+    sched.load()
+    loaded = time.perf_counter() - started
+    started = time.perf_counter()
+    # 하루 동안 울린 알람의 유예 시간까지 처리
+    missed = sched.simulate(START + timedelta(days=1) + sched.grace, step=timedelta(minutes=args.step_minutes))
+    elapsed = time.perf_counter() - started
+
+    db = database.SessionLocal()
+    log = models.AlarmExecutionLog
+    stored = db.query(func.count()).filter(log.status == "MISSED").scalar()
+    counts = db.query(log.alarm_id, func.count().label("n")).group_by(log.alarm_id).subquery()
+    per_alarm = db.query(func.max(counts.c.n)).scalar()
+    stats_total = db.query(func.sum(models.UserDailyStats.exec_count)).scalar()
+    db.close()
+
+    expected = args.alarms - done
+    print(f"load {loaded:.2f}s, simulated 1 day in {elapsed:.2f}s: {missed} MISSED written ({stored} stored)")
+    ok = missed == expected == stored and stats_total == missed and per_alarm == 1
+    print(f"expected {expected} MISSED, rollup exec_count {stats_total}, max logs per alarm {per_alarm}: "
+          + ("OK" if ok else "MISMATCH"))
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""조회 엔드포인트별 직렬화/조회 처리량 비교 (큰 계정 기준).
+
+1. render : 같은 응답 값을 기존 경로(response_model 검증 + jsonable_encoder + json) 와
+            FastJSONResponse(orjson) 로 각각 bytes 로 만드는 속도
+2. query  : ORM 객체 전체 로딩 후 dict 변환 vs 필요한 컬럼만 Core 행으로 읽기
+3. request: 캐시를 끈 상태(CACHE_BACKEND=none)에서 엔드포인트 전체 요청 처리량
+
+    python benchmarks/serialize.py --routines 500 --alarms 200
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import uuid
+from datetime import time as dt_time
+from typing import List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.mkdtemp(), "serialize.db"))
+os.environ["CACHE_BACKEND"] = "none"
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from pydantic import TypeAdapter  # noqa: E402
+from sqlalchemy import insert  # noqa: E402
+
+import alarm_schedule  # noqa: E402
+import database  # noqa: E402
+import main  # noqa: E402
+import models  # noqa: E402
+import schemas  # noqa: E402
+from serializers import FastJSONResponse, routine_out, select_routines  # noqa: E402
+
+
+def seed(n_routines: int, n_alarms: int, per_alarm: int) -> str:
+    user_id = str(uuid.uuid4())
+    routines = [
+        {"routine_id": str(uuid.uuid4()), "user_id": user_id, "title": f"routine {i}", "type": "simple",
+         "goal_value": i, "duration_seconds": 60, "success_note": "좋아요"}
+        for i in range(n_routines)
+    ]
+    alarms, links = [], []
+    for i in range(n_alarms):
+        alarm_id = str(uuid.uuid4())
+        t = dt_time(i % 24, i % 60)
+        alarms.append({"alarm_id": alarm_id, "user_id": user_id, "time": t, "vibration_on": True,
+                       "sound_volume": 0.8, "status": "Active",
+                       **alarm_schedule.schedule_values(t, alarm_schedule.days_to_mask([1, 3, 5]), "Active")})
+        links += [
+            {"alr_id": str(uuid.uuid4()), "alarm_id": alarm_id,
+             "routine_id": routines[(i * per_alarm + j) % n_routines]["routine_id"], "order": j + 1}
+            for j in range(per_alarm)
+        ]
+    with database.engine.begin() as conn:
+        conn.execute(insert(models.AppUser), [{"user_id": user_id, "email": f"{user_id}@bench.local", "name": "b"}])
+        conn.execute(insert(models.Routine), routines)
+        conn.execute(insert(models.Alarm), alarms)
+        conn.execute(insert(models.AlarmRoutine), links)
+    return user_id
+
+
+def rate(fn, seconds: float = 1.0) -> float:
+    n, started = 0, time.perf_counter()
+    while time.perf_counter() - started < seconds:
+        fn()
+        n += 1
+    return n / (time.perf_counter() - started)
+
+
+def main_():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--routines", type=int, default=500)
+    parser.add_argument("--alarms", type=int, default=200)
+    parser.add_argument("--routines-per-alarm", type=int, default=5)
+    parser.add_argument("--seconds", type=float, default=1.0)
+    args = parser.parse_args()
+
+    user_id = seed(args.routines, args.alarms, args.routines_per_alarm)
+    headers = {"user-id": user_id}
+    client = TestClient(main.app)
+    alarm_id = client.get("/alarms", headers=headers).json()[0]["alarm_id"]
+
+    endpoints = {
+        "GET /routines": (lambda: client.get("/routines", headers=headers), List[schemas.RoutineOut]),
+        "GET /alarms": (lambda: client.get("/alarms", headers=headers), List[schemas.AlarmOut]),
+        "GET /alarms/{id}": (lambda: client.get(f"/alarms/{alarm_id}", headers=headers), None),
+        "GET /dashboard": (lambda: client.get("/dashboard", params={"user_id": user_id}), None),
+    }
+
+    print(f"render (responses/s, {args.routines} routines / {args.alarms} alarms)")
+    print(f"{'endpoint':<20}{'model+json':>14}{'orjson':>12}{'speedup':>10}")
+    for name, (call, model) in endpoints.items():
+        payload = call().json()
+        adapter = TypeAdapter(model) if model else None
+
+        def old():
+            value = adapter.dump_python(adapter.validate_python(payload)) if adapter else payload
+            return JSONResponse(jsonable_encoder(value)).body
+
+        def new():
+            return FastJSONResponse(payload).body
+
+        a, b = rate(old, args.seconds), rate(new, args.seconds)
+        print(f"{name:<20}{a:>14.0f}{b:>12.0f}{b / a:>9.1f}x")
+
+    print("\nquery (routine list/s)")
+    db = database.SessionLocal()
+
+    def orm():
+        rows = db.query(models.Routine).filter(models.Routine.user_id == user_id).all()
+        db.expunge_all()
+        return [routine_out(r) for r in rows]
+
+    def core():
+        return [routine_out(r) for r in select_routines(db, models.Routine.user_id == user_id)]
+
+    a, b = rate(orm, args.seconds), rate(core, args.seconds)
+    print(f"{'ORM objects':<20}{a:>14.0f}\n{'Core columns':<20}{b:>14.0f}{b / a:>21.1f}x")
+    db.close()
+
+    print("\nrequest (req/s, cache off)")
+    for name, (call, _) in endpoints.items():
+        print(f"{name:<20}{rate(call, args.seconds):>14.0f}")
+
+
+if __name__ == "__main__":
+    main_()
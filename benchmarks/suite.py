@@ -0,0 +1,213 @@
+"""엔드포인트별 부하 테스트 + 기준선(baseline) 비교.
+
+datagen 으로 합성 데이터를 만든 뒤 ASGI 드라이버(httpx.ASGITransport)로 엔드포인트마다
+요청을 보내 p50/p95/p99 지연, 처리량, 요청당 SQL 문 수를 잰다.
+benchmarks/baseline.json 과 비교해 회귀가 있으면 종료 코드 1.
+
+    python benchmarks/suite.py                      # 기준선과 비교
+    python benchmarks/suite.py --save-baseline      # 현재 결과를 기준선으로 저장
+    python benchmarks/suite.py --only /dashboard --only /calendar --requests 500
+    DATABASE_URL=mysql+pymysql://root:@localhost:3306/bench python benchmarks/suite.py --users 200
+
+회귀 판정: SQL 문 수가 늘었거나, p95 / 처리량이 --tolerance(기본 30%) 이상 나빠졌을 때.
+시간 값은 --rounds 번 중 가장 좋은 라운드를 쓰고, 기계마다 다르므로 기준선은 같은 기계에서
+만든 것과 비교한다. SQL 문 수는 기계와 무관하게 결정적이다.
+조회 캐시는 기본으로 끈다 (--cache 로 켬).
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+BASELINE = os.path.join(ROOT, "benchmarks", "baseline.json")
+NOISE_MS = 2.0   # 이보다 작은 p95 차이는 회귀로 보지 않음
+
+
+def scenarios(ds, rng):
+    """이름 → 요청 하나를 만드는 함수 ((method, url, kwargs) 반환)"""
+    def user():
+        return rng.choice(ds.users)
+
+    def header():
+        return {"headers": {"user-id": user()}}
+
+    def alarm():
+        u = user()
+        return u, rng.choice(ds.alarms[u])
+
+    def execution():
+        u, a = alarm()
+        day = ds.end_date.replace(day=1).isoformat()
+        return ("POST", "/alarm-executions", {"json": {
+            "alarm_id": a, "scheduled_ts": f"{day}T22:00:00Z", "dismissed_ts": f"{day}T22:05:00Z",
+            "routines": [{"routine_id": rid, "completed": rng.random() < 0.7, "order": i + 1}
+                         for i, rid in enumerate(ds.links[a])],
+        }})
+
+    return {
+        "GET /routines": lambda: ("GET", "/routines", header()),
+        "GET /alarms": lambda: ("GET", "/alarms", header()),
+        "GET /alarms/{id}": lambda: (lambda u, a: ("GET", f"/alarms/{a}", {"headers": {"user-id": u}}))(*alarm()),
+        "GET /alarms/upcoming": lambda: ("GET", "/alarms/upcoming", {"params": {"within": 1440}, **header()}),
+        "GET /dashboard": lambda: ("GET", "/dashboard", {"params": {"user_id": user()}}),
+        "GET /calendar": lambda: ("GET", "/calendar", {"params": {
+            "user_id": user(), "year": ds.end_date.year, "month": ds.end_date.month}}),
+        "GET /weekly-feedback": lambda: ("GET", "/weekly-feedback", {"params": {"user_id": user()}}),
+        "GET /routine-stats": lambda: ("GET", "/routine-stats", {"params": {"user_id": user()}}),
+        "GET /alarm-executions": lambda: ("GET", "/alarm-executions", {"params": {"limit": 50}, **header()}),
+        "GET /sync": lambda: ("GET", "/sync", header()),
+        "POST /alarm-executions": execution,
+    }
+
+
+async def drive(app, make_request, total: int, concurrency: int):
+    import httpx
+
+    latencies, errors = [], 0
+    remaining = total
+
+    async def worker(client):
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            method, url, kwargs = make_request()
+            t0 = time.perf_counter()
+            r = await client.request(method, url, **kwargs)
+            latencies.append(time.perf_counter() - t0)
+            if r.status_code >= 400:
+                errors += 1
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return latencies, errors, elapsed
+
+
+def summarize(latencies, errors, elapsed, statements):
+    q = statistics.quantiles(sorted(latencies), n=100) if len(latencies) > 1 else [latencies[0]] * 99
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(q[49] * 1000, 2),
+        "p95_ms": round(q[94] * 1000, 2),
+        "p99_ms": round(q[98] * 1000, 2),
+        "stmts_per_req": round(statements / len(latencies), 2),
+    }
+
+
+def compare(name, cur, base, tolerance):
+    problems = []
+    if cur["errors"]:
+        problems.append(f"{cur['errors']} errors")
+    if base is None:
+        return problems
+    if cur["stmts_per_req"] > base["stmts_per_req"] + 0.01:
+        problems.append(f"stmts {base['stmts_per_req']} → {cur['stmts_per_req']}")
+    if cur["p95_ms"] > base["p95_ms"] * (1 + tolerance) and cur["p95_ms"] - base["p95_ms"] > NOISE_MS:
+        problems.append(f"p95 {base['p95_ms']} → {cur['p95_ms']} ms")
+    if cur["rps"] < base["rps"] * (1 - tolerance):
+        problems.append(f"rps {base['rps']} → {cur['rps']}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="엔드포인트 부하 테스트 + 기준선 비교")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--years", type=float, default=1)
+    parser.add_argument("--routines", type=int, default=8)
+    parser.add_argument("--alarms", type=int, default=3)
+    parser.add_argument("--requests", type=int, default=200, help="엔드포인트당 요청 수")
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--rounds", type=int, default=3, help="엔드포인트마다 반복 횟수 (가장 좋은 라운드 사용)")
+    parser.add_argument("--only", action="append", help="이 문자열이 들어간 엔드포인트만")
+    parser.add_argument("--cache", action="store_true", help="조회 캐시 켜기")
+    parser.add_argument("--tolerance", type=float, default=0.3)
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--json", help="결과를 JSON 파일로도 저장")
+    args = parser.parse_args()
+
+    os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.mkdtemp(), "suite.db"))
+    if not args.cache:
+        os.environ["CACHE_BACKEND"] = "none"
+
+    import database
+    import main as app_main
+    from benchmarks.datagen import generate
+    from querycount import QueryCounter
+
+    params = {k: getattr(args, k) for k in ("users", "years", "routines", "alarms", "concurrency", "cache")}
+    started = time.perf_counter()
+    ds = generate(database.engine, users=args.users, routines_per_user=args.routines,
+                  alarms_per_user=args.alarms, years=args.years)
+    print(f"dataset: {args.users} users, {ds.exec_logs} execution logs ({time.perf_counter() - started:.1f}s)")
+
+    baseline = {}
+    if not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            stored = json.load(f)
+        if stored.get("params") == params:
+            baseline = stored["results"]
+        else:
+            print(f"baseline params differ ({stored.get('params')}), comparison skipped")
+
+    counted = database.async_engine.sync_engine if database.async_engine is not None else database.engine
+    rng = random.Random(7)
+    results, failures = {}, []
+    print(f"\n{'endpoint':<24}{'rps':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'stmts':>7}  status")
+    for name, make_request in scenarios(ds, rng).items():
+        if args.only and not any(o in name for o in args.only):
+            continue
+        asyncio.run(drive(app_main.app, make_request, args.warmup, 1))
+        rounds = []
+        for _ in range(args.rounds):
+            with QueryCounter(counted) as qc:
+                latencies, errors, elapsed = asyncio.run(
+                    drive(app_main.app, make_request, args.requests, args.concurrency))
+            rounds.append(summarize(latencies, errors, elapsed, qc.count))
+        # 시간 값은 가장 좋은 라운드 기준 (다른 프로세스 영향으로 튀는 값 제외)
+        results[name] = r = min(rounds, key=lambda x: x["p95_ms"])
+        problems = compare(name, r, baseline.get(name), args.tolerance)
+        failures += [f"{name}: {p}" for p in problems]
+        status = "REGRESSION" if problems else ("ok" if name in baseline else "-")
+        print(f"{name:<24}{r['rps']:>8}{r['p50_ms']:>9}{r['p95_ms']:>9}{r['p99_ms']:>9}{r['stmts_per_req']:>7}  {status}")
+
+    for hook in app_main.app.router.on_shutdown:
+        hook_result = hook()
+        if asyncio.iscoroutine(hook_result):
+            asyncio.run(hook_result)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"params": params, "results": results}, f, indent=2)
+    if args.save_baseline:
+        saved = dict(results)
+        if args.only and os.path.exists(args.baseline):
+            # --only 로 일부만 돌렸으면 나머지 엔드포인트의 기준선은 그대로 둔다
+            with open(args.baseline) as f:
+                stored = json.load(f)
+            if stored.get("params") == params:
+                saved = {**stored["results"], **results}
+        with open(args.baseline, "w") as f:
+            json.dump({"params": params, "results": saved}, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"\nbaseline saved: {args.baseline}")
+        return
+    if failures:
+        print("\n" + "\n".join(failures))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
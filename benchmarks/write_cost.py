@@ -0,0 +1,144 @@
+"""쓰기 엔드포인트별 SQL 문 / 커밋 수 점검.
+
+루틴 수를 바꿔 가며 같은 요청을 보내고, 요청당 문장 수가 입력 크기와 무관한지,
+커밋이 한 번인지 확인한다. 요청이 실패하면(예상한 상태 코드가 아니면) 바로 멈추고, 예산을 넘으면 종료 코드 1.
+
+    python benchmarks/write_cost.py
+"""
+import os
+import sys
+import tempfile
+import uuid
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.mkdtemp(), "write_cost.db"))
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+import database  # noqa: E402
+import main  # noqa: E402
+import models  # noqa: E402
+from querycount import QueryCounter  # noqa: E402
+
+# 엔드포인트별 요청당 최대 (문장 수, 커밋 수)
+BUDGET = {
+    "POST /alarms": (2, 1),
+    "POST /alarms/{id}/repeat-days": (2, 1),
+    "POST /alarm-executions": (7, 1),
+    "POST /alarm-executions/batch": (7, 1),
+    "PUT /alarm-executions/{id}": (6, 1),
+    "PATCH /alarms/{id}/routines/order": (2, 1),
+    "PATCH /alarms/status pause": (1, 1),
+    "PATCH /alarms/status Inactive": (1, 1),
+    "PATCH /alarms/status Active": (2, 1),
+}
+SIZES = (1, 10)
+
+
+def ok(response, expected=200):
+    """실패한 요청의 문장 수를 재지 않도록 상태 코드부터 확인한다."""
+    if response.status_code != expected:
+        raise AssertionError(f"{response.request.method} {response.request.url.path}: "
+                             f"{response.status_code} {response.text[:200]}")
+    return response
+
+
+def setup(client, n_routines):
+    user_id = str(uuid.uuid4())
+    db = database.SessionLocal()
+    db.add(models.AppUser(user_id=user_id, email=f"{user_id}@bench.local", name="bench"))
+    db.commit()
+    db.close()
+    headers = {"user-id": user_id}
+    routine_ids = [
+        ok(client.post("/routines", json={"title": f"r{i}", "type": "simple"}, headers=headers)).json()["routine_id"]
+        for i in range(n_routines)
+    ]
+    return headers, routine_ids
+
+
+def measure(client, n):
+    headers, routine_ids = setup(client, n)
+    links = [{"routine_id": rid, "order": i + 1} for i, rid in enumerate(routine_ids)]
+    days = list(range(1, min(n, 7) + 1))
+    execution = lambda: {
+        "alarm_id": alarm_id,
+        "scheduled_ts": "2025-06-01T22:00:00Z",
+        "dismissed_ts": "2025-06-01T22:05:00Z",
+        "routines": [{"routine_id": rid, "completed": True, "order": i + 1} for i, rid in enumerate(routine_ids)],
+    }
+
+    out = {}
+    with QueryCounter(database.engine) as qc:
+        alarm_id = ok(client.post("/alarms", json={
+            "time": "07:00", "status": "Active", "vibration_on": True, "repeat_days": days, "routines": links,
+        }, headers=headers)).json()["alarm_id"]
+    out["POST /alarms"] = qc
+
+    with QueryCounter(database.engine) as qc:
+        ok(client.post(f"/alarms/{alarm_id}/repeat-days", json={"alarm_id": alarm_id, "repeat_days": days}))
+    out["POST /alarms/{id}/repeat-days"] = qc
+
+    with QueryCounter(database.engine) as qc:
+        exec_id = ok(client.post("/alarm-executions", json=execution())).json()["exec_id"]
+    out["POST /alarm-executions"] = qc
+
+    with QueryCounter(database.engine) as qc:
+        ok(client.put(f"/alarm-executions/{exec_id}", json={
+            "routines": [{"routine_id": rid, "completed": False} for rid in routine_ids],
+        }))
+    out["PUT /alarm-executions/{id}"] = qc
+
+    with QueryCounter(database.engine) as qc:
+        ok(client.post("/alarm-executions/batch", json=[execution() for _ in range(n)]))
+    out["POST /alarm-executions/batch"] = qc
+
+    # 첫 루틴을 맨 뒤로 (n=1 이어도 옮길 수 있게 같은 루틴을 한 번 더 연결)
+    reorder_id = ok(client.post("/alarms", json={
+        "time": "07:30", "status": "Active", "vibration_on": True, "repeat_days": days,
+        "routines": links + [{"routine_id": routine_ids[0], "order": n + 1}],
+    }, headers=headers)).json()["alarm_id"]
+    with QueryCounter(database.engine) as qc:
+        ok(client.patch(f"/alarms/{reorder_id}/routines/order", json={"routine_id": routine_ids[0], "position": n + 1},
+                        headers=headers))
+    out["PATCH /alarms/{id}/routines/order"] = qc
+
+    # 알람 n 개 일괄 변경
+    for _ in range(n - 2):
+        ok(client.post("/alarms", json={
+            "time": "08:00", "status": "Active", "vibration_on": True, "repeat_days": days, "routines": [],
+        }, headers=headers))
+    for name, body in (
+        ("PATCH /alarms/status pause", {"all": True, "paused_until": "2025-06-10"}),
+        ("PATCH /alarms/status Inactive", {"all": True, "status": "Inactive"}),
+        ("PATCH /alarms/status Active", {"all": True, "status": "Active", "paused_until": None}),
+    ):
+        with QueryCounter(database.engine) as qc:
+            ok(client.patch("/alarms/status", json=body, headers=headers))
+        out[name] = qc
+    return out
+
+
+def main_():
+    client = TestClient(main.app)
+    results = {n: measure(client, n) for n in SIZES}
+    failed = False
+    print(f"{'endpoint':<32} " + " ".join(f"{'n=' + str(n):>12}" for n in SIZES) + "   budget")
+    for name, (max_stmts, max_commits) in BUDGET.items():
+        cells = []
+        for n in SIZES:
+            qc = results[n][name]
+            cells.append(f"{qc.count:>3} stmt/{qc.commits}c")
+            if qc.count > max_stmts or qc.commits > max_commits:
+                failed = True
+        counts = {results[n][name].count for n in SIZES}
+        if len(counts) > 1:
+            failed = True
+            cells.append("← grows with n")
+        print(f"{name:<32} " + " ".join(f"{c:>12}" for c in cells) + f"   {max_stmts} stmt/{max_commits}c")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main_()
@@ -0,0 +1,197 @@
+"""사용자별 조회 결과 캐시 (GET /routines, GET /alarms, /dashboard).
+
+키는 (user_id, endpoint) 이고, 같은 사용자의 쓰기 핸들러가 관련 키를 지운다.
+
+    CACHE_BACKEND=lru      # 프로세스 내 LRU + TTL (기본)
+    CACHE_BACKEND=shared   # 공유 캐시(Redis 등) 대용: 값을 직렬화해서 저장
+    CACHE_BACKEND=none     # 캐시 끔
+    CACHE_TTL=30           # 초
+    CACHE_MAX_ENTRIES=10000
+
+워커가 여러 개면 lru 는 워커마다 따로 무효화되므로 짧은 TTL 로 두거나 공유 백엔드를 쓴다.
+"""
+import json
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Iterable, Optional
+
+from serializers import to_jsonable
+
+# 쓰기 종류별로 지워야 하는 조회 엔드포인트
+ROUTINE_READS = ("routines", "dashboard")
+ALARM_READS = ("alarms", "dashboard")
+
+
+class CacheBackend(ABC):
+    """get/set/delete + 카운터. 값은 JSON 으로 표현 가능한 것만 넣는다."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def key(user_id: str, endpoint: str) -> str:
+        return f"{user_id}:{endpoint}"
+
+    def get(self, user_id: str, endpoint: str) -> Optional[Any]:
+        value = self._get(self.key(user_id, endpoint))
+        with self.lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, user_id: str, endpoint: str, value: Any) -> Any:
+        """응답 값을 JSON 호환 형태로 바꿔 저장하고, 바뀐 값을 그대로 돌려준다."""
+        value = to_jsonable(value)
+        self._set(self.key(user_id, endpoint), value)
+        return value
+
+    def invalidate(self, user_id: str, endpoints: Iterable[str]):
+        for endpoint in endpoints:
+            if self._delete(self.key(user_id, endpoint)):
+                with self.lock:
+                    self.invalidations += 1
+
+    def stats(self) -> dict:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "backend": type(self).__name__,
+                "entries": self._size(),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+    # 백엔드마다 구현하는 저장소 연산 (key 는 self.key() 로 만든 문자열)
+
+    @abstractmethod
+    def _get(self, key: str) -> Optional[Any]:
+        ...
+
+    @abstractmethod
+    def _set(self, key: str, value: Any):
+        ...
+
+    @abstractmethod
+    def _delete(self, key: str) -> bool:
+        ...
+
+    @abstractmethod
+    def _size(self) -> int:
+        ...
+
+
+class NullCache(CacheBackend):
+    def set(self, user_id, endpoint, value):
+        return value   # 저장하지 않으므로 변환도 생략
+
+    def _get(self, key):
+        return None
+
+    def _set(self, key, value):
+        pass
+
+    def _delete(self, key):
+        return False
+
+    def _size(self):
+        return 0
+
+
+class LRUTTLCache(CacheBackend):
+    """프로세스 내 캐시. 최대 개수를 넘으면 가장 오래 안 쓴 키부터, TTL 이 지나면 조회 시 버린다."""
+
+    def __init__(self, max_entries: int = 10000, ttl: float = 30):
+        super().__init__()
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.data = OrderedDict()   # key → (만료 시각, 값)
+
+    def _get(self, key):
+        with self.lock:
+            item = self.data.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires < time.monotonic():
+                del self.data[key]
+                self.evictions += 1
+                return None
+            self.data.move_to_end(key)
+            return value
+
+    def _set(self, key, value):
+        with self.lock:
+            self.data[key] = (time.monotonic() + self.ttl, value)
+            self.data.move_to_end(key)
+            while len(self.data) > self.max_entries:
+                self.data.popitem(last=False)
+                self.evictions += 1
+
+    def _delete(self, key):
+        with self.lock:
+            return self.data.pop(key, None) is not None
+
+    def _size(self):
+        return len(self.data)
+
+
+class SharedCache(CacheBackend):
+    """공유 캐시 서버(Redis 등)를 흉내 내는 로컬 백엔드.
+
+    실제 원격 캐시처럼 값을 문자열로 직렬화해서 저장/복원하고 TTL 만 지원한다 (LRU 없음).
+    같은 store 를 넘기면 여러 인스턴스가 저장소를 공유한다.
+    """
+
+    def __init__(self, ttl: float = 30, store: Optional[dict] = None):
+        super().__init__()
+        self.ttl = ttl
+        self.store = {} if store is None else store   # key → (만료 시각, 직렬화된 값)
+
+    def _get(self, key):
+        with self.lock:
+            item = self.store.get(key)
+            if item is None:
+                return None
+            expires, raw = item
+            if expires < time.time():
+                self.store.pop(key, None)
+                self.evictions += 1
+                return None
+        return json.loads(raw)
+
+    def _set(self, key, value):
+        raw = json.dumps(value, ensure_ascii=False)
+        with self.lock:
+            self.store[key] = (time.time() + self.ttl, raw)
+
+    def _delete(self, key):
+        with self.lock:
+            return self.store.pop(key, None) is not None
+
+    def _size(self):
+        return len(self.store)
+
+
+def build_cache() -> CacheBackend:
+    backend = os.getenv("CACHE_BACKEND", "lru")
+    ttl = float(os.getenv("CACHE_TTL", 30))
+    if backend == "none":
+        return NullCache()
+    if backend == "shared":
+        return SharedCache(ttl=ttl)
+    return LRUTTLCache(max_entries=int(os.getenv("CACHE_MAX_ENTRIES", 10000)), ttl=ttl)
+
+
+cache = build_cache()
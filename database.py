@@ -1,9 +1,184 @@
-from sqlalchemy import create_engine
+import os
+import threading
+import time
+
+from dotenv import load_dotenv
+from sqlalchemy import String, create_engine, inspect
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+# .env → 환경변수 (이미 설정된 환경변수가 우선)
+load_dotenv()
+
+
+def env_int(name: str, default: int) -> int:
+    return int(os.getenv(name, default))
+
+
+def env_bool(name: str, default: bool) -> bool:
+    return os.getenv(name, "1" if default else "0").lower() in ("1", "true", "yes", "on")
+
+
+DATABASE_URL = os.getenv("DATABASE_URL", "mysql+pymysql://root:@localhost:3306/project")
+
+# 커넥션 풀 설정 (배포 환경별로 .env 에서 조정)
+DB_POOL_SIZE = env_int("DB_POOL_SIZE", 5)
+DB_MAX_OVERFLOW = env_int("DB_MAX_OVERFLOW", 10)
+DB_POOL_TIMEOUT = env_int("DB_POOL_TIMEOUT", 30)        # 커넥션 대기 최대 초
+DB_POOL_RECYCLE = env_int("DB_POOL_RECYCLE", 1800)      # MySQL wait_timeout 보다 짧게
+DB_POOL_PRE_PING = env_bool("DB_POOL_PRE_PING", True)
+DB_ECHO = env_bool("DB_ECHO", False)
+
+# 비동기 DB 모드 (DB_ASYNC=1): 엔드포인트를 async 로 돌려 threadpool 대기를 없앤다.
+# ASYNC_DATABASE_URL 이 없으면 DATABASE_URL 의 드라이버만 async 용으로 바꿔 쓴다.
+ASYNC_DB = env_bool("DB_ASYNC", False)
+ASYNC_DRIVERS = {"mysql": "mysql+aiomysql", "sqlite": "sqlite+aiosqlite"}
+
+
+def to_async_url(url: str) -> str:
+    u = make_url(url)
+    return u.set(drivername=ASYNC_DRIVERS[u.get_backend_name()]).render_as_string(hide_password=False)
+
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or to_async_url(DATABASE_URL)
+
+# 읽기 전용 replica (routing.py 가 통계 조회 라우트만 보낸다). 없으면 모든 요청이 primary.
+REPLICA_DATABASE_URL = os.getenv("REPLICA_DATABASE_URL")
+ASYNC_REPLICA_DATABASE_URL = os.getenv("ASYNC_REPLICA_DATABASE_URL") or (
+    to_async_url(REPLICA_DATABASE_URL) if REPLICA_DATABASE_URL else None
+)
+
+# id 컬럼 저장 형식 (ids.UUIDKey). 새 DB 는 UUID_KEY_STORAGE 를 따르고,
+# 이미 테이블이 있으면 시작할 때 use_db_key_storage() 가 실제 컬럼 형식으로 맞춘다
+BINARY_KEYS = os.getenv("UUID_KEY_STORAGE", "binary") == "binary"
+
+
+def keys_are_char(conn) -> bool:
+    columns = {c["name"]: c["type"] for c in inspect(conn).get_columns("app_user")}
+    return isinstance(columns["user_id"], String)
+
+
+def use_db_key_storage(bind):
+    """기존 DB 의 id 저장 형식에 UUIDKey 를 맞춘다 (025 전환 전이면 char). 첫 쿼리 전에 부를 것."""
+    global BINARY_KEYS
+    with bind.connect() as conn:
+        if inspect(conn).has_table("app_user"):
+            BINARY_KEYS = not keys_are_char(conn)
 
-DATABASE_URL = "mysql+pymysql://root:@localhost:3306/project"
 
-engine = create_engine(DATABASE_URL)
+class PoolStats:
+    """커넥션 checkout 대기 시간 누적값 (풀마다 하나)."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def record(self, waited: float, timed_out: bool = False):
+        with self.lock:
+            self.checkouts += 1
+            self.timeouts += int(timed_out)
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+
+
+def timed_pool(base, stats: PoolStats):
+    """checkout 대기 시간을 stats 에 기록하는 풀 클래스.
+    풀이 dispose/recreate 되어도 같은 클래스(= 같은 stats)로 다시 만들어진다."""
+
+    class TimedPool(base):
+        checkout_stats = stats
+
+        def _do_get(self):
+            started = time.perf_counter()
+            try:
+                conn = super()._do_get()
+            except PoolTimeoutError:
+                stats.record(time.perf_counter() - started, timed_out=True)
+                raise
+            stats.record(time.perf_counter() - started)
+            return conn
+
+    TimedPool.__name__ = "Timed" + base.__name__
+    return TimedPool
+
+
+def pool_options(base) -> dict:
+    if make_url(DATABASE_URL).get_backend_name() == "sqlite" and ":memory:" in DATABASE_URL:
+        return {}  # 메모리 SQLite 는 전용 풀을 써야 함
+    return {
+        "poolclass": timed_pool(base, PoolStats()),
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+
+engine = create_engine(DATABASE_URL, echo=DB_ECHO, **pool_options(QueuePool))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-Base = declarative_base()
\ No newline at end of file
+Base = declarative_base()
+
+replica_engine = None
+ReplicaSessionLocal = None
+if REPLICA_DATABASE_URL:
+    replica_engine = create_engine(REPLICA_DATABASE_URL, echo=DB_ECHO, **pool_options(QueuePool))
+    ReplicaSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=replica_engine)
+
+async_engine = None
+AsyncSessionLocal = None
+if ASYNC_DB:
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    async_engine = create_async_engine(ASYNC_DATABASE_URL, echo=DB_ECHO, **pool_options(AsyncAdaptedQueuePool))
+    # 응답 직렬화가 세션 밖(greenlet 밖)에서 일어나므로 커밋 후에도 속성을 만료시키지 않는다
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+async_replica_engine = None
+AsyncReplicaSessionLocal = None
+if ASYNC_DB and REPLICA_DATABASE_URL:
+    async_replica_engine = create_async_engine(
+        ASYNC_REPLICA_DATABASE_URL, echo=DB_ECHO, **pool_options(AsyncAdaptedQueuePool)
+    )
+    AsyncReplicaSessionLocal = async_sessionmaker(async_replica_engine, autoflush=False, expire_on_commit=False)
+
+
+def pool_snapshot(eng) -> dict:
+    """현재 풀 상태 + 누적 대기 시간."""
+    pool = eng.pool
+    stats = getattr(pool, "checkout_stats", None)
+    snap = {
+        "pool_class": type(pool).__name__,
+        "size": pool.size() if hasattr(pool, "size") else None,
+        "checked_out": pool.checkedout() if hasattr(pool, "checkedout") else None,
+        "idle": pool.checkedin() if hasattr(pool, "checkedin") else None,
+        "overflow": max(0, pool.overflow()) if hasattr(pool, "overflow") else None,
+        "max_overflow": DB_MAX_OVERFLOW,
+    }
+    if stats:
+        with stats.lock:
+            snap.update({
+                "checkouts": stats.checkouts,
+                "checkout_timeouts": stats.timeouts,
+                "checkout_wait_avg_ms": round(stats.wait_total / stats.checkouts * 1000, 3) if stats.checkouts else 0.0,
+                "checkout_wait_max_ms": round(stats.wait_max * 1000, 3),
+                "checkout_wait_total_ms": round(stats.wait_total * 1000, 3),
+            })
+    return snap
+
+
+def pool_metrics() -> dict:
+    metrics = {"primary": pool_snapshot(engine)}
+    if async_engine is not None:
+        metrics["async"] = pool_snapshot(async_engine.sync_engine)
+    if replica_engine is not None:
+        metrics["replica"] = pool_snapshot(replica_engine)
+    if async_replica_engine is not None:
+        metrics["async_replica"] = pool_snapshot(async_replica_engine.sync_engine)
+    return metrics
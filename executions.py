@@ -0,0 +1,134 @@
+"""알람 수행 기록 저장용 헬퍼 (단건 / 배치 공용)."""
+from typing import Dict, List, Tuple
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+import ids
+import models
+import schemas
+import stats
+from timeutils import parse_client_ts
+
+
+def summarize(total: int, completed: int) -> Tuple[float, str]:
+    """완료 수 → (success_rate, status)"""
+    rate = round(completed / total, 3) if total > 0 else 0.0
+    status = "SUCCESS" if completed == total else ("PARTIAL" if completed > 0 else "ABORTED")
+    return rate, status
+
+
+def build_rows(data: schemas.AlarmExecutionCreate, exec_id: str = None) -> Tuple[dict, List[dict]]:
+    """요청 payload → (alarm_exec_log 행, alarm_exec_routine 행 목록)"""
+    exec_id = exec_id or ids.new_id()
+    total = len(data.routines)
+    completed = sum(1 for r in data.routines if r.completed)
+    rate, status = summarize(total, completed)
+    scheduled_at, scheduled_date = parse_client_ts(data.scheduled_ts)
+
+    log = {
+        "exec_id": exec_id,
+        "alarm_id": data.alarm_id,
+        "scheduled_ts": data.scheduled_ts,
+        "dismissed_ts": data.dismissed_ts,
+        "scheduled_at": scheduled_at,
+        "scheduled_date": scheduled_date,
+        "total_routines": total,
+        "completed_routines": completed,
+        "success_rate": rate,
+        "status": status,
+    }
+    details = [
+        {
+            "axr_id": ids.new_id(),
+            "exec_id": exec_id,
+            "routine_id": r.routine_id,
+            "completed": int(r.completed),
+            "actual_value": r.actual_value,
+            "completed_ts": r.completed_ts,
+            "abort_ts": r.abort_ts,
+            "order": r.order,
+        }
+        for r in data.routines
+    ]
+    return log, details
+
+
+def validate_batch(db: Session, items: List[schemas.AlarmExecutionCreate]) -> Tuple[Dict[str, str], Dict[int, str]]:
+    """배치 전체의 알람/루틴 존재 여부를 쿼리 2번으로 확인한다.
+
+    반환: (alarm_id → 소유자 user_id, 실패한 index → 에러 메시지)
+    """
+    # UUID 형식이 아닌 id 는 조회하지 않고 그 항목만 "not found"
+    alarm_ids = {d.alarm_id for d in items if ids.is_key(d.alarm_id)}
+    routine_ids = {r.routine_id for d in items for r in d.routines if ids.is_key(r.routine_id)}
+
+    owners = dict(
+        db.query(models.Alarm.alarm_id, models.Alarm.user_id)
+        .filter(models.Alarm.alarm_id.in_(alarm_ids), models.Alarm.deleted_at.is_(None))
+        .all()
+    ) if alarm_ids else {}
+    known_routines = {
+        rid for (rid,) in db.query(models.Routine.routine_id).filter(
+            models.Routine.routine_id.in_(routine_ids), models.Routine.deleted_at.is_(None)
+        )
+    } if routine_ids else set()
+
+    errors = {}
+    for i, d in enumerate(items):
+        if d.alarm_id not in owners:
+            errors[i] = "Alarm not found"
+            continue
+        missing = sorted({r.routine_id for r in d.routines} - known_routines)
+        if missing:
+            errors[i] = f"Routine not found: {', '.join(missing)}"
+    return owners, errors
+
+
+def replace_missed(db: Session, entries: List[Tuple[str, dict, List[dict]]]):
+    """스케줄러가 MISSED 로 기록해 둔 같은 알람/같은 날의 로그를 지운다 (유예 시간 뒤에 늦게 올라온 기록).
+
+    보통은 (alarm_id, scheduled_date) 인덱스 조회 한 번으로 끝난다.
+    """
+    pairs = {(log["alarm_id"], log["scheduled_date"]) for _, log, _ in entries if log["scheduled_date"]}
+    if not pairs:
+        return
+    log_t, axr = models.AlarmExecutionLog, models.AlarmExecutionRoutine
+    missed = [
+        m for m in db.query(
+            log_t.exec_id, log_t.alarm_id, log_t.user_id, log_t.scheduled_date, log_t.total_routines,
+        ).filter(
+            log_t.status == "MISSED",
+            log_t.alarm_id.in_({a for a, _ in pairs}),
+            log_t.scheduled_date.in_({d for _, d in pairs}),
+        )
+        if (m.alarm_id, m.scheduled_date) in pairs
+    ]
+    if not missed:
+        return
+    exec_ids = [m.exec_id for m in missed]
+    details: Dict[str, List[dict]] = {}
+    for routine_id, exec_id in db.query(axr.routine_id, axr.exec_id).filter(axr.exec_id.in_(exec_ids)):
+        details.setdefault(exec_id, []).append({"routine_id": routine_id, "completed": 0})
+    stats.record_execution_rows(db, [
+        (m.user_id, {"scheduled_date": m.scheduled_date, "completed_routines": 0,
+                     "total_routines": m.total_routines, "success_rate": 0}, details.get(m.exec_id, []))
+        for m in missed
+    ], sign=-1)
+    db.query(axr).filter(axr.exec_id.in_(exec_ids)).delete(synchronize_session=False)
+    db.query(log_t).filter(log_t.exec_id.in_(exec_ids)).delete(synchronize_session=False)
+
+
+def insert_rows(db: Session, entries: List[Tuple[str, dict, List[dict]]], replace_missed_logs: bool = True):
+    """(user_id, log 행, detail 행들) 목록을 multi-row INSERT 두 번 + 집계 upsert 로 넣는다. 커밋은 호출하는 쪽에서."""
+    if not entries:
+        return
+    if replace_missed_logs:
+        replace_missed(db, entries)
+    for user_id, log, _ in entries:
+        log["user_id"] = user_id
+    db.execute(insert(models.AlarmExecutionLog), [log for _, log, _ in entries])
+    detail_rows = [d for _, _, details in entries for d in details]
+    if detail_rows:
+        db.execute(insert(models.AlarmExecutionRoutine), detail_rows)
+    stats.record_execution_rows(db, entries)
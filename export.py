@@ -0,0 +1,188 @@
+"""사용자 데이터 내보내기 (routine / alarm / alarm_exec_log / alarm_exec_routine).
+
+서버 측 커서(yield_per)로 행을 조금씩 읽어 바로 직렬화하므로 데이터 양과 상관없이 메모리 사용량이 일정하다.
+
+    python export.py <user_id>                               # 전체 테이블 NDJSON → stdout
+    python export.py <user_id> --gzip --out backup.ndjson.gz
+    python export.py <user_id> --format csv --table alarm_exec_log --out log.csv
+
+NDJSON 은 한 줄에 한 행이고 "table" 필드로 테이블을 구분한다.
+CSV 는 테이블마다 컬럼이 달라서 한 번에 한 테이블만 내보낸다.
+"""
+import argparse
+import csv
+import io
+import json
+import sys
+import zlib
+from datetime import date, datetime, time
+from decimal import Decimal
+from typing import Iterator, List, Optional
+
+from sqlalchemy import select
+
+import ids
+import models
+
+YIELD_PER = 1000
+CHUNK_BYTES = 64 * 1024
+
+FORMATS = ("ndjson", "csv")
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+def _live_columns(table):
+    return [c for c in table.c if c.name != "deleted_at"]
+
+
+def _queries(user_id: str):
+    """삭제 표시된 알람/루틴과 그 기록은 내보내지 않는다."""
+    routine = models.Routine.__table__
+    alarm = models.Alarm.__table__
+    log = models.AlarmExecutionLog.__table__
+    axr = models.AlarmExecutionRoutine.__table__
+    live_alarm = (alarm.c.alarm_id == log.c.alarm_id) & alarm.c.deleted_at.is_(None)
+    return {
+        "routine": (
+            select(*_live_columns(routine))
+            .where(routine.c.user_id == user_id, routine.c.deleted_at.is_(None))
+            .order_by(routine.c.routine_id)
+        ),
+        "alarm": (
+            select(*_live_columns(alarm))
+            .where(alarm.c.user_id == user_id, alarm.c.deleted_at.is_(None))
+            .order_by(alarm.c.alarm_id)
+        ),
+        "alarm_exec_log": (
+            select(log)
+            .join(alarm, live_alarm)
+            .where(log.c.user_id == user_id)
+            .order_by(log.c.scheduled_at, log.c.exec_id)
+        ),
+        "alarm_exec_routine": (
+            select(axr)
+            .join(log, log.c.exec_id == axr.c.exec_id)
+            .join(alarm, live_alarm)
+            .join(routine, (routine.c.routine_id == axr.c.routine_id) & routine.c.deleted_at.is_(None))
+            .where(log.c.user_id == user_id)
+            .order_by(axr.c.exec_id, axr.c.order)
+        ),
+    }
+
+
+TABLES = tuple(_queries("").keys())
+
+
+def json_value(v):
+    if isinstance(v, (datetime, date, time)):
+        return v.isoformat()
+    if isinstance(v, Decimal):
+        return float(v)
+    return v
+
+
+def iter_rows(db, user_id: str, table: str) -> Iterator[dict]:
+    """서버 측 커서로 YIELD_PER 행씩 가져온다."""
+    result = db.execute(_queries(user_id)[table].execution_options(yield_per=YIELD_PER))
+    try:
+        for row in result.mappings():
+            yield {k: json_value(v) for k, v in row.items()}
+    finally:
+        result.close()
+
+
+def iter_ndjson(db, user_id: str, tables) -> Iterator[str]:
+    for table in tables:
+        for row in iter_rows(db, user_id, table):
+            yield json.dumps({"table": table, **row}, ensure_ascii=False) + "\n"
+
+
+def iter_csv(db, user_id: str, table: str) -> Iterator[str]:
+    columns = [c.name for c in _queries(user_id)[table].selected_columns]
+    buf = io.StringIO()
+    writer = csv.DictWriter(buf, fieldnames=columns)
+    writer.writeheader()
+    for row in iter_rows(db, user_id, table):
+        writer.writerow(row)
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+    yield buf.getvalue()
+
+
+def chunked(lines: Iterator[str], compress: bool = False) -> Iterator[bytes]:
+    """작은 문자열들을 CHUNK_BYTES 단위로 묶는다 (compress 면 gzip 스트림)."""
+    gz = zlib.compressobj(wbits=31) if compress else None
+    buf, size = [], 0
+    for line in lines:
+        data = line.encode()
+        buf.append(data)
+        size += len(data)
+        if size >= CHUNK_BYTES:
+            out = b"".join(buf)
+            buf, size = [], 0
+            out = gz.compress(out) if gz else out
+            if out:
+                yield out
+    out = b"".join(buf)
+    if gz:
+        out = gz.compress(out) + gz.flush()
+    if out:
+        yield out
+
+
+def validate(user_id: str, fmt: str, tables: Optional[List[str]]) -> List[str]:
+    """요청 옵션 확인 후 내보낼 테이블 목록 반환. 잘못되면 ValueError.
+
+    스트리밍이 시작되면 상태 코드를 바꿀 수 없고 user_id 는 파일 이름 헤더에도 들어가므로 여기서 먼저 확인한다.
+    """
+    if not ids.is_key(user_id):
+        raise ValueError("Invalid user_id")
+    if fmt not in FORMATS:
+        raise ValueError(f"format must be one of {', '.join(FORMATS)}")
+    tables = list(tables or TABLES)
+    unknown = [t for t in tables if t not in TABLES]
+    if unknown:
+        raise ValueError(f"Unknown table: {', '.join(unknown)}")
+    if fmt == "csv" and len(tables) != 1:
+        raise ValueError("CSV export needs exactly one table")
+    return tables
+
+
+def stream_export(session_factory, user_id: str, fmt: str, tables: List[str], compress: bool = False) -> Iterator[bytes]:
+    """응답이 끝날 때까지 쓸 세션을 직접 열고 닫는다 (요청 의존성 세션은 응답 전에 닫힘)."""
+    db = session_factory()
+    try:
+        lines = iter_ndjson(db, user_id, tables) if fmt == "ndjson" else iter_csv(db, user_id, tables[0])
+        yield from chunked(lines, compress)
+    finally:
+        db.close()
+
+
+def filename(user_id: str, fmt: str, tables: List[str], compress: bool) -> str:
+    name = f"export-{user_id}" + (f"-{tables[0]}" if len(tables) == 1 else "")
+    return f"{name}.{fmt}" + (".gz" if compress else "")
+
+
+if __name__ == "__main__":
+    from database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="사용자 데이터 내보내기")
+    parser.add_argument("user_id")
+    parser.add_argument("--format", choices=FORMATS, default="ndjson")
+    parser.add_argument("--table", action="append", choices=TABLES, dest="tables")
+    parser.add_argument("--gzip", action="store_true")
+    parser.add_argument("--out", help="출력 파일 (없으면 stdout)")
+    args = parser.parse_args()
+
+    try:
+        tables = validate(args.user_id, args.format, args.tables)
+    except ValueError as e:
+        parser.error(str(e))
+    out = open(args.out, "wb") if args.out else sys.stdout.buffer
+    try:
+        for chunk in stream_export(SessionLocal, args.user_id, args.format, tables, args.gzip):
+            out.write(chunk)
+    finally:
+        if args.out:
+            out.close()
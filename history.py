@@ -0,0 +1,105 @@
+"""GET /alarm-executions 수행 이력 (keyset 페이지네이션).
+
+정렬은 (scheduled_at, exec_id) 내림차순이고, cursor 는 직전 페이지 마지막 행의 두 값이다.
+(user_id, scheduled_at, exec_id) 인덱스를 따라 읽으므로 이력이 얼마나 쌓였든 페이지 비용이 같다.
+scheduled_ts 를 파싱하지 못한 행(scheduled_at 이 NULL)은 이력에 나오지 않는다.
+"""
+import base64
+from datetime import date, datetime
+from typing import List, Optional
+
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+
+import models
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+
+
+def encode_cursor(scheduled_at: datetime, exec_id: str) -> str:
+    raw = f"{scheduled_at.isoformat()}|{exec_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str):
+    """잘못된 cursor 면 ValueError"""
+    try:
+        ts, exec_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|", 1)
+    except Exception as e:
+        raise ValueError("invalid cursor") from e
+    return datetime.fromisoformat(ts), exec_id
+
+
+def execution_out(log) -> dict:
+    return {
+        "exec_id": log.exec_id,
+        "alarm_id": log.alarm_id,
+        "scheduled_ts": log.scheduled_ts,
+        "dismissed_ts": log.dismissed_ts,
+        "scheduled_date": log.scheduled_date,
+        "total_routines": log.total_routines,
+        "completed_routines": log.completed_routines,
+        "success_rate": log.success_rate,
+        "status": log.status,
+    }
+
+
+def page_executions(
+    db: Session,
+    user_id: str,
+    alarm_id: Optional[str] = None,
+    statuses: Optional[List[str]] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_LIMIT,
+    include_routines: bool = False,
+) -> dict:
+    log, alarm = models.AlarmExecutionLog, models.Alarm
+    # 삭제 표시된 알람의 기록은 purge 워커가 지우기 전이라도 보이지 않게
+    q = db.query(log).join(alarm, alarm.alarm_id == log.alarm_id).filter(
+        log.user_id == user_id, log.scheduled_at.isnot(None), alarm.deleted_at.is_(None)
+    )
+    if alarm_id:
+        q = q.filter(log.alarm_id == alarm_id)
+    if statuses:
+        q = q.filter(log.status.in_(statuses))
+    if date_from:
+        q = q.filter(log.scheduled_date >= date_from)
+    if date_to:
+        q = q.filter(log.scheduled_date <= date_to)
+    if cursor:
+        at, exec_id = decode_cursor(cursor)
+        q = q.filter(or_(log.scheduled_at < at, and_(log.scheduled_at == at, log.exec_id < exec_id)))
+
+    # 한 행 더 읽어서 다음 페이지 유무 판단
+    rows = q.order_by(log.scheduled_at.desc(), log.exec_id.desc()).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    items = [execution_out(r) for r in rows]
+    if include_routines and rows:
+        axr = models.AlarmExecutionRoutine
+        details = {}
+        for d in (
+            db.query(axr)
+            .join(models.Routine, models.Routine.routine_id == axr.routine_id)
+            .filter(axr.exec_id.in_([r.exec_id for r in rows]), models.Routine.deleted_at.is_(None))
+            .order_by(axr.exec_id, axr.order)
+        ):
+            details.setdefault(d.exec_id, []).append({
+                "routine_id": d.routine_id,
+                "completed": d.completed,
+                "actual_value": d.actual_value,
+                "completed_ts": d.completed_ts,
+                "abort_ts": d.abort_ts,
+                "order": d.order,
+            })
+        for item in items:
+            item["routines"] = details.get(item["exec_id"], [])
+
+    return {
+        "items": items,
+        "next_cursor": encode_cursor(rows[-1].scheduled_at, rows[-1].exec_id) if has_more else None,
+    }
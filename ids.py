@@ -0,0 +1,87 @@
+"""행 id (routine_id, alarm_id, exec_id ...) 생성과 저장 형식.
+
+새 id 는 UUIDv7 이다. 앞 48비트가 밀리초 단위 생성 시각이라 새 행이 PK 인덱스 끝쪽에 붙고
+(uuid4 처럼 clustered index 곳곳에 끼어들지 않음), 나머지 74비트는 무작위다.
+코드와 API 에서는 늘 정규 문자열("0192f0c4-7c1e-7a3b-9d2e-...")로 다루고, 컬럼 타입 UUIDKey 가
+DB 에는 BINARY(16) 으로 저장한다. 바이트 순서가 문자열 순서와 같으므로 id 로 정렬/비교하는 쿼리는 그대로다.
+
+    UUID_KEY_STORAGE=binary   # 새 DB 를 BINARY(16) 으로 만든다 (기본)
+    UUID_KEY_STORAGE=char     # 새 DB 를 CHAR(36) 으로 만든다
+
+이미 테이블이 있으면 시작할 때 app_user.user_id 컬럼 형식을 보고 맞춘다 (database.use_db_key_storage),
+그래서 migrations.py 의 025 전환 전 CHAR(36) DB 도 설정 없이 그대로 돈다.
+
+UUID 형식이 아닌 id 를 쿼리에 넘기면 InvalidKey (API 는 400).
+"""
+import secrets
+import time
+import uuid
+
+from sqlalchemy.dialects.mysql import CHAR
+from sqlalchemy.types import BINARY, TypeDecorator
+
+import database
+
+NIL = "00000000-0000-0000-0000-000000000000"  # 어떤 id 보다 작다 (keyset 시작값)
+
+
+class InvalidKey(ValueError):
+    """UUID 형식이 아닌 id"""
+
+
+def uuid7() -> uuid.UUID:
+    ms = time.time_ns() // 1_000_000
+    rand = secrets.randbits(74)
+    return uuid.UUID(int=(
+        (ms & 0xFFFF_FFFF_FFFF) << 80
+        | 0x7 << 76                       # version
+        | (rand >> 62) << 64              # rand_a 12비트
+        | 0b10 << 62                      # variant
+        | rand & ((1 << 62) - 1)          # rand_b 62비트
+    ))
+
+
+def new_id() -> str:
+    return str(uuid7())
+
+
+def to_bytes(value) -> bytes:
+    if isinstance(value, uuid.UUID):
+        return value.bytes
+    try:
+        return uuid.UUID(value).bytes
+    except (ValueError, TypeError, AttributeError) as e:
+        raise InvalidKey(f"Invalid id: {value!r}") from e
+
+
+def is_key(value) -> bool:
+    """UUID 형식인지 (아니면 어떤 행과도 맞지 않는다)"""
+    try:
+        to_bytes(value)
+        return True
+    except InvalidKey:
+        return False
+
+
+class UUIDKey(TypeDecorator):
+    """문자열 UUID ↔ BINARY(16) (UUID_KEY_STORAGE=char 면 CHAR(36) 그대로)"""
+
+    impl = CHAR(36)
+    cache_ok = True
+
+    @property
+    def python_type(self):
+        return str
+
+    def load_dialect_impl(self, dialect):
+        return dialect.type_descriptor(BINARY(16) if database.BINARY_KEYS else CHAR(36))
+
+    def process_bind_param(self, value, dialect):
+        if value is None or not database.BINARY_KEYS:
+            return value
+        return to_bytes(value)
+
+    def process_result_value(self, value, dialect):
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            return str(uuid.UUID(bytes=bytes(value)))
+        return value
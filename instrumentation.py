@@ -0,0 +1,256 @@
+"""요청별 SQL 계측 (Server-Timing 헤더 + Prometheus /metrics).
+
+엔진 이벤트로 요청마다 SQL 문 수, DB 시간 합계, 가장 느린 문을 모으고
+미들웨어가 응답에 Server-Timing 헤더로 붙인 뒤 라우트별 히스토그램에 누적한다.
+
+    Server-Timing: db;dur=3.2;desc="4 queries", db-slowest;dur=1.9, app;dur=6.8
+
+같은 모양의 SQL(IN 목록 길이·공백 차이는 무시)이 한 요청에서 SQL_REPEAT_THRESHOLD 번을
+넘게 실행되면 N+1 의심으로 경고 로그를 남긴다. SQL_REPEAT_STRICT=1 이면(CI 용)
+해당 요청을 500 으로 바꿔서 테스트가 바로 실패하게 한다.
+
+    SQL_INSTRUMENTATION=1     # 끄면 헤더/메트릭/N+1 검사 모두 없음
+    SQL_REPEAT_THRESHOLD=10   # 0 이면 N+1 검사 끔
+    SQL_REPEAT_STRICT=0
+"""
+import logging
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from contextvars import ContextVar
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import orjson
+from sqlalchemy import event
+
+from database import env_bool, env_int
+
+INSTRUMENTATION_ENABLED = env_bool("SQL_INSTRUMENTATION", True)
+REPEAT_THRESHOLD = env_int("SQL_REPEAT_THRESHOLD", 10)
+REPEAT_STRICT = env_bool("SQL_REPEAT_STRICT", False)
+
+logger = logging.getLogger("routina.sql")
+
+# 히스토그램 버킷 상한
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+STATEMENT_BUCKETS = (1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+
+_IN_LIST = re.compile(r"\((?:\s*(?:\?|%s|:\w+|\[POSTCOMPILE_\w+\])\s*,)+\s*(?:\?|%s|:\w+|\[POSTCOMPILE_\w+\])\s*\)")
+_SPACES = re.compile(r"\s+")
+
+
+def statement_shape(statement: str) -> str:
+    """바인드 값 개수만 다른 SQL 을 같은 모양으로 본다 (IN (?, ?, ?) → IN (?))."""
+    return _IN_LIST.sub("(?)", _SPACES.sub(" ", statement).strip())
+
+
+class RequestStats:
+    """요청 하나 동안 실행된 SQL 통계."""
+
+    __slots__ = ("statements", "db_time", "slowest", "slowest_sql", "shapes")
+
+    def __init__(self):
+        self.statements = 0
+        self.db_time = 0.0
+        self.slowest = 0.0
+        self.slowest_sql = None
+        self.shapes = Counter()
+
+    def record(self, statement: str, elapsed: float):
+        self.statements += 1
+        self.db_time += elapsed
+        if elapsed >= self.slowest:
+            self.slowest, self.slowest_sql = elapsed, statement
+        self.shapes[statement_shape(statement)] += 1
+
+    def repeated(self, threshold: int) -> List[Tuple[str, int]]:
+        """threshold 번을 넘게 반복된 SQL 모양 (N+1 의심)"""
+        if threshold <= 0 or self.statements <= threshold:
+            return []
+        return [(shape, n) for shape, n in self.shapes.most_common() if n > threshold]
+
+    def server_timing(self, total: float) -> str:
+        return (
+            f'db;dur={self.db_time * 1000:.2f};desc="{self.statements} queries", '
+            f"db-slowest;dur={self.slowest * 1000:.2f}, app;dur={total * 1000:.2f}"
+        )
+
+
+_current: ContextVar[Optional[RequestStats]] = ContextVar("sql_request_stats", default=None)
+
+
+def current() -> Optional[RequestStats]:
+    return _current.get()
+
+
+# 엔진 이벤트
+
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("instr_started", []).append(time.perf_counter())
+
+
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["instr_started"].pop()
+    stats = _current.get()
+    if stats is not None:
+        stats.record(statement, time.perf_counter() - started)
+
+
+def _on_error(exception_context):
+    starts = exception_context.connection.info.get("instr_started") if exception_context.connection else None
+    if starts:
+        starts.pop()
+
+
+def attach(engine):
+    """동기 엔진(비동기 엔진이면 .sync_engine)에 계측 이벤트를 건다. 여러 번 불러도 한 번만 걸린다."""
+    if not event.contains(engine, "before_cursor_execute", _before_execute):
+        event.listen(engine, "before_cursor_execute", _before_execute)
+        event.listen(engine, "after_cursor_execute", _after_execute)
+        event.listen(engine, "handle_error", _on_error)
+
+
+# 라우트별 히스토그램
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)   # 마지막 칸은 +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Registry:
+    """(method, route) 별 요청 시간 / DB 시간 / SQL 문 수 히스토그램 + N+1 경고 수."""
+
+    METRICS = (
+        ("routina_http_request_duration_seconds", "요청 처리 시간", DURATION_BUCKETS),
+        ("routina_db_time_seconds", "요청당 DB 시간 합계", DURATION_BUCKETS),
+        ("routina_db_statements", "요청당 SQL 문 수", STATEMENT_BUCKETS),
+    )
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.series: Dict[Tuple[str, str], List[Histogram]] = {}
+        self.repeats = defaultdict(int)
+
+    def observe(self, method: str, route: str, total: float, stats: RequestStats, repeated: bool):
+        with self.lock:
+            hists = self.series.get((method, route))
+            if hists is None:
+                hists = self.series[(method, route)] = [Histogram(b) for _, _, b in self.METRICS]
+            for hist, value in zip(hists, (total, stats.db_time, stats.statements)):
+                hist.observe(value)
+            if repeated:
+                self.repeats[(method, route)] += 1
+
+    def render(self) -> str:
+        lines = []
+        with self.lock:
+            for i, (name, help_text, buckets) in enumerate(self.METRICS):
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+                for (method, route), hists in sorted(self.series.items()):
+                    hist, labels = hists[i], f'method="{method}",route="{_escape(route)}"'
+                    cumulative = 0
+                    for le, n in zip((*buckets, "+Inf"), hist.counts):
+                        cumulative += n
+                        lines.append(f'{name}_bucket{{{labels},le="{le}"}} {cumulative}')
+                    lines.append(f"{name}_sum{{{labels}}} {hist.sum:.6g}")
+                    lines.append(f"{name}_count{{{labels}}} {hist.count}")
+            name = "routina_sql_repeat_warnings_total"
+            lines += [f"# HELP {name} 같은 SQL 모양이 임계값을 넘게 반복된 요청 수 (N+1 의심)",
+                      f"# TYPE {name} counter"]
+            for (method, route), n in sorted(self.repeats.items()):
+                lines.append(f'{name}{{method="{method}",route="{_escape(route)}"}} {n}')
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"')
+
+
+def gauges(prefix: str, values: dict) -> str:
+    """{이름: 숫자} → Prometheus gauge 텍스트. 한 단계 중첩된 dict 는 kind label 로 펼치고
+    숫자가 아닌 값은 건너뛴다. (예: pool_metrics(), cache.stats())"""
+    lines = []
+    for key, value in values.items():
+        rows = value.items() if isinstance(value, dict) else [(key, value)]
+        labels = f'{{kind="{_escape(str(key))}"}}' if isinstance(value, dict) else ""
+        for name, number in rows:
+            if isinstance(number, (int, float)) and not isinstance(number, bool):
+                lines.append(f"{prefix}_{name}{labels} {number}")
+    return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+# ASGI 미들웨어
+
+class SQLTimingMiddleware:
+    """요청마다 RequestStats 를 열고 응답 시작 시 Server-Timing 헤더를 붙인다.
+    (BaseHTTPMiddleware 는 스트리밍 응답을 한 번 더 감싸므로 순수 ASGI 로 구현)"""
+
+    def __init__(self, app, threshold: int = REPEAT_THRESHOLD, strict: bool = REPEAT_STRICT):
+        self.app = app
+        self.threshold = threshold
+        self.strict = strict
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        state = {"repeated": [], "replaced": False}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                state["repeated"] = repeated = stats.repeated(self.threshold)
+                if repeated:
+                    _warn(scope, stats, repeated)
+                if repeated and self.strict:
+                    state["replaced"] = True
+                    body = orjson.dumps({"detail": "SQL repeat threshold exceeded (possible N+1)",
+                                         "statements": [{"sql": s, "count": n} for s, n in repeated]})
+                    await send({"type": "http.response.start", "status": 500,
+                                "headers": [(b"content-type", b"application/json"),
+                                            (b"content-length", str(len(body)).encode())]})
+                    await send({"type": "http.response.body", "body": body})
+                    return
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", stats.server_timing(time.perf_counter() - started).encode()))
+                message = {**message, "headers": headers}
+            elif state["replaced"]:
+                return
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            route = scope.get("route")
+            registry.observe(scope["method"], getattr(route, "path", "<unmatched>"),
+                             time.perf_counter() - started, stats, bool(state["repeated"]))
+
+
+def _warn(scope, stats: RequestStats, repeated: Iterable[Tuple[str, int]]):
+    for shape, n in repeated:
+        logger.warning("possible N+1: %s %s ran %d times (%d statements total): %s",
+                       scope["method"], scope["path"], n, stats.statements, shape)
+
+
+def install(app, engines):
+    for engine in engines:
+        attach(engine)
+    app.add_middleware(SQLTimingMiddleware)
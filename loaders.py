@@ -0,0 +1,77 @@
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+import alarm_schedule
+import models
+from serializers import ALARM_COLUMNS, LINK_COLUMNS, ROUTINE_COLUMNS
+
+
+# 알람 목록 + 연결 루틴 + 반복 요일을 한 번에 묶어서 들고 다니는 컨테이너
+# 알람/링크/루틴은 ORM 객체가 아니라 필요한 컬럼만 읽은 Core 행 (속성 이름은 같음)
+@dataclass
+class AlarmGraph:
+    alarms: List[Any] = field(default_factory=list)
+    links: Dict[str, List[Any]] = field(default_factory=lambda: defaultdict(list))
+    routines: Dict[str, Any] = field(default_factory=dict)
+    weekdays: Dict[str, List[int]] = field(default_factory=lambda: defaultdict(list))
+
+    def routines_of(self, alarm_id: str) -> List[Any]:
+        # order 순서대로, 실제 존재하는 루틴만
+        return [self.routines[l.routine_id] for l in self.links[alarm_id] if l.routine_id in self.routines]
+
+
+def load_alarm_graph(
+    db: Session,
+    alarms: List[Any],
+    with_routines: bool = True,
+    with_repeat_days: bool = True,
+    known_routines: Optional[List[Any]] = None,
+) -> AlarmGraph:
+    """알람 목록에 딸린 링크/루틴/반복 요일을 IN 쿼리로 한꺼번에 가져온다 (삭제 표시된 루틴은 제외).
+
+    알람 개수와 상관없이 최대 2번의 쿼리만 실행한다 (N+1 방지).
+    known_routines 로 이미 읽어 둔 루틴을 넘기면 그건 다시 조회하지 않는다.
+    """
+    graph = AlarmGraph(alarms=list(alarms))
+    alarm_ids = [a.alarm_id for a in graph.alarms]
+    if not alarm_ids:
+        return graph
+
+    # 1. 알람-루틴 링크 (알람별 order 순)
+    links = db.execute(
+        select(*LINK_COLUMNS)
+        .join(models.Routine, models.Routine.routine_id == models.AlarmRoutine.routine_id)
+        .where(models.AlarmRoutine.alarm_id.in_(alarm_ids), models.Routine.deleted_at.is_(None))
+        .order_by(models.AlarmRoutine.alarm_id, models.AlarmRoutine.order)
+    ).all()
+    for link in links:
+        graph.links[link.alarm_id].append(link)
+
+    # 2. 링크된 루틴 본문
+    if with_routines:
+        for r in known_routines or []:
+            graph.routines[r.routine_id] = r
+        missing = {l.routine_id for l in links} - graph.routines.keys()
+        if missing:
+            for r in db.execute(select(*ROUTINE_COLUMNS).where(
+                models.Routine.routine_id.in_(missing), models.Routine.deleted_at.is_(None)
+            )):
+                graph.routines[r.routine_id] = r
+
+    # 3. 반복 요일 (알람 행의 비트마스크에서 바로, 쿼리 없음)
+    if with_repeat_days:
+        for a in graph.alarms:
+            graph.weekdays[a.alarm_id] = alarm_schedule.mask_to_days(a.repeat_mask)
+
+    return graph
+
+
+def load_user_alarm_graph(db: Session, user_id: str, **kwargs) -> AlarmGraph:
+    alarms = db.execute(
+        select(*ALARM_COLUMNS).where(models.Alarm.user_id == user_id, models.Alarm.deleted_at.is_(None))
+    ).all()
+    return load_alarm_graph(db, alarms, **kwargs)
@@ -1,18 +1,23 @@
-from fastapi import FastAPI, Depends, HTTPException, Path, APIRouter, Depends, Header, Query
+from fastapi import FastAPI, Depends, HTTPException, Path, APIRouter, Depends, Header, Query, BackgroundTasks, Request
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from sqlalchemy.orm import Session
-from database import SessionLocal, engine
-import models, schemas
-import uuid
-from typing import List
+from database import SessionLocal, engine, async_engine, replica_engine, async_replica_engine, ASYNC_DB, pool_metrics, use_db_key_storage
+import models, schemas, ids, loaders, stats, executions, sync, history, export, alarm_schedule, scheduler, instrumentation, purge, routine_order, writebehind, routing, archive, async_routes
+from serializers import FastJSONResponse, ALARM_COLUMNS, routine_out, alarm_summary, select_routines
+from cache import cache, ROUTINE_READS, ALARM_READS
+from typing import List, Optional
 from pydantic import BaseModel
-from datetime import time as time_type, datetime
+from datetime import time as time_type, datetime, date
 from datetime import datetime
-from pytz import timezone
 from collections import defaultdict
+from sqlalchemy import bindparam, func, insert, select, update
+from sqlalchemy.exc import StatementError
+from timeutils import month_range, korean_week_start, utcnow
 
+use_db_key_storage(engine)
 models.Base.metadata.create_all(bind=engine)
 
-app = FastAPI()
+app = FastAPI(default_response_class=FastJSONResponse)
 
 from datetime import timedelta
 def get_korean_week(dt: datetime) -> int:
@@ -28,13 +33,59 @@ def get_korean_week(dt: datetime) -> int:
     delta_days = (dt - first_sunday).days
     return 2 + (delta_days // 7)
 
-def get_db():
-    db = SessionLocal()
+# 통계 조회 라우트는 routing.ROUTE_POLICY 에 따라 replica 세션 (REPLICA_DATABASE_URL 이 있을 때)
+def get_db(request: Request):
+    db = routing.session_factory(routing.target_for(request))()
     try:
         yield db
+        routing.after_request(request, db)
     finally:
         db.close()
 
+# UUID 형식이 아닌 id (ids.InvalidKey) 는 400, 나머지 DB 오류는 그대로
+@app.exception_handler(StatementError)
+async def invalid_key_handler(request: Request, exc: StatementError):
+    if isinstance(exc.orig, ids.InvalidKey):
+        return FastJSONResponse({"detail": str(exc.orig)}, status_code=400)
+    raise exc
+
+# DB 커넥션 풀 상태 (사용 중 / 유휴 / overflow 커넥션, checkout 대기 시간)
+@app.get("/metrics/db-pool")
+def db_pool_metrics():
+    return pool_metrics()
+
+# 조회 캐시 적중/미스/eviction 카운터
+@app.get("/metrics/cache")
+def cache_metrics():
+    return cache.stats()
+
+# 쓰기 지연 버퍼 상태 (대기 건수, 가장 오래된 대기 시간, flush / 거절 수)
+@app.get("/metrics/write-behind")
+def write_behind_metrics():
+    return writebehind.current.stats() if writebehind.current else {"enabled": False}
+
+# replica 라우팅 상태 (복제 지연, 상태, 라우트별 replica / primary 대체 횟수)
+@app.get("/metrics/replica")
+def replica_metrics():
+    return routing.router.stats()
+
+# 소프트 삭제 정리 작업 진행 상황 (대기 중 task 수, 지금까지 지운 행 수)
+@app.get("/metrics/purge")
+def purge_metrics(db: Session = Depends(get_db)):
+    return purge.progress(db)
+
+# Prometheus 텍스트 형식: 라우트별 요청/DB 시간·SQL 문 수 히스토그램 + 풀/캐시 상태
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    return PlainTextResponse(
+        instrumentation.registry.render()
+        + instrumentation.gauges("routina_db_pool", pool_metrics())
+        + instrumentation.gauges("routina_cache", cache.stats())
+        + instrumentation.gauges("routina_replica", routing.router.stats())
+        + (instrumentation.gauges("routina_write_behind", writebehind.current.stats()) if writebehind.current else ""),
+        media_type="text/plain; version=0.0.4",
+    )
+
 # ✅ 로그인 엔드포인트 (고정된 계정 검증)
 class LoginRequest(BaseModel):
     email: str
@@ -66,7 +117,7 @@ def create_routine(
 
     # ✅ DB 객체 생성
     kwargs = {
-        "routine_id": str(uuid.uuid4()),
+        "routine_id": ids.new_id(),
         "user_id": user_id,  # ✅ Header에서 받은 user_id 사용
         "title": routine.title,
         "type": routine.type,
@@ -79,47 +130,24 @@ def create_routine(
 
     db_routine = models.Routine(**kwargs)
     db.add(db_routine)
+    out = routine_out(db_routine)   # 커밋 후 refresh 하지 않고 넣은 값으로 응답
     db.commit()
-    db.refresh(db_routine)
+    cache.invalidate(user_id, ROUTINE_READS)
 
-    return {
-        "routine_id": db_routine.routine_id,
-        "user_id": db_routine.user_id,
-        "title": db_routine.title,
-        "type": db_routine.type,
-        "goal_value": db_routine.goal_value,
-        "duration_seconds": db_routine.duration_seconds,
-        "deadline_time": db_routine.deadline_time.strftime("%H:%M") if db_routine.deadline_time else None,
-        "success_note": db_routine.success_note
-    }
+    return FastJSONResponse(out)
 
 
 router = APIRouter()
 @router.get("/routines", response_model=List[schemas.RoutineOut])
 # def get_routines(user_id: str = Query(...), db: Session = Depends(get_db)):
 def get_routines(user_id: str = Header(..., alias="user-id"), db: Session = Depends(get_db)):
-    # db_routines = db.query(models.Routine).all()
-    db_routines = (
-        db.query(models.Routine)
-        .filter(models.Routine.user_id == user_id)   # ← 필터 추가
-        .all()
-    )
-    
-    # deadline_time이 datetime.time -> str로 변환
-    routines_out = []
-    for routine in db_routines:
-        routines_out.append({
-            "routine_id": routine.routine_id,
-            "user_id": routine.user_id,
-            "title": routine.title,
-            "type": routine.type,
-            "goal_value": routine.goal_value,
-            "duration_seconds": routine.duration_seconds,
-            "deadline_time": routine.deadline_time.strftime("%H:%M") if routine.deadline_time else None,
-            "success_note": routine.success_note
-        })
-    
-    return routines_out
+    cached = cache.get(user_id, "routines")
+    if cached is not None:
+        return FastJSONResponse(cached)
+
+    # 필요한 컬럼만 Core 행으로 (deadline_time 은 "HH:MM")
+    routines_out = [routine_out(r) for r in select_routines(db, models.Routine.user_id == user_id)]
+    return FastJSONResponse(cache.set(user_id, "routines", routines_out))
 
 @router.post("/alarms", response_model=schemas.AlarmOut)
 def create_alarm(
@@ -127,7 +155,7 @@ def create_alarm(
     user_id: str = Header(..., alias="user-id"),
     db: Session = Depends(get_db),
 ):
-    alarm_id = str(uuid.uuid4())
+    alarm_id = ids.new_id()
 
     # time 을 datetime.time 으로 변환
     time_obj = (
@@ -135,6 +163,7 @@ def create_alarm(
         else time_type.fromisoformat(alarm.time)
     )
 
+    mask = alarm_schedule.days_to_mask(alarm.repeat_days)
     db_alarm = models.Alarm(
         alarm_id=alarm_id,
         user_id=user_id,
@@ -142,36 +171,28 @@ def create_alarm(
         status=alarm.status,
         sound_volume=alarm.sound_volume or 0.8,
         vibration_on=alarm.vibration_on,
-        repeat_days=",".join(map(str, alarm.repeat_days or [])),
+        **alarm_schedule.schedule_values(time_obj, mask, alarm.status),
     )
     db.add(db_alarm)
+    db.flush()
+
+    # 루틴 연결 → multi-row INSERT 한 번 (반복 요일은 알람 행의 repeat_mask)
+    # order 는 클라이언트가 보낸 순번 순서대로 GAP 간격 키로 저장
+    if alarm.routines:
+        db.execute(insert(models.AlarmRoutine), [
+            {"alr_id": ids.new_id(), "alarm_id": alarm_id, "routine_id": r.routine_id, "order": key}
+            for r, key in zip(alarm.routines, routine_order.initial_keys(alarm.routines))
+        ])
     db.commit()
-
-    # 루틴 연결
-    for r in alarm.routines:
-        db.add(models.AlarmRoutine(
-            alr_id=str(uuid.uuid4()),
-            alarm_id=alarm_id,
-            routine_id=r.routine_id,
-            order=r.order,
-        ))
-    db.commit()
-
-    # 반복 요일(옵션)
-    for wd in alarm.repeat_days or []:
-        db.add(models.AlarmRepeatDay(
-            id=str(uuid.uuid4()),
-            alarm_id=alarm_id,
-            weekday=wd,
-        ))
-    db.commit()
+    cache.invalidate(user_id, ALARM_READS)
+    scheduler.notify([alarm_id])
 
     return {
         "alarm_id"     : alarm_id,
         "time"         : time_obj.strftime("%H:%M"),
-        "status"       : db_alarm.status,
-        "sound_volume" : db_alarm.sound_volume,
-        "repeat_days"  : alarm.repeat_days,
+        "status"       : alarm.status,
+        "sound_volume" : alarm.sound_volume or 0.8,
+        "repeat_days"  : alarm_schedule.mask_to_days(mask),
         "routines"     : alarm.routines,
     }
 
@@ -181,44 +202,40 @@ def set_alarm_repeat_days(
     req: schemas.AlarmRepeatDaysIn = None,
     db: Session = Depends(get_db)
 ):
-    db.query(models.AlarmRepeatDay).filter(models.AlarmRepeatDay.alarm_id == alarm_id).delete()
-    entries = []
-    for wd in req.repeat_days:
-        entry = models.AlarmRepeatDay(
-            id=str(uuid.uuid4()),
-            alarm_id=alarm_id,
-            weekday=wd
-        )
-        db.add(entry)
-        entries.append(entry)
+    alarm = db.query(models.Alarm).filter(models.Alarm.alarm_id == alarm_id, models.Alarm.deleted_at.is_(None)).first()
+    if not alarm:
+        raise HTTPException(status_code=404, detail="Alarm not found")
+    mask = alarm_schedule.days_to_mask(req.repeat_days)
+    alarm_schedule.apply(alarm, mask)
+    owner = alarm.user_id
     db.commit()
-    return entries
+    cache.invalidate(owner, ALARM_READS)
+    scheduler.notify([alarm_id])
+    return [{"alarm_id": alarm_id, "weekday": wd} for wd in alarm_schedule.mask_to_days(mask)]
 
 @app.get("/dashboard")
 def get_dashboard(user_id: str = Query(...), db: Session = Depends(get_db)):
-    alarms = db.query(models.Alarm).filter(models.Alarm.user_id == user_id).all()
+    cached = cache.get(user_id, "dashboard")
+    if cached is not None:
+        return FastJSONResponse(cached)
+
+    all_routines = select_routines(db, models.Routine.user_id == user_id)
+    graph = loaders.load_user_alarm_graph(db, user_id, known_routines=all_routines)
+    routines_by_id = {r.routine_id: routine_out(r) for r in [*all_routines, *graph.routines.values()]}
     result = []
-    for alarm in alarms:
-        ar_links = db.query(models.AlarmRoutine).filter(models.AlarmRoutine.alarm_id == alarm.alarm_id).order_by(models.AlarmRoutine.order).all()
-        routines = []
-        for link in ar_links:
-            r = db.query(models.Routine).filter(models.Routine.routine_id == link.routine_id).first()
-            if r:
-                routines.append(r)
-        repeat_days = db.query(models.AlarmRepeatDay.weekday).filter(models.AlarmRepeatDay.alarm_id == alarm.alarm_id).all()
-        weekdays = [row.weekday for row in repeat_days]
+    for alarm in graph.alarms:
         result.append({
             "alarm_id": alarm.alarm_id,
             "time": alarm.time.strftime("%H:%M") if alarm.time else None,
             "status": alarm.status,
-            "repeat_days": weekdays,
-            "routines": [r.__dict__ for r in routines]
+            "repeat_days": graph.weekdays[alarm.alarm_id],
+            "paused_until": alarm_schedule.resume_day(alarm.paused_until),
+            "routines": [routines_by_id[r.routine_id] for r in graph.routines_of(alarm.alarm_id)]
         })
-    all_routines = db.query(models.Routine).filter(models.Routine.user_id == user_id).all()
-    return {
+    return FastJSONResponse(cache.set(user_id, "dashboard", {
         "alarms": result,
-        "routines": [r.__dict__ for r in all_routines]
-    }
+        "routines": [routines_by_id[r.routine_id] for r in all_routines]
+    }))
 @app.put("/routines/{routine_id}", response_model=schemas.RoutineOut)
 def update_routine(
     routine_id: str,
@@ -231,7 +248,8 @@ def update_routine(
         db.query(models.Routine)
         .filter(
             models.Routine.routine_id == routine_id,
-            models.Routine.user_id == user_id        # ← 헤더값
+            models.Routine.user_id == user_id,       # ← 헤더값
+            models.Routine.deleted_at.is_(None)
         )
         .first()
     )
@@ -249,19 +267,11 @@ def update_routine(
     for k, v in data.items():
         setattr(r, k, v)
 
+    out = routine_out(r)
     db.commit()
-    db.refresh(r)
+    cache.invalidate(user_id, ROUTINE_READS)
 
-    return {
-        "routine_id": r.routine_id,
-        "user_id": r.user_id,
-        "title": r.title,
-        "type": r.type,
-        "goal_value": r.goal_value,
-        "duration_seconds": r.duration_seconds,
-        "deadline_time": r.deadline_time.strftime("%H:%M") if r.deadline_time else None,
-        "success_note": r.success_note,
-    }
+    return FastJSONResponse(out)
 
 
 # 루틴 삭제
@@ -274,13 +284,22 @@ def delete_routine(
     user_id: str = Header(..., alias="user-id"),
     db: Session = Depends(get_db)
 ):
+    # 본체에 삭제 표시만 하고 바로 응답 (연결/수행 결과/집계는 purge 워커가 배치로 정리)
     deleted = (
         db.query(models.Routine)
         .filter(models.Routine.routine_id == routine_id,
-                models.Routine.user_id == user_id)
-        .delete()
+                models.Routine.user_id == user_id,
+                models.Routine.deleted_at.is_(None))
+        .update({models.Routine.deleted_at: utcnow()}, synchronize_session=False)
     )
+    if deleted:
+        link_ids = [alr_id for (alr_id,) in db.query(models.AlarmRoutine.alr_id).filter_by(routine_id=routine_id)]
+        sync.tombstone(db, user_id, "routine", [routine_id])
+        sync.tombstone(db, user_id, "alarm_routine", link_ids)
+        purge.enqueue(db, user_id, "routine", routine_id)
     db.commit()
+    cache.invalidate(user_id, ROUTINE_READS + ALARM_READS)
+    purge.notify()
 
     if deleted == 0:
         raise HTTPException(status_code=404, detail="Routine not found")
@@ -299,81 +318,222 @@ def delete_alarm(
     user_id: str = Header(..., alias="user-id", description="Authenticated user ID"),
     db: Session = Depends(get_db),
 ) -> None:
-
-    # 🔽 1. 관련된 execution_routine 먼저 삭제
-    exec_ids = db.query(models.AlarmExecutionLog.exec_id).filter_by(alarm_id=alarm_id).subquery()
-    db.query(models.AlarmExecutionRoutine).filter(models.AlarmExecutionRoutine.exec_id.in_(exec_ids)).delete(synchronize_session=False)
-
-    # 🔽 2. 그 다음 execution_log 삭제
-    db.query(models.AlarmExecutionLog).filter_by(alarm_id=alarm_id).delete()
-
-    # 🔽 3. 연결된 루틴 / 요일 삭제
-    db.query(models.AlarmRoutine).filter_by(alarm_id=alarm_id).delete()
-    db.query(models.AlarmRepeatDay).filter_by(alarm_id=alarm_id).delete()
-
-    # 🔽 4. 마지막으로 알람 삭제
+    # 본체에 삭제 표시 + 그 알람의 수행 기록만큼 집계 차감을 한 트랜잭션으로 (기록/연결 행은 purge 워커가 배치로 정리)
     deleted = (
         db.query(models.Alarm)
-        .filter(models.Alarm.alarm_id == alarm_id, models.Alarm.user_id == user_id)
-        .delete()
+        .filter(models.Alarm.alarm_id == alarm_id,
+                models.Alarm.user_id == user_id,
+                models.Alarm.deleted_at.is_(None))
+        .update({models.Alarm.deleted_at: utcnow(), models.Alarm.next_fire_at: None}, synchronize_session=False)
     )
+    if deleted:
+        link_ids = [alr_id for (alr_id,) in db.query(models.AlarmRoutine.alr_id).filter_by(alarm_id=alarm_id)]
+        sync.tombstone(db, user_id, "alarm", [alarm_id])
+        sync.tombstone(db, user_id, "alarm_routine", link_ids)
+        stats.remove_alarm_executions(db, user_id, alarm_id)
+        purge.enqueue(db, user_id, "alarm", alarm_id)
 
     db.commit()
+    cache.invalidate(user_id, ALARM_READS)
+    scheduler.notify([alarm_id])
+    purge.notify()
 
     if deleted == 0:
         raise HTTPException(status_code=404, detail="Alarm not found")
 
 
+# 쓰기 지연 모드: 검증을 통과한 기록을 버퍼에 넣고 exec_id 만 돌려준다 (가득 차면 503)
+def queue_executions(items) -> List[str]:
+    try:
+        # spool fsync 는 async 모드에서도 이벤트 루프 밖에서
+        return async_routes.offload(writebehind.current.submit, items)
+    except writebehind.QueueFull:
+        raise HTTPException(
+            status_code=503, detail="Execution queue is full",
+            headers={"Retry-After": str(writebehind.RETRY_AFTER_SECONDS)},
+        )
+
 # 수행 기록 저장
 @app.post("/alarm-executions")
 def save_alarm_execution(data: schemas.AlarmExecutionCreate, db: Session = Depends(get_db)):
-    exec_id = str(uuid.uuid4())
-    total = len(data.routines)
-    completed = sum(1 for r in data.routines if r.completed)
-    rate = round(completed / total, 3) if total > 0 else 0.0
-    status = "SUCCESS" if completed == total else ("PARTIAL" if completed > 0 else "ABORTED")
-
-    log = models.AlarmExecutionLog(
-        exec_id=exec_id,
-        alarm_id=data.alarm_id,
-        scheduled_ts=data.scheduled_ts,
-        dismissed_ts=data.dismissed_ts,
-        total_routines=total,
-        completed_routines=completed,
-        success_rate=rate,
-        status=status
-    )
-    db.add(log)
+    # 삭제 표시된 알람/루틴에 대한 기록은 받지 않는다 (/batch 와 같은 검증)
+    owners, errors = executions.validate_batch(db, [data])
+    if errors:
+        raise HTTPException(status_code=404, detail=errors[0])
+    owner = owners[data.alarm_id]
+
+    if writebehind.current is not None:
+        exec_id, = queue_executions([(owner, data)])
+        routing.mark_write(owner)
+        return {"message": "Execution queued", "exec_id": exec_id}
+
+    log, details = executions.build_rows(data)
+
+    # 로그 + 루틴별 기록 + 일자별 집계를 한 트랜잭션으로
+    executions.insert_rows(db, [(owner, log, details)])
+    db.commit()
+    routing.mark_write(owner)
+    return {"message": "Execution saved", "exec_id": log["exec_id"]}
+
+# 오프라인 동안 쌓인 수행 기록 일괄 업로드
+@app.post("/alarm-executions/batch")
+def save_alarm_executions_batch(items: List[schemas.AlarmExecutionCreate], db: Session = Depends(get_db)):
+    # 1. 알람/루틴 존재 여부를 배치 단위로 검증
+    owners, errors = executions.validate_batch(db, items)
+
+    if writebehind.current is not None:
+        valid = [i for i in range(len(items)) if i not in errors]
+        exec_ids = dict(zip(valid, queue_executions([(owners[items[i].alarm_id], items[i]) for i in valid])))
+        for owner in {owners[items[i].alarm_id] for i in valid}:
+            routing.mark_write(owner)
+        return {"saved": len(valid), "failed": len(errors), "results": [
+            {"index": i, "exec_id": exec_ids.get(i), "error": errors.get(i)} for i in range(len(items))
+        ]}
+
+    # 2. 통과한 항목만 multi-row INSERT 로 한 트랜잭션에 저장
+    results = []
+    entries = []
+    for i, data in enumerate(items):
+        if i in errors:
+            results.append({"index": i, "exec_id": None, "error": errors[i]})
+            continue
+        log, details = executions.build_rows(data)
+        entries.append((owners[data.alarm_id], log, details))
+        results.append({"index": i, "exec_id": log["exec_id"], "error": None})
+    executions.insert_rows(db, entries)
     db.commit()
+    for owner in {owner for owner, _, _ in entries}:
+        routing.mark_write(owner)
 
-    for r in data.routines:
-        detail = models.AlarmExecutionRoutine(
-            axr_id=str(uuid.uuid4()),
-            exec_id=exec_id,
-            routine_id=r.routine_id,
-            completed=int(r.completed),
-            actual_value=r.actual_value,
-            completed_ts=r.completed_ts,
-            abort_ts=r.abort_ts,
-            order=r.order
+    return {"saved": len(entries), "failed": len(errors), "results": results}
+
+# 수행 이력 (최신순, keyset 페이지네이션)
+@app.get("/alarm-executions")
+def list_alarm_executions(
+    user_id: str = Header(..., alias="user-id"),
+    alarm_id: Optional[str] = Query(None),
+    status: Optional[List[str]] = Query(None, description="SUCCESS | PARTIAL | ABORTED | MISSED (여러 개 가능)"),
+    date_from: Optional[date] = Query(None, description="KST 날짜 (포함)"),
+    date_to: Optional[date] = Query(None, description="KST 날짜 (포함)"),
+    cursor: Optional[str] = Query(None, description="이전 응답의 next_cursor"),
+    limit: int = Query(history.DEFAULT_LIMIT, ge=1, le=history.MAX_LIMIT),
+    include_routines: bool = Query(False),
+    db: Session = Depends(get_db)
+):
+    writebehind.read_your_writes(user_id=user_id)
+    try:
+        return history.page_executions(
+            db, user_id, alarm_id=alarm_id, statuses=status, date_from=date_from, date_to=date_to,
+            cursor=cursor, limit=limit, include_routines=include_routines,
         )
-        db.add(detail)
-    db.commit()
-    return {"message": "Execution saved", "exec_id": exec_id}
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
 
-# 루틴 통계 요약 (완료율)
+# 루틴 통계 요약 (루틴별 완료율 + 현재/최고 연속 달성 일수)
 @app.get("/routine-stats")
-def routine_stats(user_id: str, db: Session = Depends(get_db)):
-    from sqlalchemy import func
-    data = db.query(
-        models.Routine.title,
-        func.count(models.AlarmExecutionRoutine.axr_id).label("total"),
-        func.sum(models.AlarmExecutionRoutine.completed).label("done")
-    ).join(models.AlarmExecutionRoutine, models.Routine.routine_id == models.AlarmExecutionRoutine.routine_id).filter(models.Routine.user_id == user_id).group_by(models.Routine.title).all()
+def routine_stats(
+    user_id: str,
+    date_from: Optional[date] = Query(None, description="KST 날짜 (포함)"),
+    date_to: Optional[date] = Query(None, description="KST 날짜 (포함)"),
+    db: Session = Depends(get_db)
+):
+    writebehind.read_your_writes(user_id=user_id)
     return [
-        {"title": title, "done": int(done or 0), "total": total, "rate": round(done / total, 2) if total > 0 else 0.0}
-        for title, total, done in data
+        {
+            "routine_id": r.routine_id,
+            "title": r.title,
+            "done": int(r.done or 0),
+            "total": int(r.total),
+            "rate": round(int(r.done or 0) / int(r.total), 2) if r.total else 0.0,
+            "current_streak": r.current_streak,
+            "best_streak": r.best_streak,
+            "last_date": r.last_date,
+        }
+        for r in stats.routine_summary(db, user_id, date_from, date_to)
     ]
+# 여러 알람 상태 변경 / 일시정지(휴가 모드)를 한 번에
+# 비활성화·일시정지는 UPDATE 한 번, 활성화는 다음 울림 계산용 SELECT 한 번 + executemany UPDATE 한 번
+@router.patch("/alarms/status")
+def update_alarm_statuses(
+    req: schemas.AlarmBulkStatus,
+    user_id: str = Header(..., alias="user-id"),
+    db: Session = Depends(get_db)
+):
+    if req.all == (req.alarm_ids is not None):
+        raise HTTPException(status_code=400, detail="Specify either alarm_ids or all")
+    pause = "paused_until" in req.model_fields_set
+    if req.status is None and not pause:
+        raise HTTPException(status_code=400, detail="Nothing to update")
+
+    alarm = models.Alarm
+    criteria = [alarm.user_id == user_id, alarm.deleted_at.is_(None)]
+    if not req.all:
+        if not req.alarm_ids:
+            return {"updated": 0}
+        criteria.append(alarm.alarm_id.in_(set(req.alarm_ids)))
+    values = {}
+    if pause:
+        values["paused_until"] = alarm_schedule.resume_at(req.paused_until)
+
+    if req.status == "Active":
+        # next_fire_at 은 알람마다 다르므로 읽어서 계산한 뒤 한 문장(executemany)으로 쓴다
+        rows = db.execute(
+            select(alarm.alarm_id, alarm.time, alarm.repeat_mask, alarm.status, alarm.next_fire_at).where(*criteria)
+        ).all()
+        if rows:
+            table = alarm.__table__
+            db.execute(
+                update(table)
+                .where(table.c.alarm_id == bindparam("b_id"))
+                .values(
+                    status="Active",
+                    next_fire_at=bindparam("b_next", type_=table.c.next_fire_at.type),
+                    **values,
+                ),
+                [
+                    {
+                        "b_id": r.alarm_id,
+                        "b_next": r.next_fire_at if r.status == "Active"
+                        else alarm_schedule.compute_next_fire(r.time, r.repeat_mask or 0, "Active"),
+                    }
+                    for r in rows
+                ],
+            )
+        updated = len(rows)
+    else:
+        if req.status == "Inactive":
+            values.update(status="Inactive", next_fire_at=None)
+        updated = db.query(alarm).filter(*criteria).update(values, synchronize_session=False)
+    db.commit()
+    cache.invalidate(user_id, ALARM_READS)
+    if req.all:
+        scheduler.notify_user(user_id)
+    else:
+        scheduler.notify(req.alarm_ids)
+    return {"updated": updated}
+
+
+# 알람 안에서 루틴 하나 순서 바꾸기 (드래그 앤 드롭)
+# 연결 행 하나만 새 키로 UPDATE, 키가 너무 붙으면 응답 뒤 백그라운드에서 다시 편다
+@app.patch("/alarms/{alarm_id}/routines/order")
+def move_alarm_routine(
+    alarm_id: str,
+    req: schemas.AlarmRoutineMove,
+    background_tasks: BackgroundTasks,
+    user_id: str = Header(..., alias="user-id"),
+    db: Session = Depends(get_db)
+):
+    rows = routine_order.load(db, alarm_id, user_id)
+    if not any(r.routine_id == req.routine_id for r in rows):
+        raise HTTPException(status_code=404, detail="Routine not linked to alarm")
+    ordered, crowded = routine_order.move(db, rows, req.routine_id, req.position)
+    db.commit()
+    cache.invalidate(user_id, ALARM_READS)
+    if crowded:
+        background_tasks.add_task(routine_order.renumber_later, SessionLocal, alarm_id)
+    return [{"routine_id": rid, "order": rank} for rank, rid in enumerate(ordered, 1)]
+
+
 # 알람 활성화 / 비활성화 토글
 @router.patch("/alarms/{alarm_id}/status", status_code=204)
 def update_alarm_status(
@@ -382,16 +542,19 @@ def update_alarm_status(
     user_id: str = Header(..., alias="user-id"),
     db: Session = Depends(get_db)
 ):
-    # 내 알람인지 확인 후 상태만 업데이트
-    updated = (
+    # 내 알람인지 확인 후 상태 + 다음 울림 시각 업데이트
+    alarm = (
         db.query(models.Alarm)
-        .filter(models.Alarm.alarm_id == alarm_id, models.Alarm.user_id == user_id)
-        .update({"status": status})
+        .filter(models.Alarm.alarm_id == alarm_id, models.Alarm.user_id == user_id, models.Alarm.deleted_at.is_(None))
+        .first()
     )
-    db.commit()
-
-    if updated == 0:
+    if not alarm:
         raise HTTPException(status_code=404, detail="Alarm not found")
+    alarm.status = status
+    alarm_schedule.apply(alarm)
+    db.commit()
+    cache.invalidate(user_id, ALARM_READS)
+    scheduler.notify([alarm_id])
 
     # 204 No Content → 반환 바디 없음
 
@@ -402,19 +565,39 @@ def get_alarms(
     user_id: str = Header(..., alias="user-id"),
     db: Session = Depends(get_db)
 ):
-    alarms = db.query(models.Alarm).filter(models.Alarm.user_id == user_id).all()
+    cached = cache.get(user_id, "alarms")
+    if cached is not None:
+        return FastJSONResponse(cached)
+
+    graph = loaders.load_user_alarm_graph(db, user_id, with_routines=False, with_repeat_days=False)
     result = []
-    for alarm in alarms:
-        routines = db.query(models.AlarmRoutine).filter(models.AlarmRoutine.alarm_id == alarm.alarm_id).order_by(models.AlarmRoutine.order).all()
+    for alarm in graph.alarms:
         result.append({
+            **alarm_summary(alarm),
+            "routines": [
+                {"routine_id": r.routine_id, "order": rank} for rank, r in enumerate(graph.links[alarm.alarm_id], 1)
+            ]
+        })
+    return FastJSONResponse(cache.set(user_id, "alarms", result))
+
+# 앞으로 within 분 안에 울릴 알람 (next_fire_at 인덱스 범위 조회)
+@app.get("/alarms/upcoming")
+def get_upcoming_alarms(
+    within: int = Query(60, ge=1, le=7 * 24 * 60, description="분"),
+    user_id: str = Header(..., alias="user-id"),
+    db: Session = Depends(get_db)
+):
+    return [
+        {
             "alarm_id": alarm.alarm_id,
             "time": alarm.time.strftime("%H:%M"),
             "status": alarm.status,
-            "sound_volume": alarm.sound_volume,
-            "repeat_days": list(map(int, alarm.repeat_days.split(','))) if alarm.repeat_days else [],
-            "routines": [{"routine_id": r.routine_id, "order": r.order} for r in routines]
-        })
-    return result
+            "repeat_days": alarm_schedule.mask_to_days(alarm.repeat_mask),
+            "paused_until": alarm_schedule.resume_day(alarm.paused_until),
+            "next_fire_at": fire_at,
+        }
+        for fire_at, alarm in alarm_schedule.upcoming(db, user_id, timedelta(minutes=within))
+    ]
 
 # 특정 알람 조회
 @app.get("/alarms/{alarm_id}")
@@ -423,88 +606,62 @@ def get_alarm_detail(
     user_id: str = Header(..., alias="user-id"),
     db: Session = Depends(get_db)
 ):
-    alarm = db.query(models.Alarm).filter(models.Alarm.alarm_id == alarm_id).first()
+    alarm = db.execute(
+        select(*ALARM_COLUMNS).where(models.Alarm.alarm_id == alarm_id, models.Alarm.deleted_at.is_(None))
+    ).first()
     if not alarm:
         raise HTTPException(status_code=404, detail="Alarm not found")
-    repeat_days = db.query(models.AlarmRepeatDay.weekday).filter(models.AlarmRepeatDay.alarm_id == alarm_id).all()
-    routines = db.query(models.AlarmRoutine).filter(models.AlarmRoutine.alarm_id == alarm_id).order_by(models.AlarmRoutine.order).all()
-    routine_list = []
-    for r in routines:
-        rt = db.query(models.Routine).filter(models.Routine.routine_id == r.routine_id).first()
-        if rt:
-            routine_list.append({
-                "routine_id": rt.routine_id,
-                "user_id": rt.user_id,
-                "title": rt.title,
-                "type": rt.type,
-                "goal_value": rt.goal_value,
-                "duration_seconds": rt.duration_seconds,
-                "deadline_time": rt.deadline_time.strftime("%H:%M") if rt.deadline_time else None,
-                "success_note": rt.success_note
-            })
+    graph = loaders.load_alarm_graph(db, [alarm], with_repeat_days=False)
 
-    return {
+    return FastJSONResponse({
         "alarm_id": alarm.alarm_id,
         "time": alarm.time.strftime("%H:%M") if alarm.time else None,
         "sound_volume": alarm.sound_volume,
         "vibration_on": alarm.vibration_on,
         "status": alarm.status,
-        "repeat_days": [r[0] for r in repeat_days],  # 수정
-        "routines": routine_list
-    }
+        "repeat_days": alarm_schedule.mask_to_days(alarm.repeat_mask),
+        "paused_until": alarm_schedule.resume_day(alarm.paused_until),
+        "routines": [routine_out(rt) for rt in graph.routines_of(alarm_id)]
+    })
 
 # 월별 루틴 성공률 달력 (일자별 수행률)
 @app.get("/calendar")
 def calendar_view(user_id: str, year: int, month: int, db: Session = Depends(get_db)):
-    # 1. raw 데이터 가져오기
-    rows = db.query(
-        models.AlarmExecutionLog.scheduled_ts,
-        models.AlarmExecutionLog.success_rate
-    ).join(models.Alarm, models.Alarm.alarm_id == models.AlarmExecutionLog.alarm_id).filter(
-        models.Alarm.user_id == user_id
-    ).all()
+    writebehind.read_your_writes(user_id=user_id)
+    start, end = month_range(year, month)
+    daily = models.UserDailyStats
+    rows = db.query(daily.stat_date, daily.rate_sum, daily.exec_count).filter(
+        daily.user_id == user_id,
+        daily.stat_date >= start,
+        daily.stat_date < end,
+        daily.exec_count > 0,
+    ).order_by(daily.stat_date).all()
 
-    kst = timezone("Asia/Seoul")
-    results = defaultdict(list)
-
-    for ts_str, rate in rows:
-        try:
-            dt = datetime.fromisoformat(ts_str.replace("Z", "+00:00")).astimezone(kst)
-        except:
-            continue
-        if dt.year == year and dt.month == month:
-            date_key = dt.date().isoformat()
-            results[date_key].append(rate)
-
-    # 평균 계산
     return [
-        {"date": d, "success_rate": round(sum(v) / len(v), 2)}
-        for d, v in results.items()
+        {"date": d.isoformat(), "success_rate": round(float(rate_sum) / cnt, 2)}
+        for d, rate_sum, cnt in rows
     ]
 
-# 주간 피드백 요약
+# 주간 피드백 요약 (가장 최근 수행일 기준 4주)
 @app.get("/weekly-feedback")
 def weekly_feedback(user_id: str, db: Session = Depends(get_db)):
-    rows = db.query(
-        models.AlarmExecutionLog.scheduled_ts,
-        models.AlarmExecutionLog.completed_routines,
-        models.AlarmExecutionLog.total_routines
-    ).join(models.Alarm, models.Alarm.alarm_id == models.AlarmExecutionLog.alarm_id).filter(
-        models.Alarm.user_id == user_id
+    writebehind.read_your_writes(user_id=user_id)
+    daily = models.UserDailyStats
+    user_days = db.query(daily).filter(daily.user_id == user_id, daily.exec_count > 0)
+
+    latest = user_days.with_entities(func.max(daily.stat_date)).scalar()
+    if latest is None:
+        return []
+    start = korean_week_start(latest) - timedelta(weeks=3)
+
+    rows = user_days.with_entities(daily.stat_date, daily.done, daily.total).filter(
+        daily.stat_date >= start,
+        daily.stat_date <= latest,
     ).all()
 
-    kst = timezone("Asia/Seoul")
     weekly_data = defaultdict(lambda: {"done": 0, "total": 0})
-
-    for ts_str, done, total in rows:
-        try:
-            dt = datetime.fromisoformat(ts_str.replace("Z", "+00:00")).astimezone(kst)
-            #print(f"📌 UTC: {ts_str} → KST: {dt} → week {get_korean_week(dt)}")
-        except Exception as e:
-            print(f"⚠️ Error parsing {ts_str}: {e}")
-            continue
-        #week = dt.isocalendar()[1]
-        week = get_korean_week(dt)
+    for d, done, total in rows:
+        week = get_korean_week(datetime(d.year, d.month, d.day))
         weekly_data[week]["done"] += done
         weekly_data[week]["total"] += total
 
@@ -519,10 +676,47 @@ def weekly_feedback(user_id: str, db: Session = Depends(get_db)):
     ]
     return result
 
+# 델타 동기화: since 이후 바뀐 루틴/알람/연결 + 삭제 기록
+@app.get("/sync")
+def sync_changes(
+    since: Optional[str] = Query(None, description="이전 응답의 cursor (없으면 전체)"),
+    user_id: str = Header(..., alias="user-id"),
+    db: Session = Depends(get_db)
+):
+    try:
+        return sync.changes_since(db, user_id, since)
+    except (ValueError, OverflowError):   # 숫자가 아니거나 datetime 범위를 넘는 cursor
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+# 사용자 데이터 내보내기 (NDJSON / CSV, 선택적으로 gzip) - 행을 읽는 대로 스트리밍
+@app.get("/export")
+def export_user_data(
+    user_id: str = Header(..., alias="user-id"),
+    format: str = Query("ndjson", description="ndjson | csv"),
+    table: Optional[List[str]] = Query(None, description="routine | alarm | alarm_exec_log | alarm_exec_routine (없으면 전체, csv 는 하나만)"),
+    gzip: bool = Query(False)
+):
+    try:
+        tables = export.validate(user_id, format, table)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return StreamingResponse(
+        export.stream_export(SessionLocal, user_id, format, tables, gzip),
+        media_type="application/gzip" if gzip else export.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{export.filename(user_id, format, tables, gzip)}"'},
+    )
+
+# 보관(archive.py)으로 옮긴 달 목록 + 월별 요약
+@app.get("/archives")
+def list_archives(user_id: str = Header(..., alias="user-id"), db: Session = Depends(get_db)):
+    return archive.summaries(db, user_id)
+
 # 알람 수정 + 반복 요일도 함께 수정
 @app.put("/alarms/{alarm_id}")
 def update_alarm(alarm_id: str, update: schemas.AlarmUpdate,user_id: str = Query(...), db: Session = Depends(get_db)):
-    alarm = db.query(models.Alarm).filter(models.Alarm.alarm_id == alarm_id, models.Alarm.user_id == update.user_id).first()
+    alarm = db.query(models.Alarm).filter(
+        models.Alarm.alarm_id == alarm_id, models.Alarm.user_id == update.user_id, models.Alarm.deleted_at.is_(None)
+    ).first()
     if not alarm:
         raise HTTPException(status_code=404, detail="Alarm not found")
     if update.time:
@@ -531,44 +725,100 @@ def update_alarm(alarm_id: str, update: schemas.AlarmUpdate,user_id: str = Query
         alarm.status = update.status
     if update.sound_volume is not None:
         alarm.sound_volume = update.sound_volume
-    if update.repeat_days is not None:
-        alarm.repeat_days = ','.join(map(str, update.repeat_days))
+    # 반복 요일 마스크 / next_fire_at 도 같은 UPDATE 로
+    alarm_schedule.apply(
+        alarm, alarm_schedule.days_to_mask(update.repeat_days) if update.repeat_days is not None else None
+    )
     db.commit()
+    cache.invalidate(update.user_id, ALARM_READS)
+    scheduler.notify([alarm_id])
     return {"message": "Alarm updated", "alarm_id": alarm_id, "repeat_days": update.repeat_days}
 
 # 알람 실행 결과 루틴별 업데이트 (PUT)
 @app.put("/alarm-executions/{exec_id}")
-def update_alarm_execution(exec_id: str, data: dict, db: Session = Depends(get_db)):
-    log = db.query(models.AlarmExecutionLog).filter(models.AlarmExecutionLog.exec_id == exec_id).first()
-    if not log:
+def update_alarm_execution(exec_id: str, data: schemas.AlarmExecutionUpdate, db: Session = Depends(get_db)):
+    writebehind.read_your_writes(exec_id=exec_id)
+    # 1. 로그 + 알람 소유자 (삭제 표시된 알람의 기록은 집계에서 이미 빠졌으므로 고치지 않음)
+    found = db.query(models.AlarmExecutionLog, models.Alarm.user_id).outerjoin(
+        models.Alarm, models.Alarm.alarm_id == models.AlarmExecutionLog.alarm_id
+    ).filter(models.AlarmExecutionLog.exec_id == exec_id, models.Alarm.deleted_at.is_(None)).first()
+    if not found:
         raise HTTPException(status_code=404, detail="Execution not found")
-    routines = data.get("routines", [])
-    completed = 0
-    for r in routines:
-        axr = db.query(models.AlarmExecutionRoutine).filter(
-            models.AlarmExecutionRoutine.exec_id == exec_id,
-            models.AlarmExecutionRoutine.routine_id == r["routine_id"]
-        ).first()
-        if axr:
-            axr.completed = int(r["completed"])
-            axr.actual_value = r.get("actual_value")
-            axr.completed_ts = r.get("completed_ts")
-            axr.abort_ts = r.get("abort_ts")
-            completed += int(r["completed"])
+    log, owner = found
+
+    # 2. 기존 루틴별 기록을 한 번에 읽어 routine_id 로 색인
+    axr = models.AlarmExecutionRoutine
+    details = [
+        row._asdict() for row in db.query(
+            axr.axr_id, axr.exec_id, axr.routine_id, axr.completed,
+            axr.actual_value, axr.completed_ts, axr.abort_ts, axr.order,
+        ).filter(axr.exec_id == exec_id).order_by(axr.order)
+    ]
+    by_routine = {}
+    for d in details:
+        by_routine.setdefault(d["routine_id"], d)
 
-    log.completed_routines = completed
-    log.success_rate = round(completed / log.total_routines, 3)
-    log.status = "SUCCESS" if completed == log.total_routines else ("PARTIAL" if completed > 0 else "ABORTED")
-    db.commit()
+    # 3. 변경분을 메모리 상태에 합치고 bulk UPDATE 한 번으로 반영
+    changes = []
+    done_deltas = {}
+    for r in data.routines:
+        d = by_routine.get(r.routine_id)
+        if d is None:
+            continue
+        done_deltas[r.routine_id] = done_deltas.get(r.routine_id, 0) + int(r.completed) - d["completed"]
+        d.update(
+            completed=int(r.completed),
+            actual_value=r.actual_value,
+            completed_ts=r.completed_ts,
+            abort_ts=r.abort_ts,
+        )
+        changes.append({k: d[k] for k in ("axr_id", "completed", "actual_value", "completed_ts", "abort_ts")})
+    if changes:
+        db.execute(update(axr), changes)
 
-    updated = db.query(models.AlarmExecutionRoutine).filter(models.AlarmExecutionRoutine.exec_id == exec_id).all()
-    return {
+    # 4. 완료 수는 payload 가 아니라 합쳐진 전체 상태 기준
+    old_done, old_rate = log.completed_routines, log.success_rate
+    completed = sum(d["completed"] for d in details)
+    log.completed_routines = completed
+    log.success_rate, log.status = executions.summarize(log.total_routines, completed)
+    if owner:
+        stats.record_correction(db, owner, log, old_done, old_rate, done_deltas)
+    response = {
         "exec_id": exec_id,
         "alarm_id": log.alarm_id,
         "status": log.status,
         "total_routines": log.total_routines,
         "completed_routines": log.completed_routines,
         "success_rate": log.success_rate,
-        "routine_execution_details": [r.__dict__ for r in updated]
+        "routine_execution_details": details
     }
+    db.commit()
+    routing.mark_write(owner)
+    return response
 app.include_router(router)
+
+# 소프트 삭제된 알람/루틴 정리 워커 (PURGE_ENABLED=1, 워커 하나에서만)
+if purge.PURGE_ENABLED:
+    purge.install(app, SessionLocal)
+
+# 수행 기록 쓰기 지연 버퍼 (WRITE_BEHIND_ENABLED=1)
+if writebehind.WRITE_BEHIND_ENABLED:
+    writebehind.install(app, SessionLocal)
+
+# 요청별 SQL 계측 (Server-Timing 헤더, /metrics, N+1 경고)
+if instrumentation.INSTRUMENTATION_ENABLED:
+    instrumentation.install(app, [
+        eng.sync_engine if hasattr(eng, "sync_engine") else eng
+        for eng in (engine, async_engine, replica_engine, async_replica_engine) if eng is not None
+    ])
+
+# replica 상태 / 복제 지연 확인 (REPLICA_DATABASE_URL 이 있을 때)
+routing.install(app)
+
+# MISSED 기록 스케줄러 (SCHEDULER_ENABLED=1, 워커 하나에서만)
+if scheduler.SCHEDULER_ENABLED:
+    scheduler.install(app, SessionLocal)
+
+# 비동기 DB 모드: DB 를 쓰는 엔드포인트를 AsyncSession 기반 async 버전으로 교체
+if ASYNC_DB:
+    async_routes.install(app, get_db)
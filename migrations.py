@@ -0,0 +1,406 @@
+"""기존 DB 스키마를 최신 models.py 에 맞추는 수동 마이그레이션.
+
+create_all 은 새 테이블만 만들고 기존 테이블에 컬럼을 추가하지 않으므로,
+운영 DB 에는 아래 명령으로 필요한 단계를 실행한다.
+
+    python migrations.py            # 전체 순서대로 실행 (이름을 지정해야만 도는 단계 제외)
+    python migrations.py 002_exec_log_typed_ts
+
+모든 단계는 여러 번 실행해도 안전하다 (이미 있는 컬럼/인덱스는 건너뜀).
+id 컬럼 저장 형식(CHAR(36) / BINARY(16))은 DB 를 보고 맞추므로 025 전환 전후 어느 쪽에서도 돌릴 수 있다.
+"""
+import sys
+
+from sqlalchemy import MetaData, bindparam, inspect, select, text, update
+from sqlalchemy.schema import AddConstraint
+
+import database
+from database import engine, keys_are_char, use_db_key_storage
+import ids
+import models
+from timeutils import parse_client_ts
+
+BATCH_SIZE = 1000
+
+MIGRATIONS = {}
+EXPLICIT = set()   # 이름을 지정했을 때만 실행
+
+
+def migration(name, explicit=False):
+    def register(fn):
+        MIGRATIONS[name] = fn
+        if explicit:
+            EXPLICIT.add(name)
+        return fn
+    return register
+
+
+def add_column(conn, table: str, column: str, ddl: str):
+    existing = {c["name"] for c in inspect(conn).get_columns(table)}
+    if column not in existing:
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+
+
+def add_model_column(conn, model, column: str, default_sql: str = None):
+    """models.py 에 정의된 컬럼 타입 그대로 추가 (default_sql 이 있으면 NOT NULL DEFAULT)."""
+    ddl = model.__table__.c[column].type.compile(dialect=conn.dialect)
+    ddl += f" NOT NULL DEFAULT {default_sql}" if default_sql is not None else " NULL"
+    add_column(conn, model.__tablename__, column, ddl)
+
+
+def create_index(conn, index):
+    existing = {i["name"] for i in inspect(conn).get_indexes(index.table.name)}
+    if index.name not in existing:
+        index.create(conn)
+
+
+def model_index(model, name):
+    return next(i for i in model.__table__.indexes if i.name == name)
+
+
+@migration("002_exec_log_typed_ts")
+def exec_log_typed_ts(engine):
+    # 1. 컬럼 + 인덱스 추가
+    with engine.begin() as conn:
+        add_column(conn, "alarm_exec_log", "scheduled_at", "DATETIME NULL")
+        add_column(conn, "alarm_exec_log", "scheduled_date", "DATE NULL")
+        create_index(conn, model_index(models.AlarmExecutionLog, "ix_alarm_exec_log_alarm_date"))
+
+    # 2. 문자열 scheduled_ts → scheduled_at / scheduled_date 백필 (배치 단위 커밋)
+    log = models.AlarmExecutionLog.__table__
+    last_id = ids.NIL
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(
+                log.select()
+                .with_only_columns(log.c.exec_id, log.c.scheduled_ts)
+                .where(log.c.scheduled_at.is_(None), log.c.exec_id > last_id)
+                .order_by(log.c.exec_id)
+                .limit(BATCH_SIZE)
+            ).all()
+            if not rows:
+                break
+            params = []
+            for exec_id, ts_str in rows:
+                scheduled_at, scheduled_date = parse_client_ts(ts_str)
+                if scheduled_at is not None:
+                    params.append({"b_id": exec_id, "at": scheduled_at, "day": scheduled_date})
+            if params:
+                conn.execute(
+                    update(log)
+                    .where(log.c.exec_id == bindparam("b_id"))
+                    .values(
+                        scheduled_at=bindparam("at", type_=log.c.scheduled_at.type),
+                        scheduled_date=bindparam("day", type_=log.c.scheduled_date.type),
+                    ),
+                    params,
+                )
+            last_id = rows[-1].exec_id
+        print(f"  backfilled up to exec_id={last_id}")
+
+
+@migration("003_daily_stats")
+def daily_stats(engine):
+    # 테이블은 create_all 이 만든다. 기존 실행 기록으로 집계를 채운다.
+    import stats
+    from sqlalchemy.orm import Session
+    with Session(engine) as db:
+        stats.rebuild(db)
+        db.commit()
+
+
+@migration("010_sync_versions")
+def sync_versions(engine):
+    from timeutils import utcnow
+    now = utcnow()
+    indexes = {
+        models.Routine: "ix_routine_user_updated",
+        models.Alarm: "ix_alarm_user_updated",
+        models.AlarmRoutine: "ix_alarm_routine_alarm_updated",
+    }
+    for model, index_name in indexes.items():
+        with engine.begin() as conn:
+            add_model_column(conn, model, "version", "1")
+            add_model_column(conn, model, "updated_at")
+            table = model.__table__
+            # version 은 onupdate(+1) 가 붙지 않도록 그대로 지정
+            conn.execute(update(table).where(table.c.updated_at.is_(None)).values(updated_at=now, version=table.c.version))
+            create_index(conn, model_index(model, index_name))
+
+
+@migration("011_exec_log_user_id")
+def exec_log_user_id(engine):
+    with engine.begin() as conn:
+        add_model_column(conn, models.AlarmExecutionLog, "user_id")
+        create_index(conn, model_index(models.AlarmExecutionLog, "ix_alarm_exec_log_user_sched"))
+
+    # 알람 소유자로 백필 (배치 단위 커밋)
+    log, alarm = models.AlarmExecutionLog.__table__, models.Alarm.__table__
+    owner = select(alarm.c.user_id).where(alarm.c.alarm_id == log.c.alarm_id).scalar_subquery()
+    last_id = ids.NIL
+    while True:
+        with engine.begin() as conn:
+            exec_ids = conn.execute(
+                select(log.c.exec_id)
+                .where(log.c.user_id.is_(None), log.c.exec_id > last_id)
+                .order_by(log.c.exec_id)
+                .limit(BATCH_SIZE)
+            ).scalars().all()
+            if not exec_ids:
+                break
+            conn.execute(update(log).where(log.c.exec_id.in_(exec_ids)).values(user_id=owner))
+            last_id = exec_ids[-1]
+        print(f"  backfilled up to exec_id={last_id}")
+
+
+@migration("013_alarm_repeat_mask")
+def alarm_repeat_mask(engine):
+    import alarm_schedule
+    with engine.begin() as conn:
+        add_model_column(conn, models.Alarm, "repeat_mask", "0")
+        add_model_column(conn, models.Alarm, "next_fire_at")
+        create_index(conn, model_index(models.Alarm, "ix_alarm_user_next_fire"))
+        create_index(conn, model_index(models.Alarm, "ix_alarm_next_fire"))
+
+    # 문자열(repeat_days)이 있으면 그것을, 없으면 alarm_repeat_day 행을 기준으로 마스크 계산.
+    # 파생 값 백필이므로 version / updated_at 은 건드리지 않는다.
+    alarm, days = models.Alarm.__table__, models.AlarmRepeatDay.__table__
+    last_id = ids.NIL
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(
+                select(alarm.c.alarm_id, alarm.c.time, alarm.c.status, alarm.c.repeat_days)
+                .where(alarm.c.alarm_id > last_id)
+                .order_by(alarm.c.alarm_id)
+                .limit(BATCH_SIZE)
+            ).all()
+            if not rows:
+                break
+            table_days = {}
+            for alarm_id, weekday in conn.execute(
+                select(days.c.alarm_id, days.c.weekday).where(days.c.alarm_id.in_([r.alarm_id for r in rows]))
+            ):
+                table_days.setdefault(alarm_id, []).append(weekday)
+            params = []
+            for r in rows:
+                listed = [int(d) for d in r.repeat_days.split(",") if d.strip()] if r.repeat_days else table_days.get(r.alarm_id, [])
+                values = alarm_schedule.schedule_values(r.time, alarm_schedule.days_to_mask(listed), r.status)
+                params.append({"b_id": r.alarm_id, "b_mask": values["repeat_mask"], "b_days": values["repeat_days"], "b_next": values["next_fire_at"]})
+            conn.execute(
+                update(alarm)
+                .where(alarm.c.alarm_id == bindparam("b_id"))
+                .values(
+                    repeat_mask=bindparam("b_mask", type_=alarm.c.repeat_mask.type),
+                    repeat_days=bindparam("b_days", type_=alarm.c.repeat_days.type),
+                    next_fire_at=bindparam("b_next", type_=alarm.c.next_fire_at.type),
+                    version=alarm.c.version,
+                    updated_at=alarm.c.updated_at,
+                ),
+                params,
+            )
+            last_id = rows[-1].alarm_id
+        print(f"  backfilled up to alarm_id={last_id}")
+
+
+
+@migration("014_alarm_updated_index")
+def alarm_updated_index(engine):
+    with engine.begin() as conn:
+        create_index(conn, model_index(models.Alarm, "ix_alarm_updated"))
+
+
+@migration("018_soft_delete")
+def soft_delete(engine):
+    # purge_task 테이블은 create_all 이 만든다
+    with engine.begin() as conn:
+        add_model_column(conn, models.Routine, "deleted_at")
+        add_model_column(conn, models.Alarm, "deleted_at")
+
+
+@migration("020_alarm_paused_until")
+def alarm_paused_until(engine):
+    with engine.begin() as conn:
+        add_model_column(conn, models.Alarm, "paused_until")
+
+
+@migration("021_alarm_routine_order_index")
+def alarm_routine_order_index(engine):
+    # 예전 1, 2, 3 키는 그대로 두고, 처음 옮길 때 routine_order.move 가 GAP 간격으로 편다
+    with engine.begin() as conn:
+        create_index(conn, model_index(models.AlarmRoutine, "ix_alarm_routine_alarm_order"))
+
+def key_columns(existing) -> dict:
+    """DB 에 있는 테이블의 UUIDKey 컬럼 {table: [column, ...]} (FK 참조 순서)"""
+    return {
+        t.name: [c.name for c in t.columns if isinstance(c.type, ids.UUIDKey)]
+        for t in models.Base.metadata.sorted_tables
+        if t.name in existing and any(isinstance(c.type, ids.UUIDKey) for c in t.columns)
+    }
+
+
+def _row(names) -> str:
+    return "(" + ", ".join(f"`{n}`" for n in names) + ")"
+
+
+def _params(prefix: str, n: int) -> str:
+    return "(" + ", ".join(f":{prefix}{i}" for i in range(n)) + ")"
+
+
+def _unhex(column: str) -> str:
+    return f"UNHEX(REPLACE({column}, '-', ''))"
+
+
+@migration("025_binary_keys_backfill")
+def binary_keys_backfill(engine):
+    """CHAR(36) id 옆에 BINARY(16) 그림자 컬럼(<col>__bin)을 만들고 채운다 (MySQL, 서비스 중 실행).
+
+    채우는 동안 새로 쓰이거나 바뀌는 행은 INSERT / UPDATE 트리거가 채우고, 기존 행은 PK 순서로
+    BATCH_SIZE 행씩 커밋하며 채운다. 끝나면 UUID 형식이 아닌 id 가 있는지 확인한다.
+    """
+    if engine.dialect.name != "mysql":
+        print("  skip: MySQL 만 (SQLite 는 025_binary_keys_swap 이 테이블을 다시 만든다)")
+        return
+    with engine.connect() as conn:
+        if not keys_are_char(conn):
+            print("  skip: already BINARY(16)")
+            return
+        tables = key_columns(set(inspect(conn).get_table_names()))
+
+    for table, columns in tables.items():
+        with engine.begin() as conn:
+            for c in columns:
+                add_column(conn, table, f"{c}__bin", "BINARY(16) NULL")
+            sets = ", ".join(f"NEW.`{c}__bin` = {_unhex(f'NEW.`{c}`')}" for c in columns)
+            for event in ("INSERT", "UPDATE"):
+                trigger = f"{table}__bin_{event.lower()}"
+                conn.execute(text(f"DROP TRIGGER IF EXISTS `{trigger}`"))
+                conn.execute(text(f"CREATE TRIGGER `{trigger}` BEFORE {event} ON `{table}` FOR EACH ROW SET {sets}"))
+
+        pk = [c.name for c in models.Base.metadata.tables[table].primary_key.columns]
+        sets = ", ".join(f"`{c}__bin` = {_unhex(f'`{c}`')}" for c in columns)
+        prev = None
+        while True:
+            with engine.begin() as conn:
+                after = f" WHERE {_row(pk)} > {_params('p', len(pk))}" if prev else ""
+                params = {f"p{i}": v for i, v in enumerate(prev or ())}
+                keys = conn.execute(
+                    text(f"SELECT {_row(pk)[1:-1]} FROM `{table}`{after} ORDER BY {_row(pk)[1:-1]} LIMIT {BATCH_SIZE}"),
+                    params,
+                ).all()
+                if not keys:
+                    break
+                params.update({f"l{i}": v for i, v in enumerate(keys[-1])})
+                where = (f"{_row(pk)} > {_params('p', len(pk))} AND " if prev else "") + f"{_row(pk)} <= {_params('l', len(pk))}"
+                conn.execute(text(f"UPDATE `{table}` SET {sets} WHERE {where}"), params)
+                prev = tuple(keys[-1])
+            print(f"  {table}: backfilled up to {prev}")
+
+        with engine.connect() as conn:
+            bad = conn.execute(text(
+                f"SELECT COUNT(*) FROM `{table}` WHERE "
+                + " OR ".join(f"(`{c}` IS NOT NULL AND `{c}__bin` IS NULL)" for c in columns)
+            )).scalar()
+        if bad:
+            sys.exit(f"{table}: UUID 형식이 아닌 id 가 {bad} 행 있습니다. 고친 뒤 다시 실행하세요.")
+
+
+@migration("025_binary_keys_swap", explicit=True)
+def binary_keys_swap(engine):
+    """id 컬럼을 BINARY(16) 으로 바꿔 끼운다. 이름을 지정해서만 실행한다.
+
+    MySQL: 025_binary_keys_backfill 뒤, 쓰기를 멈춘 배포 시점에 실행한다. FK / 키가 들어간 인덱스를
+    지우고 그림자 컬럼을 원래 이름으로 바꾼 뒤 테이블마다 PK 를 다시 잡고, 인덱스와 FK 를 models.py 대로 만든다.
+    SQLite(개발용): 테이블을 BINARY(16) 으로 새로 만들어 옮겨 담는다.
+    끝나면 API 를 다시 시작한다 (시작할 때 BINARY(16) 컬럼을 감지한다).
+    """
+    with engine.connect() as conn:
+        if not keys_are_char(conn):
+            print("  skip: already BINARY(16)")
+            return
+        tables = key_columns(set(inspect(conn).get_table_names()))
+    if engine.dialect.name == "sqlite":
+        _rebuild_sqlite_tables(engine, tables)
+        return
+
+    metadata = models.Base.metadata
+    with engine.begin() as conn:
+        for table in tables:
+            for event in ("insert", "update"):
+                conn.execute(text(f"DROP TRIGGER IF EXISTS `{table}__bin_{event}`"))
+            for fk in inspect(conn).get_foreign_keys(table):
+                conn.execute(text(f"ALTER TABLE `{table}` DROP FOREIGN KEY `{fk['name']}`"))
+
+    for table, columns in tables.items():
+        model = metadata.tables[table]
+        pk = [c.name for c in model.primary_key.columns]
+        with engine.begin() as conn:
+            for index in inspect(conn).get_indexes(table):
+                if set(index["column_names"]) & set(columns):
+                    conn.execute(text(f"DROP INDEX `{index['name']}` ON `{table}`"))
+            conn.execute(text(f"ALTER TABLE `{table}` " + ", ".join(f"RENAME COLUMN `{c}` TO `{c}__char`" for c in columns)))
+            conn.execute(text(f"ALTER TABLE `{table}` " + ", ".join(f"RENAME COLUMN `{c}__bin` TO `{c}`" for c in columns)))
+            changes = [f"DROP COLUMN `{c}__char`" for c in columns]
+            changes += [f"MODIFY `{c}` BINARY(16) {'NULL' if model.c[c].nullable else 'NOT NULL'}" for c in columns]
+            if set(pk) & set(columns):
+                changes = ["DROP PRIMARY KEY"] + changes + [f"ADD PRIMARY KEY {_row(pk)}"]
+            conn.execute(text(f"ALTER TABLE `{table}` " + ", ".join(changes)))
+            for index in model.indexes:
+                create_index(conn, index)
+        print(f"  {table}: swapped {', '.join(columns)}")
+
+    with engine.begin() as conn:
+        for table in tables:
+            for fk in metadata.tables[table].foreign_key_constraints:
+                conn.execute(AddConstraint(fk))
+
+
+def _rebuild_sqlite_tables(engine, tables: dict):
+    """SQLite: 기존 테이블을 <table>__char 로 옮겨 두고 BINARY(16) 테이블을 만들어 옮겨 담는다."""
+    with engine.connect() as conn:
+        for table, columns in tables.items():
+            for c in columns:
+                for (value,) in conn.exec_driver_sql(f'SELECT "{c}" FROM "{table}" WHERE "{c}" IS NOT NULL'):
+                    if not ids.is_key(value):
+                        sys.exit(f"{table}.{c}: UUID 형식이 아닌 id {value!r}. 고친 뒤 다시 실행하세요.")
+
+    database.BINARY_KEYS = True
+    binary = MetaData()   # 새 타입 인스턴스 (이미 CHAR 로 컴파일된 것과 따로)
+    for t in models.Base.metadata.sorted_tables:
+        if t.name in tables:
+            t.to_metadata(binary)
+
+    with engine.begin() as conn:
+        insp = inspect(conn)
+        old_columns = {t: [c["name"] for c in insp.get_columns(t)] for t in tables}
+        for table in tables:
+            for index in insp.get_indexes(table):
+                conn.exec_driver_sql(f'DROP INDEX "{index["name"]}"')
+            conn.exec_driver_sql(f'ALTER TABLE "{table}" RENAME TO "{table}__char"')
+        binary.create_all(conn)
+        for table, columns in tables.items():
+            names = [n for n in old_columns[table] if n in binary.tables[table].c]
+            quoted = ", ".join(f'"{n}"' for n in names)
+            keys = [i for i, n in enumerate(names) if n in columns]
+            rows = [
+                tuple(ids.to_bytes(v) if i in keys and v is not None else v for i, v in enumerate(row))
+                for row in conn.exec_driver_sql(f'SELECT {quoted} FROM "{table}__char"')
+            ]
+            if rows:
+                conn.exec_driver_sql(f'INSERT INTO "{table}" ({quoted}) VALUES ({", ".join("?" for _ in names)})', rows)
+            conn.exec_driver_sql(f'DROP TABLE "{table}__char"')
+            print(f"  {table}: {len(rows)} rows")
+
+
+def run(names=None):
+    for name, fn in MIGRATIONS.items():
+        if (names and name not in names) or (not names and name in EXPLICIT):
+            continue
+        print(f"▶ {name}")
+        fn(engine)
+    print("done")
+
+
+if __name__ == "__main__":
+    use_db_key_storage(engine)
+    models.Base.metadata.create_all(bind=engine)
+    run(sys.argv[1:])
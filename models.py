@@ -1,65 +1,180 @@
-from sqlalchemy import Column, String, Integer, Time, Text, ForeignKey, DECIMAL, Boolean
-from sqlalchemy.dialects.mysql import CHAR
+from sqlalchemy import Column, String, Integer, Time, Text, ForeignKey, DECIMAL, Boolean, DateTime, SmallInteger, Date, Index, literal_column
+from sqlalchemy.dialects.mysql import DATETIME
 from database import Base
-import uuid
+from ids import UUIDKey, new_id
+from timeutils import utcnow
+
+# MySQL 은 마이크로초까지 저장 (sync cursor 비교용)
+PreciseDateTime = DateTime().with_variant(DATETIME(fsp=6), "mysql")
+
+# 행이 바뀔 때마다 updated_at 갱신 + version 1 증가 (ORM flush / query.update 모두 적용)
+class Versioned:
+    updated_at = Column(PreciseDateTime, nullable=False, default=utcnow, onupdate=utcnow)
+    version = Column(Integer, nullable=False, default=1, server_default="1", onupdate=literal_column("version + 1"))
 
 class AppUser(Base):
     __tablename__ = "app_user"
-    user_id = Column(CHAR(36), primary_key=True)
+    user_id = Column(UUIDKey, primary_key=True)
     email = Column(String(255), nullable=False, unique=True)
     name = Column(String(255), nullable=True)
 
-class Routine(Base):
+class Routine(Versioned, Base):
     __tablename__ = "routine"
-    routine_id = Column(CHAR(36), primary_key=True, default=lambda: str(uuid.uuid4()))
-    user_id = Column(CHAR(36), ForeignKey("app_user.user_id"), nullable=False)
+    routine_id = Column(UUIDKey, primary_key=True, default=new_id)
+    user_id = Column(UUIDKey, ForeignKey("app_user.user_id"), nullable=False)
     title = Column(String(255), nullable=False)
     type = Column(String(20), nullable=False)
     goal_value = Column(Integer, nullable=True)
     duration_seconds = Column(Integer, nullable=True)
     deadline_time = Column(Time, nullable=True)
     success_note = Column(Text, nullable=True)
+    deleted_at = Column(PreciseDateTime, nullable=True)  # 소프트 삭제 시각 (purge.py 가 나중에 실제로 지움)
+
+    __table_args__ = (
+        Index("ix_routine_user_updated", "user_id", "updated_at"),
+    )
 
-class Alarm(Base):
+class Alarm(Versioned, Base):
     __tablename__ = "alarm"
-    alarm_id = Column(CHAR(36), primary_key=True, default=lambda: str(uuid.uuid4()))
-    user_id = Column(CHAR(36), ForeignKey("app_user.user_id"), nullable=False)
+    alarm_id = Column(UUIDKey, primary_key=True, default=new_id)
+    user_id = Column(UUIDKey, ForeignKey("app_user.user_id"), nullable=False)
     time = Column(Time, nullable=False)
     vibration_on = Column(Boolean, default=True)
     sound_volume = Column(DECIMAL(3, 2), nullable=False)
     status = Column(String(20), default="Active")
-    repeat_days = Column(String(20), default="")  # 예: "1,2,3" → 월,화,수
+    repeat_days = Column(String(20), default="")  # 예: "1,2,3" → 월,화,수 (repeat_mask 사본)
+    repeat_mask = Column(SmallInteger, nullable=False, default=0, server_default="0")  # bit0=일 ~ bit6=토 (alarm_schedule.py)
+    next_fire_at = Column(DateTime, nullable=True)  # 다음 울림 시각 (UTC), 비활성이면 NULL
+    paused_until = Column(DateTime, nullable=True)  # 일시정지 해제 시각 (UTC, KST 날짜 0시), 이전 울림은 건너뜀
+    deleted_at = Column(PreciseDateTime, nullable=True)  # 소프트 삭제 시각 (purge.py 가 나중에 실제로 지움)
 
-class AlarmRoutine(Base):
+    __table_args__ = (
+        Index("ix_alarm_user_updated", "user_id", "updated_at"),
+        Index("ix_alarm_user_next_fire", "user_id", "next_fire_at"),
+        Index("ix_alarm_next_fire", "next_fire_at"),
+        # 스케줄러가 다른 프로세스에서 바뀐 알람을 주기적으로 찾는다 (scheduler._reload_changed)
+        Index("ix_alarm_updated", "updated_at"),
+    )
+
+class AlarmRoutine(Versioned, Base):
     __tablename__ = "alarm_routine"
-    alr_id = Column(CHAR(36), primary_key=True, default=lambda: str(uuid.uuid4()))
-    alarm_id = Column(CHAR(36), ForeignKey("alarm.alarm_id"), nullable=False)
-    routine_id = Column(CHAR(36), ForeignKey("routine.routine_id"), nullable=False)
-    order = Column(Integer, nullable=False)
+    alr_id = Column(UUIDKey, primary_key=True, default=new_id)
+    alarm_id = Column(UUIDKey, ForeignKey("alarm.alarm_id"), nullable=False)
+    routine_id = Column(UUIDKey, ForeignKey("routine.routine_id"), nullable=False)
+    order = Column(Integer, nullable=False)  # 듬성듬성한 정렬 키 (routine_order.py), 응답에는 순번으로 나감
 
+    __table_args__ = (
+        Index("ix_alarm_routine_alarm_updated", "alarm_id", "updated_at"),
+        Index("ix_alarm_routine_alarm_order", "alarm_id", "order"),
+    )
+
+# 013 이후 읽고 쓰지 않음 (alarm.repeat_mask 로 이전), 예전 데이터 보관용
 class AlarmRepeatDay(Base):
     __tablename__ = "alarm_repeat_day"
-    id = Column(CHAR(36), primary_key=True, default=lambda: str(uuid.uuid4()))
-    alarm_id = Column(CHAR(36), ForeignKey("alarm.alarm_id"), nullable=False)
+    id = Column(UUIDKey, primary_key=True, default=new_id)
+    alarm_id = Column(UUIDKey, ForeignKey("alarm.alarm_id"), nullable=False)
     weekday = Column(Integer, nullable=False)  # 1=Mon ~ 7=Sun
 class AlarmExecutionLog(Base):
     __tablename__ = "alarm_exec_log"
-    exec_id = Column(CHAR(36), primary_key=True, default=lambda: str(uuid.uuid4()))
-    alarm_id = Column(CHAR(36), ForeignKey("alarm.alarm_id"), nullable=False)
+    exec_id = Column(UUIDKey, primary_key=True, default=new_id)
+    alarm_id = Column(UUIDKey, ForeignKey("alarm.alarm_id"), nullable=False)
+    user_id = Column(UUIDKey, ForeignKey("app_user.user_id"), nullable=True)  # 알람 소유자 (이력 조회용 비정규화)
     scheduled_ts = Column(String(32))
     dismissed_ts = Column(String(32))
+    scheduled_at = Column(DateTime, nullable=True)    # scheduled_ts 를 파싱한 UTC 시각
+    scheduled_date = Column(Date, nullable=True)      # scheduled_ts 의 KST 기준 날짜
     total_routines = Column(Integer, nullable=False)
     completed_routines = Column(Integer, nullable=False)
     success_rate = Column(DECIMAL(4, 3), nullable=False)
     status = Column(String(20), nullable=False)  # SUCCESS | PARTIAL | ABORTED | MISSED
 
+    # 사용자 → 알람 → 날짜 범위 조회용 (calendar, weekly-feedback)
+    __table_args__ = (
+        Index("ix_alarm_exec_log_alarm_date", "alarm_id", "scheduled_date"),
+        # GET /alarm-executions keyset 페이지네이션 (최신순)
+        Index("ix_alarm_exec_log_user_sched", "user_id", "scheduled_at", "exec_id"),
+    )
+
 class AlarmExecutionRoutine(Base):
     __tablename__ = "alarm_exec_routine"
-    axr_id = Column(CHAR(36), primary_key=True, default=lambda: str(uuid.uuid4()))
-    exec_id = Column(CHAR(36), ForeignKey("alarm_exec_log.exec_id"), nullable=False)
-    routine_id = Column(CHAR(36), ForeignKey("routine.routine_id"), nullable=False)
+    axr_id = Column(UUIDKey, primary_key=True, default=new_id)
+    exec_id = Column(UUIDKey, ForeignKey("alarm_exec_log.exec_id"), nullable=False)
+    routine_id = Column(UUIDKey, ForeignKey("routine.routine_id"), nullable=False)
     completed = Column(Integer, nullable=False)  # 1=Y, 0=N
     actual_value = Column(Integer, nullable=True)
     completed_ts = Column(String(32))
     abort_ts = Column(String(32))
-    order = Column(Integer, nullable=False)
\ No newline at end of file
+    order = Column(Integer, nullable=False)
+
+# 일자별 집계 테이블 (stats.py 가 실행 기록 저장/수정 시 함께 갱신)
+class UserDailyStats(Base):
+    __tablename__ = "user_daily_stats"
+    user_id = Column(UUIDKey, ForeignKey("app_user.user_id"), primary_key=True)
+    stat_date = Column(Date, primary_key=True)        # KST 날짜
+    exec_count = Column(Integer, nullable=False, default=0)
+    done = Column(Integer, nullable=False, default=0)     # 완료한 루틴 수 합
+    total = Column(Integer, nullable=False, default=0)    # 전체 루틴 수 합
+    rate_sum = Column(DECIMAL(10, 3), nullable=False, default=0)  # success_rate 합 (일 평균 = rate_sum / exec_count)
+
+class RoutineDailyStats(Base):
+    __tablename__ = "routine_daily_stats"
+    routine_id = Column(UUIDKey, ForeignKey("routine.routine_id"), primary_key=True)
+    stat_date = Column(Date, primary_key=True)        # KST 날짜
+    user_id = Column(UUIDKey, ForeignKey("app_user.user_id"), nullable=False)
+    done = Column(Integer, nullable=False, default=0)
+    total = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        Index("ix_routine_daily_stats_user_date", "user_id", "stat_date"),
+    )
+
+# 삭제된 행 기록 (GET /sync 가 클라이언트에 삭제를 알려주기 위함)
+class SyncTombstone(Base):
+    __tablename__ = "sync_tombstone"
+    id = Column(UUIDKey, primary_key=True, default=new_id)
+    user_id = Column(UUIDKey, ForeignKey("app_user.user_id"), nullable=False)
+    entity = Column(String(20), nullable=False)   # routine | alarm | alarm_routine
+    entity_id = Column(UUIDKey, nullable=False)
+    deleted_at = Column(PreciseDateTime, nullable=False, default=utcnow)
+
+    __table_args__ = (
+        Index("ix_sync_tombstone_user_deleted", "user_id", "deleted_at"),
+    )
+
+# replica 복제 지연 측정용 (routing.py 가 primary 에 주기적으로 쓰고 replica 에서 읽는다)
+class ReplicaHeartbeat(Base):
+    __tablename__ = "replica_heartbeat"
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    beat_at = Column(PreciseDateTime, nullable=False)
+
+# 보관(archive.py)으로 옮긴 월별 수행 기록 요약. 원본 행은 압축 파일로 나가고 이 행과 일자별 집계만 남는다
+class ExecutionArchive(Base):
+    __tablename__ = "execution_archive"
+    user_id = Column(UUIDKey, ForeignKey("app_user.user_id"), primary_key=True)
+    month_start = Column(Date, primary_key=True)      # KST 기준 월 1일
+    month_end = Column(Date, nullable=False)          # 다음 달 1일 (미포함)
+    path = Column(String(255), nullable=False)        # ARCHIVE_DIR 기준 상대 경로
+    sha256 = Column(String(64), nullable=False)
+    log_count = Column(Integer, nullable=False, default=0)
+    routine_count = Column(Integer, nullable=False, default=0)
+    exec_count = Column(Integer, nullable=False, default=0)
+    done = Column(Integer, nullable=False, default=0)
+    total = Column(Integer, nullable=False, default=0)
+    rate_sum = Column(DECIMAL(10, 3), nullable=False, default=0)
+    archived_at = Column(DateTime, nullable=False, default=utcnow)
+
+# 소프트 삭제된 알람/루틴의 딸린 행 정리 작업 (purge.py 워커가 배치 단위로 처리)
+class PurgeTask(Base):
+    __tablename__ = "purge_task"
+    task_id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = Column(UUIDKey, nullable=False)
+    entity = Column(String(20), nullable=False)   # alarm | routine
+    entity_id = Column(UUIDKey, nullable=False)
+    created_at = Column(DateTime, nullable=False, default=utcnow)
+    batches = Column(Integer, nullable=False, default=0)       # 지금까지 처리한 배치 수
+    rows_purged = Column(Integer, nullable=False, default=0)   # 지금까지 지운 행 수
+    finished_at = Column(DateTime, nullable=True)              # 본체까지 지운 시각 (NULL = 대기/진행 중)
+
+    __table_args__ = (
+        Index("ix_purge_task_finished", "finished_at", "task_id"),
+    )
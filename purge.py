@@ -0,0 +1,271 @@
+"""소프트 삭제된 알람/루틴의 딸린 행을 배치 단위로 지우는 백그라운드 워커.
+
+DELETE /alarms/{id}, DELETE /routines/{id} 는 본체 행에 deleted_at 만 찍고 purge_task 를 남긴 뒤
+바로 응답한다. 워커는 task 를 오래된 순서로 꺼내 PURGE_BATCH_SIZE 행씩 지우고 배치마다 커밋하므로
+기록이 수천 건 쌓인 알람도 한 트랜잭션이 오래 락을 잡지 않는다. 진행 상황은 purge_task 의
+batches / rows_purged 에 남고, 중간에 멈춰도 다음 실행이 이어서 처리한다.
+
+    알람: 수행 기록(루틴별 결과 포함) → 알람-루틴 연결 / 예전 반복 요일 → 알람 본체
+          (일자별 집계는 삭제 요청 트랜잭션에서 이미 뺐으므로 행만 지운다)
+    루틴: 루틴별 수행 결과(부모 기록 합계 / 사용자 집계 보정) → 루틴 일자별 집계 → 알람-루틴 연결 → 루틴 본체
+
+보관 기간이 지난 sync tombstone 과 끝난 task 도 같은 주기에 정리한다.
+
+    PURGE_ENABLED=1          # API 프로세스 안에서 실행 (워커 하나에서만 켤 것)
+    PURGE_BATCH_SIZE=500
+    PURGE_POLL_SECONDS=10
+
+    python purge.py          # 별도 프로세스로 실행
+    python purge.py --once   # 남은 작업을 끝까지 처리하고 종료
+"""
+import logging
+import os
+import threading
+from collections import defaultdict
+from typing import Optional, Tuple
+
+from sqlalchemy import bindparam, delete, func, select, update
+from sqlalchemy.orm import Session
+
+import executions
+import models
+import stats
+import sync
+from database import env_bool, env_int
+from timeutils import utcnow
+
+PURGE_ENABLED = env_bool("PURGE_ENABLED", False)
+BATCH_SIZE = env_int("PURGE_BATCH_SIZE", 500)
+POLL_INTERVAL = float(os.getenv("PURGE_POLL_SECONDS", 10))
+
+logger = logging.getLogger("routina.purge")
+
+
+def enqueue(db: Session, user_id: str, entity: str, entity_id: str):
+    """정리 작업 등록. 커밋은 호출하는 쪽에서 (소프트 삭제와 같은 트랜잭션)."""
+    db.add(models.PurgeTask(user_id=user_id, entity=entity, entity_id=entity_id))
+
+
+def _purge_alarm_batch(db: Session, task: models.PurgeTask, limit: int) -> Tuple[int, bool]:
+    """알람 기록 행을 limit 건 지운다. 지울 기록이 없으면 연결/본체를 지운다. (지운 행 수, 끝났는지)"""
+    log, axr = models.AlarmExecutionLog, models.AlarmExecutionRoutine
+    # 집계는 DELETE /alarms/{id} 가 삭제 트랜잭션에서 이미 뺐다 (stats.remove_alarm_executions)
+    exec_ids = db.execute(select(log.exec_id).where(log.alarm_id == task.entity_id).limit(limit)).scalars().all()
+    if exec_ids:
+        n = db.execute(delete(axr).where(axr.exec_id.in_(exec_ids))).rowcount
+        return n + db.execute(delete(log).where(log.exec_id.in_(exec_ids))).rowcount, False
+
+    alarm_id = task.entity_id
+    n = db.execute(delete(models.AlarmRoutine).where(models.AlarmRoutine.alarm_id == alarm_id)).rowcount
+    n += db.execute(delete(models.AlarmRepeatDay).where(models.AlarmRepeatDay.alarm_id == alarm_id)).rowcount
+    n += db.execute(
+        delete(models.Alarm).where(models.Alarm.alarm_id == alarm_id, models.Alarm.deleted_at.isnot(None))
+    ).rowcount
+    return n, True
+
+
+def _remove_routine_results(db: Session, task: models.PurgeTask, rows: list):
+    """지우는 루틴별 결과만큼 부모 수행 기록의 total / completed / success_rate / status 와 사용자 집계를 고친다."""
+    removed = defaultdict(lambda: [0, 0])      # exec_id → [지우는 행 수, 그중 완료 수]
+    logs = {}
+    for r in rows:
+        removed[r.exec_id][0] += 1
+        removed[r.exec_id][1] += r.completed
+        logs[r.exec_id] = r
+    updates, user_days = [], defaultdict(lambda: {"done": 0, "total": 0, "rate_sum": 0.0})
+    for exec_id, (n, done) in removed.items():
+        l = logs[exec_id]
+        total, completed = l.total_routines - n, l.completed_routines - done
+        if l.status == "MISSED":
+            rate, status = 0.0, l.status
+        else:
+            rate, status = executions.summarize(total, completed)
+        updates.append({"b_id": exec_id, "b_total": total, "b_done": completed, "b_rate": rate, "b_status": status})
+        # 삭제 표시된 알람의 기록은 삭제할 때 이미 집계에서 뺐다
+        if l.scheduled_date is not None and l.alarm_deleted_at is None:
+            day = user_days[l.scheduled_date]
+            day["done"] -= done
+            day["total"] -= n
+            day["rate_sum"] += rate - float(l.success_rate)
+    table = models.AlarmExecutionLog.__table__
+    db.execute(
+        update(table).where(table.c.exec_id == bindparam("b_id")).values(
+            total_routines=bindparam("b_total"), completed_routines=bindparam("b_done"),
+            success_rate=bindparam("b_rate", type_=table.c.success_rate.type), status=bindparam("b_status"),
+        ),
+        updates,
+    )
+    stats.add_user_days(db, task.user_id, user_days)
+
+
+def _purge_routine_batch(db: Session, task: models.PurgeTask, limit: int) -> Tuple[int, bool]:
+    """루틴에 딸린 결과/집계를 limit 건씩 지운다. 남은 게 없으면 연결/본체를 지운다.
+
+    결과 행을 지울 때 부모 수행 기록의 합계와 사용자 일자별 집계도 같은 배치에서 고친다.
+    """
+    routine_id = task.entity_id
+    axr, log, alarm, daily = (
+        models.AlarmExecutionRoutine, models.AlarmExecutionLog, models.Alarm, models.RoutineDailyStats,
+    )
+    rows = db.execute(
+        select(axr.axr_id, axr.exec_id, axr.completed, log.scheduled_date, log.total_routines,
+               log.completed_routines, log.success_rate, log.status, alarm.deleted_at.label("alarm_deleted_at"))
+        .join(log, log.exec_id == axr.exec_id)
+        .join(alarm, alarm.alarm_id == log.alarm_id)
+        .where(axr.routine_id == routine_id)
+        .limit(limit)
+    ).all()
+    if rows:
+        _remove_routine_results(db, task, rows)
+        return db.execute(delete(axr).where(axr.axr_id.in_([r.axr_id for r in rows]))).rowcount, False
+    days = db.execute(select(daily.stat_date).where(daily.routine_id == routine_id).limit(limit)).scalars().all()
+    if days:
+        return db.execute(delete(daily).where(daily.routine_id == routine_id, daily.stat_date.in_(days))).rowcount, False
+
+    n = db.execute(delete(models.AlarmRoutine).where(models.AlarmRoutine.routine_id == routine_id)).rowcount
+    n += db.execute(
+        delete(models.Routine).where(models.Routine.routine_id == routine_id, models.Routine.deleted_at.isnot(None))
+    ).rowcount
+    return n, True
+
+
+PURGERS = {"alarm": _purge_alarm_batch, "routine": _purge_routine_batch}
+
+
+def run_task(db: Session, task: models.PurgeTask, batch_size: int = BATCH_SIZE, max_batches: Optional[int] = None) -> int:
+    """task 하나를 배치마다 커밋하며 끝까지(또는 max_batches 까지) 처리한다. 지운 행 수를 돌려준다."""
+    purged = 0
+    while max_batches is None or task.batches < max_batches:
+        n, done = PURGERS[task.entity](db, task, batch_size)
+        task.batches += 1
+        task.rows_purged += n
+        purged += n
+        if done:
+            task.finished_at = utcnow()
+        db.commit()
+        if done:
+            break
+    return purged
+
+
+def pending(db: Session) -> list:
+    return (
+        db.query(models.PurgeTask)
+        .filter(models.PurgeTask.finished_at.is_(None))
+        .order_by(models.PurgeTask.task_id)
+        .all()
+    )
+
+
+def progress(db: Session) -> dict:
+    """대기/진행 중 작업 수와 진행 상황 (GET /metrics/purge)"""
+    task = models.PurgeTask
+    count, batches, rows, oldest = db.query(
+        func.count(), func.sum(task.batches), func.sum(task.rows_purged), func.min(task.created_at)
+    ).filter(task.finished_at.is_(None)).one()
+    return {
+        "pending_tasks": count,
+        "pending_batches_done": int(batches or 0),
+        "pending_rows_purged": int(rows or 0),
+        "oldest_pending_at": oldest,
+        "finished_tasks": db.query(func.count()).filter(task.finished_at.isnot(None)).scalar(),
+    }
+
+
+def cleanup(db: Session) -> int:
+    """보관 기간이 지난 sync tombstone 과 끝난 task 삭제."""
+    n = sync.purge_tombstones(db)
+    n += db.query(models.PurgeTask).filter(
+        models.PurgeTask.finished_at < utcnow() - sync.TOMBSTONE_RETENTION
+    ).delete(synchronize_session=False)
+    db.commit()
+    return n
+
+
+class PurgeWorker:
+    def __init__(self, session_factory, batch_size: int = BATCH_SIZE):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.wakeup = threading.Event()
+        self.stopping = threading.Event()
+        self.thread = None
+        self.purged_total = 0
+
+    def run_once(self) -> int:
+        """대기 중인 task 를 모두 처리한다. 지운 행 수를 돌려준다."""
+        db = self.session_factory()
+        purged = 0
+        try:
+            for task in pending(db):
+                if self.stopping.is_set():
+                    break
+                purged += run_task(db, task, self.batch_size)
+            cleanup(db)
+        finally:
+            db.close()
+        self.purged_total += purged
+        return purged
+
+    def notify(self):
+        self.wakeup.set()
+
+    def run_forever(self):
+        while not self.stopping.is_set():
+            try:
+                self.run_once()
+            except Exception:
+                logger.exception("purge run failed, retrying")
+                self.stopping.wait(1.0)
+                continue
+            self.wakeup.wait(POLL_INTERVAL)
+            self.wakeup.clear()
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run_forever, name="purge-worker", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopping.set()
+        self.wakeup.set()
+        if self.thread:
+            self.thread.join(timeout=10)
+
+
+# API 프로세스에서 실행 중인 워커 (PURGE_ENABLED=1 일 때만)
+current: Optional[PurgeWorker] = None
+
+
+def notify():
+    if current is not None:
+        current.notify()
+
+
+def install(app, session_factory):
+    def start():
+        global current
+        current = PurgeWorker(session_factory)
+        current.start()
+
+    def stop():
+        if current is not None:
+            current.stop()
+
+    app.router.on_startup.append(start)
+    app.router.on_shutdown.append(stop)
+
+
+if __name__ == "__main__":
+    import sys
+
+    from database import SessionLocal, engine
+
+    models.Base.metadata.create_all(bind=engine)
+    worker = PurgeWorker(SessionLocal)
+    if "--once" in sys.argv[1:]:
+        print(f"purged {worker.run_once()} rows")
+        sys.exit(0)
+    print(f"purge worker running (batch={BATCH_SIZE}, poll={POLL_INTERVAL}s)")
+    try:
+        worker.run_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,33 @@
+"""엔진 이벤트로 SQL 문 / 커밋 횟수를 센다.
+
+    with QueryCounter(engine) as qc:
+        client.post("/alarms", ...)
+    qc.statements, qc.commits
+"""
+from sqlalchemy import event
+
+
+class QueryCounter:
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements = []   # 실행된 SQL (executemany 도 1번으로 셈)
+        self.commits = 0
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def _on_commit(self, conn):
+        self.commits += 1
+
+    def __enter__(self):
+        event.listen(self.engine, "before_cursor_execute", self._on_execute)
+        event.listen(self.engine, "commit", self._on_commit)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, "before_cursor_execute", self._on_execute)
+        event.remove(self.engine, "commit", self._on_commit)
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
@@ -0,0 +1,121 @@
+"""알람에 연결된 루틴 순서 키 (alarm_routine.order).
+
+order 는 듬성듬성한 정수 키다. 알람을 만들 때 GAP 간격(1024, 2048, ...)으로 주고,
+루틴 하나를 옮길 때는 새 자리 앞뒤 키의 중간값을 그 연결 행 하나에만 쓴다.
+같은 자리에 계속 끼워 넣어 이웃 키와 RENUMBER_BELOW 보다 가까워지면, 응답을 보낸 뒤
+백그라운드에서 그 알람의 키를 다시 GAP 간격으로 편다 (renumber). 중간값을 만들 수 없을 만큼
+이미 붙어 있으면(예전 1, 2, 3 키) 옮기는 요청 안에서 먼저 편다.
+
+API 응답의 order 는 키가 아니라 1 부터의 순번이다. /sync 는 키를 그대로 보내므로
+다시 펼 때는 version 을 올려 연결 행을 모두 다시 내려보낸다.
+"""
+from typing import List, Optional, Tuple
+
+from sqlalchemy import bindparam, select, update
+from sqlalchemy.orm import Session
+
+import models
+
+GAP = 1024
+# 이웃 키와 차이가 이보다 작아지면 (같은 자리에 여섯 번쯤 끼우면) 다시 편다.
+# 중간값을 더 만들 수 없는 차이(< 2)까지 기다리면 그 뒤 옮기기가 요청 안에서 펴야 한다.
+RENUMBER_BELOW = GAP // 64
+
+
+def spaced(n: int) -> List[int]:
+    return [(i + 1) * GAP for i in range(n)]
+
+
+def initial_keys(links) -> List[int]:
+    """클라이언트가 보낸 order(순번) 순서대로 GAP 간격 키. links 순서에 맞춘 목록을 돌려준다."""
+    ranked = sorted(range(len(links)), key=lambda i: links[i].order)
+    keys = [0] * len(links)
+    for key, i in zip(spaced(len(links)), ranked):
+        keys[i] = key
+    return keys
+
+
+def load(db: Session, alarm_id: str, user_id: str) -> list:
+    """내 알람(삭제되지 않은)의 살아 있는 루틴 연결을 순서대로 (alarm_id, order) 인덱스."""
+    link, alarm, routine = models.AlarmRoutine, models.Alarm, models.Routine
+    return db.execute(
+        select(link.alr_id, link.routine_id, link.order)
+        .join(alarm, alarm.alarm_id == link.alarm_id)
+        .join(routine, routine.routine_id == link.routine_id)
+        .where(
+            link.alarm_id == alarm_id, alarm.user_id == user_id,
+            alarm.deleted_at.is_(None), routine.deleted_at.is_(None),
+        )
+        .order_by(link.order)
+    ).all()
+
+
+def _write(db: Session, keys: dict):
+    """alr_id → 새 키 (executemany UPDATE 한 번, version / updated_at 은 onupdate 로 올라간다)."""
+    table = models.AlarmRoutine.__table__
+    db.execute(
+        update(table)
+        .where(table.c.alr_id == bindparam("b_id"))
+        .values(order=bindparam("b_order", type_=table.c.order.type)),
+        [{"b_id": alr_id, "b_order": key} for alr_id, key in keys.items()],
+    )
+
+
+def _between(prev: Optional[int], nxt: Optional[int]) -> Optional[int]:
+    if prev is None and nxt is None:
+        return GAP
+    if prev is None:
+        return nxt - GAP
+    if nxt is None:
+        return prev + GAP
+    if nxt - prev < 2:
+        return None
+    return (prev + nxt) // 2
+
+
+def move(db: Session, rows: list, routine_id: str, position: int) -> Tuple[List[str], bool]:
+    """routine_id 를 position 번째(1 부터)로 옮긴다 (커밋은 호출하는 쪽에서).
+
+    (옮긴 뒤 routine_id 순서, 백그라운드로 다시 펴야 하는지) 를 돌려준다.
+    rows 는 load() 결과이고, 같은 루틴이 여러 번 연결돼 있으면 첫 번째 것을 옮긴다.
+    """
+    current = next(i for i, r in enumerate(rows) if r.routine_id == routine_id)
+    rest = rows[:current] + rows[current + 1:]
+    index = min(max(position, 1), len(rows)) - 1
+    ordered = rest[:index] + [rows[current]] + rest[index:]
+    if index == current:
+        return [r.routine_id for r in ordered], False
+
+    prev = rest[index - 1].order if index > 0 else None
+    nxt = rest[index].order if index < len(rest) else None
+    key = _between(prev, nxt)
+    if key is None:
+        # 끼울 자리가 없으면 지금 전부 편다
+        _write(db, {r.alr_id: k for r, k in zip(ordered, spaced(len(ordered)))})
+        return [r.routine_id for r in ordered], False
+
+    _write(db, {rows[current].alr_id: key})
+    crowded = (prev is not None and key - prev < RENUMBER_BELOW) or (nxt is not None and nxt - key < RENUMBER_BELOW)
+    return [r.routine_id for r in ordered], crowded
+
+
+def renumber(db: Session, alarm_id: str) -> int:
+    """알람의 모든 연결 키를 GAP 간격으로 다시 편다 (순서는 그대로). 바꾼 행 수."""
+    link = models.AlarmRoutine
+    rows = db.execute(
+        select(link.alr_id, link.order).where(link.alarm_id == alarm_id).order_by(link.order)
+    ).all()
+    keys = {r.alr_id: k for r, k in zip(rows, spaced(len(rows))) if r.order != k}
+    if keys:
+        _write(db, keys)
+    return len(keys)
+
+
+def renumber_later(session_factory, alarm_id: str):
+    """BackgroundTasks 용: 응답 뒤 별도 세션에서 renumber."""
+    db = session_factory()
+    try:
+        renumber(db, alarm_id)
+        db.commit()
+    finally:
+        db.close()
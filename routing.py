@@ -0,0 +1,275 @@
+"""읽기 전용 replica 라우팅.
+
+REPLICA_DATABASE_URL 이 있으면 ROUTE_POLICY 에서 "replica" 로 지정한 통계 조회 라우트
+(/calendar, /weekly-feedback, /routine-stats, /dashboard)의 세션을 replica 엔진으로 연다.
+나머지 라우트와 모든 쓰기는 primary 그대로다. 다음 경우에는 replica 대신 primary 를 쓴다.
+
+- replica 가 응답하지 않거나 마지막 확인이 오래됨 (unhealthy)
+- 복제 지연이 REPLICA_MAX_LAG_SECONDS 를 넘음 (lagging)
+- 같은 사용자가 REPLICA_STICKY_SECONDS 안에 쓴 적이 있음 (sticky, 방금 쓴 값을 바로 읽도록)
+
+복제 지연은 heartbeat 로 잰다. ReplicaMonitor 가 REPLICA_CHECK_SECONDS 마다 primary 의
+replica_heartbeat 행에 현재 시각을 쓰고, 그 전에 replica 에서 같은 행을 읽어
+(primary 에 마지막으로 쓴 값 - replica 에 보이는 값) 을 지연으로 본다.
+sticky 기록은 프로세스 안에만 있으므로 워커가 여러 개면 같은 사용자의 요청이 같은 워커로 가야 정확하다.
+
+로컬에서는 SQLite 파일 두 개로 시험할 수 있다. primary 파일을 replica 로 복사하는 것이 곧 "복제"다.
+
+    DATABASE_URL=sqlite:///./primary.db
+    REPLICA_DATABASE_URL=sqlite:///./replica.db
+    python routing.py sync       # primary.db → replica.db 복사 (복제 흉내)
+    python routing.py status     # 지연 / 상태 한 번 확인
+
+    REPLICA_MAX_LAG_SECONDS=10
+    REPLICA_STICKY_SECONDS=10
+    REPLICA_CHECK_SECONDS=2
+"""
+import os
+import threading
+import time
+from collections import Counter
+from typing import Dict, Optional
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+import database
+import models
+from timeutils import utcnow
+
+PRIMARY, REPLICA = "primary", "replica"
+
+# 라우트(경로 템플릿)별 정책. 없는 라우트는 primary.
+ROUTE_POLICY = {
+    "/calendar": REPLICA,
+    "/weekly-feedback": REPLICA,
+    "/routine-stats": REPLICA,
+    "/dashboard": REPLICA,
+}
+
+MAX_LAG = float(os.getenv("REPLICA_MAX_LAG_SECONDS", 10))
+STICKY_SECONDS = float(os.getenv("REPLICA_STICKY_SECONDS", 10))
+CHECK_INTERVAL = float(os.getenv("REPLICA_CHECK_SECONDS", 2))
+HEARTBEAT_ID = 1
+
+
+def enabled() -> bool:
+    return database.replica_engine is not None
+
+
+class ReplicaMonitor:
+    """replica 상태 / 복제 지연 확인. check() 를 주기적으로 부른다 (start 하면 스레드로)."""
+
+    def __init__(self, primary, replica, interval: float = CHECK_INTERVAL):
+        self.primary = primary
+        self.replica = replica
+        self.interval = interval
+        self.healthy = False
+        self.lag: Optional[float] = None
+        self.checked_at: Optional[float] = None
+        self.error: Optional[str] = None
+        self.stopping = threading.Event()
+        self.thread = None
+
+    def check(self):
+        # replica 를 먼저 읽고 (이전 heartbeat 와 비교), replica 가 죽어 있어도 primary heartbeat 는 쓴다
+        try:
+            with self.replica.connect() as conn:
+                seen = conn.execute(self._beat_query()).scalar()
+            replica_error = None
+        except Exception as exc:
+            seen, replica_error = None, exc
+        try:
+            with self.primary.begin() as conn:
+                written = conn.execute(self._beat_query()).scalar()
+                beat = utcnow()
+                table = models.ReplicaHeartbeat.__table__
+                if written is None:
+                    conn.execute(table.insert().values(id=HEARTBEAT_ID, beat_at=beat))
+                else:
+                    conn.execute(table.update().where(table.c.id == HEARTBEAT_ID).values(beat_at=beat))
+        except Exception as exc:
+            replica_error = replica_error or exc
+        self.checked_at = time.monotonic()
+        if replica_error is not None:
+            self.mark_unhealthy(replica_error)
+        elif seen is None:
+            # replica 에 heartbeat 가 아직 없음 = 복제가 한 번도 따라오지 않음
+            self.healthy, self.lag, self.error = True, None, "no heartbeat on replica yet"
+        else:
+            self.healthy, self.error = True, None
+            self.lag = max(0.0, ((written or beat) - seen).total_seconds())
+
+    @staticmethod
+    def _beat_query():
+        return select(models.ReplicaHeartbeat.beat_at).where(models.ReplicaHeartbeat.id == HEARTBEAT_ID)
+
+    def mark_unhealthy(self, exc: Exception):
+        first_line = str(getattr(exc, "orig", None) or exc).splitlines()[0]
+        self.healthy, self.error = False, f"{type(exc).__name__}: {first_line}"
+
+    def reason(self) -> Optional[str]:
+        """replica 를 못 쓰는 이유 (쓸 수 있으면 None)"""
+        if self.checked_at is None or time.monotonic() - self.checked_at > 3 * self.interval:
+            return "unchecked"
+        if not self.healthy:
+            return "unhealthy"
+        if self.lag is None or self.lag > MAX_LAG:
+            return "lagging"
+        return None
+
+    def run_forever(self):
+        while not self.stopping.wait(self.interval):
+            self.check()
+
+    def start(self):
+        self.check()
+        self.thread = threading.Thread(target=self.run_forever, name="replica-monitor", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopping.set()
+        if self.thread:
+            self.thread.join(timeout=10)
+
+    def status(self) -> dict:
+        return {
+            "healthy": self.healthy,
+            "lag_seconds": self.lag,
+            "checked_ago_seconds": round(time.monotonic() - self.checked_at, 3) if self.checked_at else None,
+            "error": self.error,
+        }
+
+
+class Router:
+    """요청마다 primary / replica 를 고른다. 최근에 쓴 사용자는 STICKY_SECONDS 동안 primary."""
+
+    def __init__(self, monitor: Optional[ReplicaMonitor], sticky_seconds: float = STICKY_SECONDS):
+        self.monitor = monitor
+        self.sticky_seconds = sticky_seconds
+        self.recent_writes: Dict[str, float] = {}
+        self.lock = threading.Lock()
+        self.counters = Counter()
+
+    def mark_write(self, user_id: Optional[str]):
+        if not user_id:
+            return
+        now = time.monotonic()
+        with self.lock:
+            self.recent_writes[user_id] = now + self.sticky_seconds
+            if len(self.recent_writes) > 10000:
+                self.recent_writes = {u: t for u, t in self.recent_writes.items() if t > now}
+
+    def sticky(self, user_id: Optional[str]) -> bool:
+        expires = self.recent_writes.get(user_id) if user_id else None
+        return expires is not None and expires > time.monotonic()
+
+    def choose(self, route_path: Optional[str], user_id: Optional[str]) -> str:
+        if self.monitor is None or ROUTE_POLICY.get(route_path) != REPLICA:
+            return PRIMARY
+        if self.sticky(user_id):
+            self.counters["fallback_sticky"] += 1
+            return PRIMARY
+        reason = self.monitor.reason()
+        if reason:
+            self.counters["fallback_" + reason] += 1
+            return PRIMARY
+        self.counters["replica"] += 1
+        return REPLICA
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.monitor is not None,
+            **(self.monitor.status() if self.monitor else {}),
+            "sticky_users": sum(1 for t in list(self.recent_writes.values()) if t > time.monotonic()),
+            "routed": dict(self.counters),
+        }
+
+
+router = Router(ReplicaMonitor(database.engine, database.replica_engine) if enabled() else None)
+
+
+# ---- 요청 / 세션 연결 ----
+
+def request_user(request) -> Optional[str]:
+    return request.headers.get("user-id") or request.query_params.get("user_id")
+
+
+def target_for(request) -> str:
+    route = request.scope.get("route")
+    return router.choose(getattr(route, "path", None), request_user(request))
+
+
+def session_factory(target: str, async_mode: bool = False):
+    if async_mode:
+        return database.AsyncReplicaSessionLocal if target == REPLICA else database.AsyncSessionLocal
+    return database.ReplicaSessionLocal if target == REPLICA else database.SessionLocal
+
+
+def after_request(request, db):
+    """핸들러가 정상 종료됐고 그 세션이 뭔가 썼으면 요청 사용자를 sticky 로."""
+    if db.info.get("wrote"):
+        router.mark_write(request_user(request))
+
+
+def mark_write(user_id: Optional[str]):
+    router.mark_write(user_id)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _note_write(state):
+    if state.is_insert or state.is_update or state.is_delete:
+        state.session.info["wrote"] = True
+
+
+@event.listens_for(Session, "after_flush")
+def _note_flush(session, flush_context):
+    session.info["wrote"] = True
+
+
+def _on_replica_error(exception_context):
+    # 요청 중 replica 연결이 끊기면 다음 확인 전까지 primary 로
+    if exception_context.is_disconnect and router.monitor is not None:
+        router.monitor.mark_unhealthy(exception_context.original_exception)
+
+
+if database.replica_engine is not None:
+    event.listen(database.replica_engine, "handle_error", _on_replica_error)
+if database.async_replica_engine is not None:
+    event.listen(database.async_replica_engine.sync_engine, "handle_error", _on_replica_error)
+
+
+def install(app):
+    if router.monitor is None:
+        return
+    app.router.on_startup.append(router.monitor.start)
+    app.router.on_shutdown.append(router.monitor.stop)
+
+
+def sync_sqlite_files():
+    """로컬 시험용: primary SQLite 파일을 replica 파일로 통째로 복사한다 (복제 흉내)."""
+    import sqlite3
+
+    src = sqlite3.connect(database.engine.url.database)
+    dst = sqlite3.connect(database.replica_engine.url.database)
+    try:
+        src.backup(dst)
+    finally:
+        src.close()
+        dst.close()
+
+
+if __name__ == "__main__":
+    import sys
+
+    import orjson
+
+    if not enabled() or len(sys.argv) < 2 or sys.argv[1] not in ("sync", "status"):
+        print(__doc__)
+        sys.exit(1)
+    models.Base.metadata.create_all(bind=database.engine)
+    if sys.argv[1] == "sync":
+        router.monitor.check()   # heartbeat 를 먼저 써서 복사본에 담기게
+        sync_sqlite_files()
+    router.monitor.check()
+    print(orjson.dumps(router.monitor.status()).decode())
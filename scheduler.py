@@ -0,0 +1,349 @@
+"""서버 측 알람 스케줄러: 울린 뒤 유예 시간 안에 수행 기록이 없으면 MISSED 로 기록한다.
+
+활성 알람의 다음 울림 시각을 힙에 올려 두고, (울림 시각 + 유예 시간) 이 지난 것들을 모아
+같은 알람/같은 날 기록이 있는지 한 번에 확인한 뒤 없는 것만 MISSED 로 bulk INSERT 한다.
+집계(user_daily_stats / routine_daily_stats)도 같은 트랜잭션에서 더해져 /calendar 에 빈칸이 남지 않는다.
+
+알람을 만들거나/고치거나/끄거나/지우는 핸들러는 notify(alarm_id) 로 알려 주고,
+스케줄러는 다음 tick 에 그 알람들만 DB 에서 다시 읽는다. 일괄 변경은 notify_user(user_id) 로
+그 사용자 알람을 통째로 다시 읽는다. 일시정지(paused_until) 이전 울림은 MISSED 로 남기지 않는다.
+notify 는 같은 프로세스 안에서만 닿으므로, 매 tick 마다 지난 tick 이후 updated_at 이 바뀐 알람
+(삭제 표시된 것 포함)도 ix_alarm_updated 로 다시 읽는다. 그래서 별도 프로세스로 돌리거나 API 워커
+하나에서만 켜도 다른 워커의 변경이 SCHEDULER_POLL_SECONDS 안에 반영된다.
+
+    SCHEDULER_ENABLED=1          # API 프로세스 안에서 실행 (워커 하나에서만 켤 것)
+    SCHEDULER_GRACE_MINUTES=30
+    SCHEDULER_POLL_SECONDS=30
+
+    python scheduler.py          # 별도 프로세스로 실행
+
+유예 시간이 지난 뒤 올라온 수행 기록은 executions.replace_missed 가 MISSED 를 대신한다.
+"""
+import heapq
+import logging
+import os
+import threading
+from dataclasses import dataclass
+from datetime import datetime, time, timedelta
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import select
+
+import alarm_schedule
+import executions
+import ids
+import models
+import sync
+from database import env_bool
+from timeutils import parse_client_ts, utcnow
+
+SCHEDULER_ENABLED = env_bool("SCHEDULER_ENABLED", False)
+GRACE = timedelta(minutes=float(os.getenv("SCHEDULER_GRACE_MINUTES", 30)))
+POLL_INTERVAL = float(os.getenv("SCHEDULER_POLL_SECONDS", 30))
+BATCH_SIZE = 1000
+
+logger = logging.getLogger("routina.scheduler")
+
+
+class SystemClock:
+    def now(self) -> datetime:
+        return utcnow()
+
+
+class VirtualClock:
+    """테스트/시뮬레이션용: 직접 옮기기 전까지 시간이 흐르지 않는다."""
+
+    def __init__(self, start: datetime):
+        self.current = start
+
+    def now(self) -> datetime:
+        return self.current
+
+    def set(self, ts: datetime):
+        self.current = max(self.current, ts)
+
+
+@dataclass
+class Slot:
+    user_id: str
+    time: time
+    mask: int
+    status: str
+    fire_at: datetime
+    paused_until: Optional[datetime] = None
+
+
+class AlarmScheduler:
+    def __init__(self, session_factory, clock=None, grace: timedelta = GRACE, batch_size: int = BATCH_SIZE):
+        self.session_factory = session_factory
+        self.clock = clock or SystemClock()
+        self.grace = grace
+        self.batch_size = batch_size
+        self.slots: Dict[str, Slot] = {}
+        self.heap: List[Tuple[datetime, str]] = []   # (fire_at, alarm_id), 바뀐 알람의 옛 항목은 pop 할 때 버린다
+        self.pending: Set[str] = set()
+        self.pending_users: Set[str] = set()
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.stopping = threading.Event()
+        self.thread = None
+        self.missed_total = 0
+        self.synced_at: Optional[datetime] = None   # 이 시각 이후 바뀐 알람은 아직 다시 읽지 않음
+
+    # ---- 스케줄 적재 ----
+
+    def _columns(self):
+        a = models.Alarm
+        return select(a.alarm_id, a.user_id, a.time, a.repeat_mask, a.status, a.next_fire_at, a.paused_until).where(
+            a.status == "Active", a.next_fire_at.isnot(None), a.deleted_at.is_(None)
+        )
+
+    def _put(self, alarm_id, user_id, alarm_time, mask, status, fire_at, paused_until=None):
+        self.slots[alarm_id] = Slot(user_id, alarm_time, mask or 0, status, fire_at, paused_until)
+        heapq.heappush(self.heap, (fire_at, alarm_id))
+
+    def load(self):
+        """활성 알람 전체를 다시 읽는다 (시작 시 한 번)."""
+        self.slots.clear()
+        self.heap.clear()
+        # 읽는 도중 커밋된 변경을 놓치지 않게 조금 앞에서부터 (sync cursor 와 같은 이유)
+        self.synced_at = utcnow() - sync.CURSOR_LAG
+        db = self.session_factory()
+        try:
+            for row in db.execute(self._columns().execution_options(yield_per=self.batch_size)):
+                self._put(*row)
+        finally:
+            db.close()
+
+    def notify(self, alarm_id: str):
+        """알람 스케줄이 바뀌었음 (생성/수정/상태 변경/삭제). 다음 tick 에 다시 읽는다."""
+        with self.lock:
+            self.pending.add(alarm_id)
+        self.wakeup.set()
+
+    def notify_user(self, user_id: str):
+        """사용자의 알람 여러 개가 한 번에 바뀜 (일괄 상태 변경 / 일시정지)."""
+        with self.lock:
+            self.pending_users.add(user_id)
+        self.wakeup.set()
+
+    def _reload_changed(self, db):
+        """지난번 이후 updated_at 이 바뀐 알람을 다시 읽는다. 지워지거나 꺼진 알람은 슬롯에서 뺀다."""
+        if self.synced_at is None:
+            return
+        a = models.Alarm
+        since, self.synced_at = self.synced_at, utcnow() - sync.CURSOR_LAG
+        for row in db.execute(
+            select(a.alarm_id, a.user_id, a.time, a.repeat_mask, a.status, a.next_fire_at, a.paused_until, a.deleted_at)
+            .where(a.updated_at > since)
+        ):
+            *values, deleted_at = row
+            self.slots.pop(row.alarm_id, None)
+            if deleted_at is None and row.status == "Active" and row.next_fire_at is not None:
+                self._put(*values)
+
+    def _reload_pending(self, db):
+        with self.lock:
+            alarm_ids, self.pending = list(self.pending), set()
+            users, self.pending_users = self.pending_users, set()
+        if users:
+            for alarm_id in [a for a, slot in self.slots.items() if slot.user_id in users]:
+                del self.slots[alarm_id]
+            for row in db.execute(self._columns().where(models.Alarm.user_id.in_(users))):
+                self._put(*row)
+        for i in range(0, len(alarm_ids), self.batch_size):
+            chunk = alarm_ids[i:i + self.batch_size]
+            for alarm_id in chunk:
+                self.slots.pop(alarm_id, None)
+            for row in db.execute(self._columns().where(models.Alarm.alarm_id.in_(chunk))):
+                self._put(*row)
+
+    # ---- MISSED 처리 ----
+
+    def _pop_due(self, now: datetime) -> List[Tuple[str, Slot, datetime]]:
+        due = []
+        while self.heap and self.heap[0][0] + self.grace <= now:
+            fire_at, alarm_id = heapq.heappop(self.heap)
+            slot = self.slots.get(alarm_id)
+            if slot is None or slot.fire_at != fire_at:
+                continue
+            # 일시정지 중 울림은 MISSED 로 남기지 않고 다음 울림으로 넘어간다
+            if slot.paused_until is None or fire_at >= slot.paused_until:
+                due.append((alarm_id, slot, fire_at))
+            nxt = alarm_schedule.compute_next_fire(slot.time, slot.mask, slot.status, fire_at) if slot.mask else None
+            if nxt is None:
+                del self.slots[alarm_id]
+            else:
+                slot.fire_at = nxt
+                heapq.heappush(self.heap, (nxt, alarm_id))
+        return due
+
+    def _record(self, db, due: List[Tuple[str, Slot, datetime]]) -> int:
+        """due 중 수행 기록이 없는 것만 MISSED 로 넣고 next_fire_at 을 옮긴다."""
+        entries = {}
+        for alarm_id, slot, fire_at in due:
+            scheduled_ts = fire_at.isoformat() + "Z"
+            scheduled_at, scheduled_date = parse_client_ts(scheduled_ts)
+            entries[(alarm_id, scheduled_date)] = (slot.user_id, {
+                "exec_id": ids.new_id(),
+                "alarm_id": alarm_id,
+                "scheduled_ts": scheduled_ts,
+                "dismissed_ts": None,
+                "scheduled_at": scheduled_at,
+                "scheduled_date": scheduled_date,
+                "total_routines": 0,
+                "completed_routines": 0,
+                "success_rate": 0.0,
+                "status": "MISSED",
+            }, [])
+        alarm_ids = {a for a, _ in entries}
+
+        # 같은 알람/같은 날 기록이 이미 있으면 건너뜀 (alarm_id, scheduled_date) 인덱스
+        log = models.AlarmExecutionLog
+        for key in db.query(log.alarm_id, log.scheduled_date).filter(
+            log.alarm_id.in_(alarm_ids), log.scheduled_date.in_({d for _, d in entries})
+        ):
+            entries.pop(tuple(key), None)
+
+        # 연결된 (삭제 표시되지 않은) 루틴들도 미완료로 기록
+        if entries:
+            links: Dict[str, List[models.AlarmRoutine]] = {}
+            for link in db.query(models.AlarmRoutine).join(
+                models.Routine, models.Routine.routine_id == models.AlarmRoutine.routine_id
+            ).filter(
+                models.AlarmRoutine.alarm_id.in_({a for a, _ in entries}), models.Routine.deleted_at.is_(None)
+            ).order_by(models.AlarmRoutine.alarm_id, models.AlarmRoutine.order):
+                links.setdefault(link.alarm_id, []).append(link)
+            for (alarm_id, _), (_, row, details) in entries.items():
+                row["total_routines"] = len(links.get(alarm_id, []))
+                details.extend(
+                    {
+                        "axr_id": ids.new_id(),
+                        "exec_id": row["exec_id"],
+                        "routine_id": l.routine_id,
+                        "completed": 0,
+                        "actual_value": None,
+                        "completed_ts": None,
+                        "abort_ts": None,
+                        "order": rank,
+                    }
+                    for rank, l in enumerate(links.get(alarm_id, []), 1)
+                )
+            executions.insert_rows(db, list(entries.values()), replace_missed_logs=False)
+
+        alarm_schedule.set_next_fire(db, {
+            alarm_id: self.slots[alarm_id].fire_at if alarm_id in self.slots else None
+            for alarm_id in alarm_ids
+        }, only_before=max(fire_at for _, _, fire_at in due))
+        return len(entries)
+
+    def tick(self, now: Optional[datetime] = None) -> int:
+        """바뀐 알람을 다시 읽고, 유예 시간이 지난 울림을 처리한다. 새로 넣은 MISSED 수 반환."""
+        now = now or self.clock.now()
+        db = self.session_factory()
+        missed = 0
+        try:
+            self._reload_changed(db)
+            self._reload_pending(db)
+            due = self._pop_due(now)
+            for i in range(0, len(due), self.batch_size):
+                missed += self._record(db, due[i:i + self.batch_size])
+                db.commit()
+        finally:
+            db.close()
+        self.missed_total += missed
+        return missed
+
+    def next_due(self) -> Optional[datetime]:
+        while self.heap:
+            fire_at, alarm_id = self.heap[0]
+            slot = self.slots.get(alarm_id)
+            if slot is not None and slot.fire_at == fire_at:
+                return fire_at + self.grace
+            heapq.heappop(self.heap)
+        return None
+
+    # ---- 실행 ----
+
+    def simulate(self, until: datetime, step: timedelta = timedelta(minutes=1)) -> int:
+        """VirtualClock 을 다음 처리 시각으로 옮겨 가며 until 까지 돌린다."""
+        missed = 0
+        while True:
+            nxt = self.next_due()
+            if nxt is None or nxt > until:
+                break
+            self.clock.set(max(nxt, self.clock.now() + step))
+            missed += self.tick(min(self.clock.now(), until))
+        return missed
+
+    def run_forever(self):
+        loaded = False
+        while not self.stopping.is_set():
+            try:
+                if not loaded:
+                    self.load()
+                    loaded = True
+                self.tick()
+            except Exception:
+                # 실패한 tick 이 꺼낸 울림/변경 알림을 잃지 않게 다음 번에 전체를 다시 읽는다
+                logger.exception("alarm scheduler tick failed, retrying")
+                loaded = False
+                self.stopping.wait(1.0)
+                continue
+            nxt = self.next_due()
+            timeout = POLL_INTERVAL
+            if nxt is not None:
+                timeout = min(timeout, max((nxt - self.clock.now()).total_seconds(), 0.0))
+            self.wakeup.wait(timeout)
+            self.wakeup.clear()
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run_forever, name="alarm-scheduler", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopping.set()
+        self.wakeup.set()
+        if self.thread:
+            self.thread.join(timeout=10)
+
+
+# API 프로세스에서 실행 중인 스케줄러 (SCHEDULER_ENABLED=1 일 때만)
+current: Optional[AlarmScheduler] = None
+
+
+def notify(alarm_ids: Iterable[str]):
+    if current is not None:
+        for alarm_id in alarm_ids:
+            current.notify(alarm_id)
+
+
+def notify_user(user_id: str):
+    if current is not None:
+        current.notify_user(user_id)
+
+
+def install(app, session_factory):
+    def start():
+        global current
+        current = AlarmScheduler(session_factory)
+        current.start()
+
+    def stop():
+        if current is not None:
+            current.stop()
+
+    app.router.on_startup.append(start)
+    app.router.on_shutdown.append(stop)
+
+
+if __name__ == "__main__":
+    from database import SessionLocal, engine
+
+    models.Base.metadata.create_all(bind=engine)
+    scheduler = AlarmScheduler(SessionLocal)
+    print(f"alarm scheduler running (grace={GRACE}, poll={POLL_INTERVAL}s)")
+    try:
+        scheduler.run_forever()
+    except KeyboardInterrupt:
+        pass
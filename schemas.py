@@ -1,6 +1,9 @@
 from pydantic import BaseModel, Field
-from typing import Optional, List
-from datetime import time
+from typing import Annotated, Optional, List
+from datetime import date, time
+
+# 반복 요일 번호 1(월) ~ 7(일), 범위 밖이면 422
+Weekday = Annotated[int, Field(ge=1, le=7)]
 
 
 class RoutineCreate(BaseModel):
@@ -33,7 +36,7 @@ class AlarmCreate(BaseModel):
     status: str
     sound_volume: Optional[float] = Field(default=0.8)
     vibration_on: bool
-    repeat_days: Optional[list[int]] = []
+    repeat_days: Optional[list[Weekday]] = []
     routines: list["AlarmRoutineIn"]
 
 class AlarmUpdate(BaseModel):
@@ -41,7 +44,19 @@ class AlarmUpdate(BaseModel):
     time: Optional[str]
     status: Optional[str]
     sound_volume: Optional[float]
-    repeat_days: Optional[List[int]] = []
+    repeat_days: Optional[List[Weekday]] = []
+
+# PATCH /alarms/status: alarm_ids 또는 all 중 하나로 고르고, status / paused_until 중 하나 이상 지정
+class AlarmBulkStatus(BaseModel):
+    alarm_ids: Optional[List[str]] = None
+    all: bool = False  # True 면 내 알람 전체
+    status: Optional[str] = Field(default=None, pattern="^(Active|Inactive)$")
+    paused_until: Optional[date] = None  # KST 날짜, 이날부터 다시 울림 (null 을 보내면 일시정지 해제)
+
+# PATCH /alarms/{alarm_id}/routines/order: 루틴 하나를 position 번째(1 부터)로 옮긴다
+class AlarmRoutineMove(BaseModel):
+    routine_id: str
+    position: int = Field(..., ge=1)  # 연결 수보다 크면 맨 뒤
 
 class AlarmOut(BaseModel):
     alarm_id: str
@@ -51,7 +66,7 @@ class AlarmOut(BaseModel):
 
 class AlarmRepeatDaysIn(BaseModel):
     alarm_id: str
-    repeat_days: List[int]  # 1 ~ 7
+    repeat_days: List[Weekday]
 
 class AlarmRepeatDayOut(BaseModel):
     alarm_id: str
@@ -70,6 +85,16 @@ class AlarmExecutionCreate(BaseModel):
     dismissed_ts: str
     routines: List[ExecutionRoutine]
 
+class ExecutionRoutineUpdate(BaseModel):
+    routine_id: str
+    completed: bool
+    actual_value: Optional[int] = None
+    completed_ts: Optional[str] = None
+    abort_ts: Optional[str] = None
+
+class AlarmExecutionUpdate(BaseModel):
+    routines: List[ExecutionRoutineUpdate] = []
+
 class RoutineUpdate(RoutineCreate):
     pass
 
@@ -0,0 +1,257 @@
+"""실행 기록 일자별 집계 (user_daily_stats / routine_daily_stats).
+
+실행 기록을 저장/수정/삭제하는 쪽에서 같은 트랜잭션 안에서 delta 를 반영하고,
+조회 API(/calendar, /weekly-feedback, /routine-stats)는 집계 테이블만 읽는다.
+루틴별 연속 달성(streak)은 routine_daily_stats 를 윈도 함수 쿼리 한 번으로 계산한다 (routine_summary).
+집계가 어긋났을 때는 원본 로그에서 다시 계산한다. archive.py 로 보관한 달은 원본이 없으므로 그대로 둔다.
+
+    python stats.py rebuild            # 전체 사용자
+    python stats.py rebuild <user_id>  # 특정 사용자
+"""
+import sys
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import case, exists, func, select
+from sqlalchemy.orm import Session
+
+import models
+
+USER_COUNTERS = ("exec_count", "done", "total", "rate_sum")
+ROUTINE_COUNTERS = ("done", "total")
+
+
+def _increment(db: Session, model, key_cols: Tuple[str, ...], counters: Tuple[str, ...], rows: List[dict]):
+    """rows 의 카운터 값을 기존 행에 더한다 (없으면 insert). 방언별 upsert 한 번으로 처리."""
+    if not rows:
+        return
+    table = model.__table__
+    if db.get_bind().dialect.name == "mysql":
+        from sqlalchemy.dialects.mysql import insert
+        stmt = insert(table)
+        stmt = stmt.on_duplicate_key_update({c: table.c[c] + stmt.inserted[c] for c in counters})
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+        stmt = insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(key_cols),
+            set_={c: table.c[c] + stmt.excluded[c] for c in counters},
+        )
+    db.execute(stmt, rows)
+
+
+def add_user_day(db: Session, user_id: str, day: Optional[date], exec_count=0, done=0, total=0, rate_sum=0):
+    if day is None:
+        return
+    _increment(db, models.UserDailyStats, ("user_id", "stat_date"), USER_COUNTERS, [{
+        "user_id": user_id, "stat_date": day,
+        "exec_count": exec_count, "done": done, "total": total, "rate_sum": rate_sum,
+    }])
+
+
+def add_routine_days(db: Session, user_id: str, day: Optional[date], deltas: Dict[str, Tuple[int, int]]):
+    """deltas: routine_id → (done delta, total delta)"""
+    if day is None or not deltas:
+        return
+    _increment(db, models.RoutineDailyStats, ("routine_id", "stat_date"), ROUTINE_COUNTERS, [
+        {"routine_id": rid, "stat_date": day, "user_id": user_id, "done": d, "total": t}
+        for rid, (d, t) in deltas.items()
+    ])
+
+
+def add_user_days(db: Session, user_id: str, deltas: Dict[date, dict]):
+    """날짜 → 카운터 delta dict 들을 upsert 한 번으로 더한다."""
+    _increment(db, models.UserDailyStats, ("user_id", "stat_date"), USER_COUNTERS, [
+        {"user_id": user_id, "stat_date": day, **{c: d.get(c, 0) for c in USER_COUNTERS}}
+        for day, d in deltas.items()
+    ])
+
+
+def record_execution_rows(db: Session, entries: Iterable[Tuple[str, dict, List[dict]]], sign: int = 1):
+    """새 실행 기록 (user_id, log 행, detail 행들) 들을 (사용자, 날짜) 별로 합쳐 upsert 한 번씩으로 더한다.
+
+    sign=-1 이면 지워지는 기록만큼 뺀다.
+    """
+    users: Dict[Tuple[str, date], dict] = {}
+    routines: Dict[Tuple[str, date], dict] = {}
+    for user_id, log, details in entries:
+        day = log["scheduled_date"]
+        if user_id is None or day is None:
+            continue
+        u = users.setdefault((user_id, day), {
+            "user_id": user_id, "stat_date": day, "exec_count": 0, "done": 0, "total": 0, "rate_sum": 0,
+        })
+        u["exec_count"] += sign
+        u["done"] += sign * log["completed_routines"]
+        u["total"] += sign * log["total_routines"]
+        u["rate_sum"] += sign * log["success_rate"]
+        for d in details:
+            r = routines.setdefault((d["routine_id"], day), {
+                "routine_id": d["routine_id"], "stat_date": day, "user_id": user_id, "done": 0, "total": 0,
+            })
+            r["done"] += sign * int(d["completed"])
+            r["total"] += sign
+    _increment(db, models.UserDailyStats, ("user_id", "stat_date"), USER_COUNTERS, list(users.values()))
+    _increment(db, models.RoutineDailyStats, ("routine_id", "stat_date"), ROUTINE_COUNTERS, list(routines.values()))
+
+
+def record_correction(db: Session, user_id: str, log: models.AlarmExecutionLog, old_done: int, old_rate, routine_done_deltas: Dict[str, int]):
+    """실행 기록 수정분만큼 집계를 보정한다 (전체 수/실행 수는 그대로)."""
+    add_user_day(
+        db, user_id, log.scheduled_date,
+        done=log.completed_routines - old_done, rate_sum=float(log.success_rate) - float(old_rate),
+    )
+    add_routine_days(db, user_id, log.scheduled_date, {
+        rid: (d, 0) for rid, d in routine_done_deltas.items() if d
+    })
+
+
+def remove_alarm_executions(db: Session, user_id: str, alarm_id: str):
+    """알람을 삭제할 때 그 실행 기록만큼 일자별 집계에서 뺀다 (기록 행은 purge 워커가 나중에 지움).
+
+    날짜별 / (날짜, 루틴)별로 묶어 읽고 upsert 두 번으로 반영한다.
+    """
+    log, axr = models.AlarmExecutionLog, models.AlarmExecutionRoutine
+    _increment(db, models.UserDailyStats, ("user_id", "stat_date"), USER_COUNTERS, [
+        {"user_id": user_id, "stat_date": day, "exec_count": -cnt, "done": -int(done or 0),
+         "total": -int(total or 0), "rate_sum": -(rate_sum or 0)}
+        for day, cnt, done, total, rate_sum in (
+            db.query(log.scheduled_date, func.count(), func.sum(log.completed_routines),
+                     func.sum(log.total_routines), func.sum(log.success_rate))
+            .filter(log.alarm_id == alarm_id, log.scheduled_date.isnot(None))
+            .group_by(log.scheduled_date)
+        )
+    ])
+    _increment(db, models.RoutineDailyStats, ("routine_id", "stat_date"), ROUTINE_COUNTERS, [
+        {"routine_id": rid, "stat_date": day, "user_id": user_id, "done": -int(done or 0), "total": -total}
+        for day, rid, done, total in (
+            db.query(log.scheduled_date, axr.routine_id, func.sum(axr.completed), func.count())
+            .join(log, log.exec_id == axr.exec_id)
+            .filter(log.alarm_id == alarm_id, log.scheduled_date.isnot(None))
+            .group_by(log.scheduled_date, axr.routine_id)
+        )
+    ])
+
+
+def _archived(user_col, date_col):
+    """(사용자, 날짜) 가 보관한 달에 속하는지"""
+    archive = models.ExecutionArchive
+    return exists().where(archive.user_id == user_col, archive.month_start <= date_col, archive.month_end > date_col)
+
+
+def rebuild(db: Session, user_id: Optional[str] = None):
+    """원본 실행 기록에서 집계 테이블을 다시 만든다 (보관한 달의 집계는 건드리지 않음).
+
+    삭제 표시된 알람의 기록은 삭제할 때 이미 뺐으므로 (purge 전이라 남아 있어도) 세지 않는다.
+    """
+    log, axr, alarm = models.AlarmExecutionLog, models.AlarmExecutionRoutine, models.Alarm
+    user_daily, routine_daily = models.UserDailyStats, models.RoutineDailyStats
+
+    user_q = db.query(user_daily).filter(~_archived(user_daily.user_id, user_daily.stat_date))
+    routine_q = db.query(routine_daily).filter(~_archived(routine_daily.user_id, routine_daily.stat_date))
+    if user_id:
+        user_q = user_q.filter(user_daily.user_id == user_id)
+        routine_q = routine_q.filter(routine_daily.user_id == user_id)
+    user_q.delete(synchronize_session=False)
+    routine_q.delete(synchronize_session=False)
+
+    user_rows = (
+        db.query(alarm.user_id, log.scheduled_date, func.count(), func.sum(log.completed_routines),
+                 func.sum(log.total_routines), func.sum(log.success_rate))
+        .join(alarm, alarm.alarm_id == log.alarm_id)
+        .filter(log.scheduled_date.isnot(None), alarm.deleted_at.is_(None), ~_archived(alarm.user_id, log.scheduled_date))
+    )
+    routine_rows = (
+        db.query(alarm.user_id, axr.routine_id, log.scheduled_date, func.sum(axr.completed), func.count())
+        .join(log, log.exec_id == axr.exec_id)
+        .join(alarm, alarm.alarm_id == log.alarm_id)
+        .filter(log.scheduled_date.isnot(None), alarm.deleted_at.is_(None), ~_archived(alarm.user_id, log.scheduled_date))
+    )
+    if user_id:
+        user_rows = user_rows.filter(alarm.user_id == user_id)
+        routine_rows = routine_rows.filter(alarm.user_id == user_id)
+
+    _increment(db, user_daily, ("user_id", "stat_date"), USER_COUNTERS, [
+        {"user_id": uid, "stat_date": day, "exec_count": cnt, "done": int(done or 0),
+         "total": int(total or 0), "rate_sum": rate_sum or 0}
+        for uid, day, cnt, done, total, rate_sum in user_rows.group_by(alarm.user_id, log.scheduled_date)
+    ])
+    _increment(db, routine_daily, ("routine_id", "stat_date"), ROUTINE_COUNTERS, [
+        {"routine_id": rid, "stat_date": day, "user_id": uid, "done": int(done or 0), "total": total}
+        for uid, rid, day, done, total in routine_rows.group_by(alarm.user_id, axr.routine_id, log.scheduled_date)
+    ])
+
+
+
+def routine_summary(db: Session, user_id: str, date_from: Optional[date] = None, date_to: Optional[date] = None) -> list:
+    """루틴(routine_id)별 완료 수 / 전체 수 + 현재·최고 연속 달성 일수.
+
+    루틴이 예정됐던 날(total > 0)을 날짜순으로 늘어놓고, 하루에 한 번이라도 완료했으면(done > 0)
+    달성한 날로 본다. 그날까지 놓친 날 수의 누적합(grp)이 같은 날들이 한 구간이고, 구간 안 달성일 수가
+    연속 달성 일수다. 현재 연속은 마지막 구간(= 마지막으로 놓친 날 이후)의 길이.
+    계산은 모두 DB 의 윈도 함수로 한 번에 한다.
+    """
+    daily, routine = models.RoutineDailyStats, models.Routine
+    ok = case((daily.done > 0, 1), else_=0)
+    days = (
+        select(
+            daily.routine_id, daily.stat_date, daily.done, daily.total, ok.label("ok"),
+            func.sum(1 - ok).over(
+                partition_by=daily.routine_id, order_by=daily.stat_date, rows=(None, 0)
+            ).label("grp"),
+        )
+        # 사용자의 루틴 id 로 PK (routine_id, stat_date) 를 따라 읽으면 윈도 정렬이 따로 필요 없다
+        .where(
+            daily.routine_id.in_(
+                select(routine.routine_id).where(routine.user_id == user_id, routine.deleted_at.is_(None))
+            ),
+            daily.total > 0,
+        )
+    )
+    if date_from:
+        days = days.where(daily.stat_date >= date_from)
+    if date_to:
+        days = days.where(daily.stat_date <= date_to)
+    days = days.subquery()
+
+    runs = (
+        select(
+            days.c.routine_id, days.c.grp,
+            func.sum(days.c.ok).label("length"),
+            func.sum(days.c.done).label("done"),
+            func.sum(days.c.total).label("total"),
+            func.max(days.c.stat_date).label("last_date"),
+            func.max(days.c.grp).over(partition_by=days.c.routine_id).label("last_grp"),
+        )
+        .group_by(days.c.routine_id, days.c.grp)
+        .subquery()
+    )
+    return db.execute(
+        select(
+            runs.c.routine_id,
+            routine.title,
+            func.sum(runs.c.done).label("done"),
+            func.sum(runs.c.total).label("total"),
+            func.max(case((runs.c.grp == runs.c.last_grp, runs.c.length), else_=0)).label("current_streak"),
+            func.max(runs.c.length).label("best_streak"),
+            func.max(runs.c.last_date).label("last_date"),
+        )
+        .join(routine, routine.routine_id == runs.c.routine_id)
+        .group_by(runs.c.routine_id, routine.title)
+        .order_by(routine.title, runs.c.routine_id)
+    ).all()
+
+if __name__ == "__main__":
+    from database import SessionLocal, engine
+
+    if len(sys.argv) < 2 or sys.argv[1] != "rebuild":
+        print(__doc__)
+        sys.exit(1)
+    models.Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        rebuild(db, sys.argv[2] if len(sys.argv) > 2 else None)
+        db.commit()
+        print("user_daily_stats / routine_daily_stats rebuilt")
+    finally:
+        db.close()
@@ -0,0 +1,105 @@
+"""GET /sync 델타 동기화.
+
+클라이언트는 지난 응답의 cursor 를 since 로 보내고, 그 이후 바뀐 routine / alarm / alarm_routine 행과
+삭제 기록(tombstone)만 받는다. since 가 없거나 tombstone 보관 기간보다 오래됐으면 전체를 내려준다(reset).
+
+cursor 는 조회 시작 시각에서 CURSOR_LAG 만큼 뺀 값이다. 조회 도중 커밋된 쓰기를 놓치지 않도록
+일부 행이 다음 동기화에 한 번 더 올 수 있고, 클라이언트는 version 으로 덮어쓰면 된다.
+"""
+import os
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+import models
+import serializers
+from timeutils import utcnow
+
+CURSOR_LAG = timedelta(seconds=float(os.getenv("SYNC_CURSOR_LAG_SECONDS", 2)))
+TOMBSTONE_RETENTION = timedelta(days=int(os.getenv("SYNC_TOMBSTONE_RETENTION_DAYS", 30)))
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def encode_cursor(ts: datetime) -> str:
+    return str(int((ts - EPOCH) / timedelta(microseconds=1)))
+
+
+def decode_cursor(cursor: str) -> datetime:
+    return EPOCH + timedelta(microseconds=int(cursor))
+
+
+def tombstone(db: Session, user_id: str, entity: str, entity_ids: Iterable[str]):
+    """삭제된 행을 기록한다. 커밋은 호출하는 쪽에서."""
+    rows = [{"user_id": user_id, "entity": entity, "entity_id": eid} for eid in entity_ids]
+    if rows:
+        db.execute(insert(models.SyncTombstone), rows)
+
+
+def purge_tombstones(db: Session) -> int:
+    """보관 기간이 지난 tombstone 삭제 (그보다 오래된 cursor 는 어차피 reset 된다)."""
+    return db.query(models.SyncTombstone).filter(
+        models.SyncTombstone.deleted_at < utcnow() - TOMBSTONE_RETENTION
+    ).delete(synchronize_session=False)
+
+
+def routine_out(r) -> dict:
+    return {**serializers.routine_out(r), "version": r.version, "updated_at": r.updated_at}
+
+
+def alarm_out(a) -> dict:
+    return {
+        **serializers.alarm_summary(a),
+        "vibration_on": a.vibration_on,
+        "version": a.version,
+        "updated_at": a.updated_at,
+    }
+
+
+def link_out(l) -> dict:
+    return {
+        "alr_id": l.alr_id,
+        **{c.key: getattr(l, c.key) for c in serializers.LINK_COLUMNS},
+        "version": l.version,
+        "updated_at": l.updated_at,
+    }
+
+
+def changes_since(db: Session, user_id: str, since: Optional[str]) -> dict:
+    now = utcnow()
+    since_ts = decode_cursor(since) if since else None
+    reset = since_ts is None or since_ts < now - TOMBSTONE_RETENTION
+
+    # 삭제 표시된 행은 deleted(tombstone) 로만 내려간다
+    routine, alarm, link = models.Routine, models.Alarm, models.AlarmRoutine
+    routines = db.query(*serializers.ROUTINE_COLUMNS, routine.version, routine.updated_at).filter(models.Routine.user_id == user_id, models.Routine.deleted_at.is_(None))
+    alarms = db.query(*serializers.ALARM_COLUMNS, alarm.version, alarm.updated_at).filter(models.Alarm.user_id == user_id, models.Alarm.deleted_at.is_(None))
+    links = db.query(link.alr_id, *serializers.LINK_COLUMNS, link.version, link.updated_at).join(
+        models.Alarm, models.Alarm.alarm_id == models.AlarmRoutine.alarm_id
+    ).join(
+        models.Routine, models.Routine.routine_id == models.AlarmRoutine.routine_id
+    ).filter(models.Alarm.user_id == user_id, models.Alarm.deleted_at.is_(None), models.Routine.deleted_at.is_(None))
+
+    deleted: List[dict] = []
+    if not reset:
+        routines = routines.filter(models.Routine.updated_at > since_ts)
+        alarms = alarms.filter(models.Alarm.updated_at > since_ts)
+        links = links.filter(models.AlarmRoutine.updated_at > since_ts)
+        deleted = [
+            {"entity": t.entity, "entity_id": t.entity_id, "deleted_at": t.deleted_at}
+            for t in db.query(models.SyncTombstone).filter(
+                models.SyncTombstone.user_id == user_id,
+                models.SyncTombstone.deleted_at > since_ts,
+            ).order_by(models.SyncTombstone.deleted_at)
+        ]
+
+    return {
+        "cursor": encode_cursor(now - CURSOR_LAG),
+        "reset": reset,
+        "routines": [routine_out(r) for r in routines],
+        "alarms": [alarm_out(a) for a in alarms],
+        "alarm_routines": [link_out(l) for l in links],
+        "deleted": deleted,
+    }
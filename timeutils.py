@@ -0,0 +1,40 @@
+from datetime import date, datetime, timedelta
+from typing import Optional, Tuple
+
+from pytz import timezone, utc
+
+KST = timezone("Asia/Seoul")
+
+
+def utcnow() -> datetime:
+    # DB 에는 UTC naive datetime 으로 저장
+    return datetime.now(utc).replace(tzinfo=None)
+
+
+def parse_client_ts(ts_str: Optional[str]) -> Tuple[Optional[datetime], Optional[date]]:
+    """클라이언트가 보낸 ISO 문자열 → (UTC naive datetime, KST 날짜).
+
+    'Z' 접미사와 offset 모두 허용하고, offset 이 없으면 UTC 로 간주한다.
+    파싱이 안 되면 (None, None).
+    """
+    if not ts_str:
+        return None, None
+    try:
+        dt = datetime.fromisoformat(ts_str.replace("Z", "+00:00"))
+    except ValueError:
+        return None, None
+    if dt.tzinfo is None:
+        dt = utc.localize(dt)
+    return dt.astimezone(utc).replace(tzinfo=None), dt.astimezone(KST).date()
+
+
+def month_range(year: int, month: int) -> Tuple[date, date]:
+    # [해당 월 1일, 다음 달 1일)
+    start = date(year, month, 1)
+    end = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
+    return start, end
+
+
+def korean_week_start(d: date) -> date:
+    # 한국식 주는 일요일 시작
+    return d - timedelta(days=(d.weekday() + 1) % 7)
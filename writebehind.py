@@ -0,0 +1,409 @@
+"""수행 기록 쓰기 지연(write-behind) 버퍼.
+
+아침 알람 시간대처럼 업로드가 몰릴 때 POST /alarm-executions(/batch) 가 요청마다 커밋하지 않도록,
+검증하고 exec_id 를 붙인 뒤 바로 응답하고 백그라운드 스레드가 모아서 multi-row INSERT 한 트랜잭션으로
+넣는다. WRITE_BEHIND_BATCH_SIZE 건이 모이거나 가장 오래된 기록이 WRITE_BEHIND_MAX_DELAY_MS 를
+넘기면 flush 한다.
+
+- 받은 기록은 응답 전에 로컬 spool 세그먼트 파일(<spool>.w0.000001, JSON lines)에 append + fsync 한다.
+  세그먼트가 WRITE_BEHIND_SEGMENT_BYTES 를 넘으면 새 파일로 넘어가고, 안의 기록이 모두 들어간 세그먼트는
+  지운다 (spool 을 통째로 다시 쓰지 않음). 시작할 때 세그먼트에 남은 기록 중 DB 에 없는 것(exec_id 기준)을 다시 넣는다.
+- uvicorn 워커들이 같은 WRITE_BEHIND_SPOOL 을 써도 되도록, 시작할 때 비어 있는 슬롯(<spool>.w0, .w1, ...)의
+  <slot>.lock 에 fcntl.flock 을 걸어 그 슬롯을 차지하고 프로세스가 끝날 때까지 쥐고 있다. 복구는 자기 슬롯과,
+  잠금을 잡을 수 있는(= 주인 프로세스가 죽은) 다른 슬롯 및 예전 버전의 <spool>.NNNNNN 파일만 읽으므로
+  살아 있는 다른 워커의 세그먼트는 건드리지 않는다.
+- 알람/루틴 존재 여부는 받을 때(validate_batch) 확인한다. 그래도 flush 때 넣지 못한 기록(그 사이 알람이 지워짐 등)은
+  버리지 않고 dead-letter 파일(<spool>.dead)에 남기고 dead_lettered 로 센다.
+- 대기열이 WRITE_BEHIND_MAX_QUEUE 를 넘으면 받지 않고 503 + Retry-After 로 돌려보낸다.
+- 아직 flush 되지 않은 기록이 걸린 조회(PUT /alarm-executions/{id}, /calendar 등)는
+  read_your_writes() 가 먼저 그 자리에서 flush 하고, 백그라운드가 이미 꺼내 간 묶음이면 그 커밋을 기다린다.
+
+    WRITE_BEHIND_ENABLED=1
+    WRITE_BEHIND_SPOOL=write_behind.spool
+    WRITE_BEHIND_SEGMENT_BYTES=4194304
+    WRITE_BEHIND_BATCH_SIZE=500
+    WRITE_BEHIND_MAX_DELAY_MS=200
+    WRITE_BEHIND_MAX_QUEUE=10000
+"""
+import fcntl
+import glob
+import itertools
+import logging
+import os
+import threading
+import time
+from collections import Counter, deque
+from typing import Deque, Dict, Iterable, List, Optional, Tuple
+
+import orjson
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+
+import async_routes
+import executions
+import ids
+import models
+import routing
+import schemas
+from database import env_bool, env_int
+
+WRITE_BEHIND_ENABLED = env_bool("WRITE_BEHIND_ENABLED", False)
+SPOOL_PATH = os.getenv("WRITE_BEHIND_SPOOL", "write_behind.spool")
+SEGMENT_BYTES = env_int("WRITE_BEHIND_SEGMENT_BYTES", 4 * 1024 * 1024)
+BATCH_SIZE = env_int("WRITE_BEHIND_BATCH_SIZE", 500)
+MAX_DELAY = env_int("WRITE_BEHIND_MAX_DELAY_MS", 200) / 1000
+MAX_QUEUE = env_int("WRITE_BEHIND_MAX_QUEUE", 10000)
+RETRY_AFTER_SECONDS = 1
+
+logger = logging.getLogger("routina.write_behind")
+
+
+class QueueFull(Exception):
+    """대기열이 가득 참 (503 + Retry-After)"""
+
+
+def _try_lock(path: str):
+    """path 에 배타 flock 을 걸어 연 파일을 돌려준다. 다른 프로세스가 쥐고 있으면 None."""
+    f = open(path, "ab")
+    try:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        f.close()
+        return None
+    return f
+
+
+class Entry:
+    __slots__ = ("exec_id", "user_id", "data", "line", "queued_at", "segment")
+
+    def __init__(self, exec_id: str, user_id: str, data: dict, line: bytes, queued_at: float):
+        self.exec_id = exec_id
+        self.user_id = user_id
+        self.data = data
+        self.line = line
+        self.queued_at = queued_at
+        self.segment = 0    # 이 기록이 들어 있는 spool 세그먼트 번호
+
+    @classmethod
+    def new(cls, user_id: str, data: schemas.AlarmExecutionCreate) -> "Entry":
+        exec_id = ids.new_id()
+        payload = data.model_dump()
+        line = orjson.dumps({"exec_id": exec_id, "user_id": user_id, "data": payload}) + b"\n"
+        return cls(exec_id, user_id, payload, line, time.monotonic())
+
+    def rows(self) -> Tuple[str, dict, List[dict]]:
+        log, details = executions.build_rows(schemas.AlarmExecutionCreate(**self.data), self.exec_id)
+        return self.user_id, log, details
+
+
+class WriteBehindBuffer:
+    def __init__(self, session_factory, spool_path: str = SPOOL_PATH, batch_size: int = BATCH_SIZE,
+                 max_delay: float = MAX_DELAY, max_queue: int = MAX_QUEUE, segment_bytes: int = SEGMENT_BYTES):
+        self.session_factory = session_factory
+        self.spool_base = spool_path
+        self.spool_path: Optional[str] = None  # 차지한 슬롯 (<spool>.wN, recover 에서 정함)
+        self.slot_lock = None
+        self.dead_letter_path = spool_path + ".dead"
+        self.segment_bytes = segment_bytes
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self.max_queue = max_queue
+        self.queue: Deque[Entry] = deque()
+        self.pending: Dict[str, str] = {}      # exec_id → user_id (flush 중인 것 포함)
+        self.pending_users: Counter = Counter()
+        self.lock = threading.Lock()
+        self.ready = threading.Condition(self.lock)
+        self.flush_lock = threading.Lock()     # flush 는 한 번에 하나 (백그라운드 / read_your_writes)
+        self.stopping = threading.Event()
+        self.thread = None
+        self.spool = None
+        self.segment = 0                       # 지금 append 하는 세그먼트
+        self.segments = set()                  # 아직 지우지 않은 세그먼트
+        self.counters = Counter()
+
+    # ---- 받기 ----
+
+    def submit(self, items: Iterable[Tuple[str, schemas.AlarmExecutionCreate]]) -> List[str]:
+        """(user_id, payload) 들을 spool 에 쓰고 대기열에 넣는다. 전부 받거나 QueueFull. exec_id 목록 반환."""
+        entries = [Entry.new(user_id, data) for user_id, data in items]
+        with self.lock:
+            if len(self.pending) + len(entries) > self.max_queue:
+                self.counters["rejected"] += len(entries)
+                raise QueueFull()
+            for e in entries:
+                e.segment = self.segment
+            self.spool.write(b"".join(e.line for e in entries))
+            self.spool.flush()
+            os.fsync(self.spool.fileno())
+            self._enqueue(entries)
+            if self.spool.tell() >= self.segment_bytes:
+                self._open_segment(self.segment + 1)
+            self.counters["accepted"] += len(entries)
+        return [e.exec_id for e in entries]
+
+    def _enqueue(self, entries: List[Entry]):
+        for e in entries:
+            self.queue.append(e)
+            self.pending[e.exec_id] = e.user_id
+            self.pending_users[e.user_id] += 1
+        self.ready.notify()
+
+    # ---- flush ----
+
+    def flush(self, limit: Optional[int] = None) -> int:
+        """대기열 앞에서 limit(기본 batch_size) 건을 한 트랜잭션으로 넣는다. 넣은 건수."""
+        with self.flush_lock:
+            with self.lock:
+                n = min(limit or self.batch_size, len(self.queue))
+                batch = [self.queue.popleft() for _ in range(n)]
+            if not batch:
+                return 0
+            try:
+                written = self._write(batch)
+            except Exception:
+                with self.lock:
+                    self.queue.extendleft(reversed(batch))
+                raise
+            # 방금 primary 에 들어간 기록을 replica 가 따라올 때까지 그 사용자는 primary 에서 읽게
+            for user_id in {e.user_id for e in batch}:
+                routing.mark_write(user_id)
+            with self.lock:
+                for e in batch:
+                    del self.pending[e.exec_id]
+                    self.pending_users[e.user_id] -= 1
+                    if not self.pending_users[e.user_id]:
+                        del self.pending_users[e.user_id]
+                # 대기열은 받은 순서이므로 맨 앞 기록의 세그먼트보다 앞선 것은 모두 들어갔다
+                oldest = self.queue[0].segment if self.queue else self.segment
+                done = {n for n in self.segments if n < oldest}
+                self.segments -= done
+                self.counters["flushed"] += written
+                self.counters["dead_lettered"] += len(batch) - written
+                self.counters["flushes"] += 1
+            for n in done:
+                os.remove(self._segment_path(n))
+            return written
+
+    def _write(self, batch: List[Entry]) -> int:
+        db = self.session_factory()
+        try:
+            try:
+                executions.insert_rows(db, [e.rows() for e in batch])
+                db.commit()
+                return len(batch)
+            except IntegrityError:
+                db.rollback()
+            # 한 건 때문에 묶음 전체가 실패하면 한 건씩 넣고, 안 되는 것은 dead-letter 파일로
+            written = 0
+            for e in batch:
+                try:
+                    executions.insert_rows(db, [e.rows()])
+                    db.commit()
+                    written += 1
+                except IntegrityError as exc:
+                    db.rollback()
+                    logger.error("dead-lettering execution %s for alarm %s", e.exec_id, e.data.get("alarm_id"))
+                    self._dead_letter(e, exc)
+            return written
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def flush_all(self) -> int:
+        written = 0
+        while self.queue:
+            written += self.flush()
+        return written
+
+    def _waiting_on(self, exec_id: Optional[str], user_id: Optional[str]) -> bool:
+        return exec_id in self.pending or user_id in self.pending_users
+
+    def read_your_writes(self, exec_id: Optional[str] = None, user_id: Optional[str] = None) -> int:
+        """아직 커밋 안 된 기록이 이 조회에 걸리면 커밋될 때까지 기다린다 (없으면 DB 를 건드리지 않음).
+
+        대기열에 남은 것은 지금 flush 하고, 백그라운드가 이미 꺼내 간 묶음은 flush_lock 을 잡아 그 커밋이
+        끝나기를 기다린다. 그 flush 가 실패해 대기열로 돌아왔으면 다시 넣는다.
+        """
+        if not self._waiting_on(exec_id, user_id):
+            return 0
+        self.counters["read_flushes"] += 1
+        written = 0
+        while self._waiting_on(exec_id, user_id):
+            written += self.flush_all()
+            with self.flush_lock:
+                pass
+        return written
+
+    # ---- spool ----
+
+    def _segment_path(self, n: int) -> str:
+        return f"{self.spool_path}.{n:06d}"
+
+    def _open_segment(self, n: int):
+        if self.spool:
+            self.spool.close()
+        self.segment = n
+        self.segments.add(n)
+        self.spool = open(self._segment_path(n), "ab")
+
+    def _spool_files(self, prefix: Optional[str] = None) -> List[str]:
+        prefix = prefix or self.spool_path
+        # 예전 버전의 단일 spool 파일도 함께 읽는다
+        files = sorted(glob.glob(glob.escape(prefix) + ".[0-9]*"))
+        return ([prefix] if os.path.exists(prefix) else []) + files
+
+    def _claim_slot(self):
+        """아무도 쥐고 있지 않은 가장 앞 슬롯의 잠금을 잡는다."""
+        for n in itertools.count():
+            path = f"{self.spool_base}.w{n}"
+            lock = _try_lock(path + ".lock")
+            if lock is not None:
+                self.spool_path, self.slot_lock = path, lock
+                return
+
+    def _orphans(self) -> List[Tuple[str, object]]:
+        """주인이 없는 다른 슬롯과 예전 버전 spool 을 (prefix, 잠금) 으로. 잠금은 호출한 쪽이 닫는다."""
+        prefixes = [p[:-len(".lock")] for p in sorted(glob.glob(glob.escape(self.spool_base) + ".w*.lock"))]
+        if self._spool_files(self.spool_base):
+            prefixes.append(self.spool_base)
+        orphans = []
+        for prefix in prefixes:
+            if prefix == self.spool_path or not self._spool_files(prefix):
+                continue
+            lock = _try_lock(prefix + ".lock")
+            if lock is not None:
+                orphans.append((prefix, lock))
+        return orphans
+
+    def _dead_letter(self, e: Entry, exc: Exception):
+        error = str(getattr(exc, "orig", None) or exc).splitlines()[0]
+        with open(self.dead_letter_path, "ab") as f:
+            f.write(orjson.dumps({"exec_id": e.exec_id, "user_id": e.user_id, "data": e.data, "error": error}) + b"\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def recover(self) -> int:
+        """spool 세그먼트에 남은 기록 중 DB 에 없는 것을 대기열로 다시 올린다. 올린 건수.
+
+        처음 부르면 슬롯을 차지하고, 죽은 워커가 남긴 슬롯의 기록도 함께 가져온다.
+        """
+        if self.slot_lock is None:
+            self._claim_slot()
+        orphans = self._orphans()
+        own = self._spool_files()
+        files = own + [p for prefix, _ in orphans for p in self._spool_files(prefix)]
+        entries: Dict[str, Entry] = {}
+        for path in files:
+            with open(path, "rb") as f:
+                for line in f:
+                    try:
+                        item = orjson.loads(line)
+                    except orjson.JSONDecodeError:
+                        continue   # 쓰다가 죽은 마지막 줄
+                    line = line if line.endswith(b"\n") else line + b"\n"
+                    entries[item["exec_id"]] = Entry(item["exec_id"], item["user_id"], item["data"], line, time.monotonic())
+        if entries:
+            db = self.session_factory()
+            try:
+                log = models.AlarmExecutionLog
+                ids = list(entries)
+                for i in range(0, len(ids), 1000):
+                    for (exec_id,) in db.execute(select(log.exec_id).where(log.exec_id.in_(ids[i:i + 1000]))):
+                        entries.pop(exec_id)
+            finally:
+                db.close()
+        # 남은 기록만 새 세그먼트 하나에 옮겨 담고 예전 파일은 지운다
+        last = max((int(p.rsplit(".", 1)[1]) for p in own if p != self.spool_path), default=0)
+        with self.lock:
+            self._open_segment(last + 1)
+            for e in entries.values():
+                e.segment = self.segment
+            self.spool.write(b"".join(e.line for e in entries.values()))
+            self.spool.flush()
+            os.fsync(self.spool.fileno())
+            self._enqueue(list(entries.values()))
+        for path in files:
+            os.remove(path)
+        # 잠금 파일은 지우지 않는다 (지우면 같은 슬롯을 두 프로세스가 잡을 수 있음)
+        for _, lock in orphans:
+            lock.close()
+        if orphans:
+            logger.warning("recovered write-behind spool of %d stopped worker(s)", len(orphans))
+        return len(entries)
+
+    # ---- 실행 ----
+
+    def _wait_batch(self):
+        """batch_size 건이 모이거나 가장 오래된 기록이 max_delay 를 넘길 때까지 기다린다."""
+        with self.ready:
+            while not self.queue and not self.stopping.is_set():
+                self.ready.wait()
+            while self.queue and len(self.queue) < self.batch_size and not self.stopping.is_set():
+                remaining = self.queue[0].queued_at + self.max_delay - time.monotonic()
+                if remaining <= 0:
+                    break
+                self.ready.wait(remaining)
+
+    def run_forever(self):
+        while not self.stopping.is_set():
+            self._wait_batch()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("write-behind flush failed, retrying")
+                self.stopping.wait(1.0)
+
+    def start(self):
+        self.recover()
+        self.thread = threading.Thread(target=self.run_forever, name="write-behind", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopping.set()
+        with self.ready:
+            self.ready.notify_all()
+        if self.thread:
+            self.thread.join(timeout=10)
+        try:
+            self.flush_all()   # 못 넣은 것은 spool 에 남아 다음 시작 때 들어간다
+        finally:
+            if self.spool:
+                self.spool.close()
+            if self.slot_lock:
+                self.slot_lock.close()
+
+    def stats(self) -> dict:
+        with self.lock:
+            oldest = self.queue[0].queued_at if self.queue else None
+            return {
+                "queued": len(self.pending),
+                "oldest_age_seconds": round(time.monotonic() - oldest, 3) if oldest else 0.0,
+                "spool_segments": len(self.segments),
+                **{k: self.counters[k] for k in ("accepted", "flushed", "dead_lettered", "rejected", "flushes", "read_flushes")},
+            }
+
+
+# API 프로세스에서 실행 중인 버퍼 (WRITE_BEHIND_ENABLED=1 일 때만)
+current: Optional[WriteBehindBuffer] = None
+
+
+def read_your_writes(exec_id: Optional[str] = None, user_id: Optional[str] = None):
+    # flush 는 sync 엔진을 쓰므로 async 모드에서는 이벤트 루프 밖에서 (걸리는 기록이 없으면 바로 반환)
+    if current is not None and current._waiting_on(exec_id, user_id):
+        async_routes.offload(current.read_your_writes, exec_id=exec_id, user_id=user_id)
+
+
+def install(app, session_factory):
+    def start():
+        global current
+        current = WriteBehindBuffer(session_factory)
+        current.start()
+
+    def stop():
+        if current is not None:
+            current.stop()
+
+    app.router.on_startup.append(start)
+    app.router.on_shutdown.append(stop)